@@ -33,6 +33,7 @@ if __name__ == '__main__':
         clear_table('autosettled-customers', 'customer_id')
         clear_table('autosettled-policies', 'policy_id')
         clear_table('autosettled-vehicles', 'vehicle_id')
+        clear_table('autosettled-customer-portfolios', 'customer_id')
 
         print("=" * 50)
         print("✓ All tables cleared successfully!")
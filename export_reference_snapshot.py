@@ -0,0 +1,53 @@
+import boto3
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Reuse the snapshot writer shipped in the common Lambda layer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_layers', 'common', 'python'))
+from autosettled_common.repositories import from_decimal
+from autosettled_common.snapshot import publish_snapshot, write_snapshot
+
+# Initialize DynamoDB client
+dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+def scan_table(table_name):
+    """Read every item of a table, following pagination"""
+    table = dynamodb.Table(table_name)
+    response = table.scan()
+    items = response['Items']
+    while 'LastEvaluatedKey' in response:
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+        items.extend(response['Items'])
+    print(f"  Read {len(items)} items from {table_name}")
+    return [from_decimal(item) for item in items]
+
+if __name__ == '__main__':
+    print("=" * 50)
+    print("Exporting Reference Data Snapshot")
+    print("=" * 50 + "\n")
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('S3_BUCKET_NAME')
+    if not bucket:
+        print("Usage: python export_reference_snapshot.py <documents-bucket>")
+        sys.exit(1)
+
+    try:
+        version = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        customers = scan_table('autosettled-customers')
+        policies = scan_table('autosettled-policies')
+        vehicles = scan_table('autosettled-vehicles')
+
+        path = os.path.join(tempfile.gettempdir(), f"reference-{version}.sqlite")
+        counts = write_snapshot(path, version, customers, policies, vehicles)
+        print(f"\n  Wrote {path} ({os.path.getsize(path)} bytes, {counts})")
+
+        key = publish_snapshot(path, bucket, version)
+
+        print("=" * 50)
+        print(f"✓ Snapshot {version} published to s3://{bucket}/{key}")
+        print("=" * 50)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        print("Make sure your AWS credentials are configured and tables exist.")
@@ -19,7 +19,7 @@ import {
   ProgressRange,
 } from '@chakra-ui/react';
 import { ClaimStep, type ClaimState, type ChatMessage } from '../types';
-import { invokeAgent, uploadFile, startClaimSession } from '../services/api';
+import { streamAgent, uploadFile, startClaimSession } from '../services/api';
 
 export default function ClaimPage() {
   const navigate = useNavigate();
@@ -66,6 +66,36 @@ export default function ClaimPage() {
       });
   }, []);
 
+  // Run the agent as an async job, growing one assistant message as its output arrives
+  const runAgent = async (message: string): Promise<string> => {
+    const messageId = (Date.now() + 1).toString();
+    const showOutput = (content: string) => {
+      const assistantMessage: ChatMessage = {
+        id: messageId,
+        role: 'assistant',
+        content,
+        timestamp: new Date(),
+      };
+      setChatMessages((prev) =>
+        prev.some((m) => m.id === messageId)
+          ? prev.map((m) => (m.id === messageId ? assistantMessage : m))
+          : [...prev, assistantMessage]
+      );
+    };
+
+    const job = await streamAgent(
+      {
+        inputText: message,
+        sessionId: sessionId,
+        enableTrace: false,
+      },
+      showOutput
+    );
+    const output = job.output || '';
+    showOutput(output);
+    return output;
+  };
+
   const sendMessage = async (message: string) => {
     if (!message.trim() || isLoading) return;
 
@@ -81,23 +111,10 @@ export default function ClaimPage() {
     setIsLoading(true);
 
     try {
-      const response = await invokeAgent({
-        inputText: message,
-        sessionId: sessionId,
-        enableTrace: false,
-      });
-
-      const assistantMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: response.output,
-        timestamp: new Date(),
-      };
-
-      setChatMessages((prev) => [...prev, assistantMessage]);
+      const response = await runAgent(message);
 
       // Detect which step we're on based on agent response
-      const output = response.output.toLowerCase();
+      const output = response.toLowerCase();
 
       if (output.includes('step 2') && output.includes('policy')) {
         setClaimState(prev => ({ ...prev, currentStep: ClaimStep.POLICY_VERIFICATION }));
@@ -232,23 +249,10 @@ export default function ClaimPage() {
     setIsLoading(true);
 
     try {
-      const response = await invokeAgent({
-        inputText: message,
-        sessionId: sessionId,
-        enableTrace: false,
-      });
-
-      const assistantMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: response.output,
-        timestamp: new Date(),
-      };
-
-      setChatMessages((prev) => [...prev, assistantMessage]);
+      const response = await runAgent(message);
 
       // Check AI response and trigger document upload if needed
-      const output = response.output.toLowerCase();
+      const output = response.toLowerCase();
       if (
         output.includes('police report') ||
         output.includes('repair estimate') ||
@@ -299,20 +303,7 @@ export default function ClaimPage() {
     setIsLoading(true);
 
     try {
-      const response = await invokeAgent({
-        inputText: message,
-        sessionId: sessionId,
-        enableTrace: false,
-      });
-
-      const assistantMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: response.output,
-        timestamp: new Date(),
-      };
-
-      setChatMessages((prev) => [...prev, assistantMessage]);
+      await runAgent(message);
     } catch (error) {
       const errorMessage: ChatMessage = {
         id: (Date.now() + 1).toString(),
@@ -14,28 +14,21 @@ import {
   SimpleGrid,
   Table,
 } from '@chakra-ui/react';
-import { listClaims } from '../services/api';
-
-interface ClaimSummary {
-  claim_id: string;
-  customer_name: string;
-  policy_number: string;
-  status: 'APPROVE' | 'MANUAL_REVIEW' | 'DENY' | 'IN_PROGRESS';
-  risk_level?: 'low' | 'medium' | 'high';
-  amount?: number;
-  created_at: string;
-}
+import { listClaims, ClaimSummary } from '../services/api';
 
 export default function DashboardPage() {
   const [claims, setClaims] = useState<ClaimSummary[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextToken, setNextToken] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [filterStatus, setFilterStatus] = useState<string>('ALL');
 
   useEffect(() => {
     listClaims()
-      .then((data) => {
-        setClaims(data);
+      .then((page) => {
+        setClaims(page.claims);
+        setNextToken(page.nextToken);
         setLoading(false);
       })
       .catch(() => {
@@ -74,6 +67,17 @@ export default function DashboardPage() {
       });
   }, []);
 
+  const loadMore = () => {
+    if (!nextToken) return;
+    setLoadingMore(true);
+    listClaims({ nextToken })
+      .then((page) => {
+        setClaims((current) => [...current, ...page.claims]);
+        setNextToken(page.nextToken);
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
   const getStatusIcon = (status: string) => {
     switch (status) {
       case 'APPROVE':
@@ -307,6 +311,14 @@ export default function DashboardPage() {
             Showing {filteredClaims.length} of {claims.length} claims
           </Text>
         )}
+
+        {nextToken && (
+          <Flex mt={4} justify="center">
+            <Button variant="outline" onClick={loadMore} loading={loadingMore}>
+              Load more claims
+            </Button>
+          </Flex>
+        )}
       </Container>
     </Box>
   );
@@ -16,6 +16,42 @@ export interface AgentInvokeResponse {
   completion: string;
 }
 
+export interface AgentJob {
+  jobId: string;
+  sessionId: string;
+  status: 'QUEUED' | 'RUNNING' | 'COMPLETE' | 'FAILED' | 'TIMED_OUT';
+  createdAt?: string;
+  updatedAt?: string;
+  output?: string;
+  completion?: string;
+  trace?: any[];
+  traceUrl?: string;
+  error?: string;
+}
+
+export interface ClaimSummary {
+  claim_id: string;
+  customer_id?: string;
+  customer_name: string;
+  policy_number: string;
+  status: 'APPROVE' | 'MANUAL_REVIEW' | 'DENY' | 'IN_PROGRESS';
+  risk_level?: 'low' | 'medium' | 'high';
+  amount?: number;
+  created_at: string;
+}
+
+export interface ClaimsPage {
+  claims: ClaimSummary[];
+  nextToken?: string;
+}
+
+export interface ListClaimsOptions {
+  limit?: number;
+  nextToken?: string;
+  status?: ClaimSummary['status'];
+  customerId?: string;
+}
+
 // Generic API call function
 async function apiCall<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
   const response = await fetch(`${API_BASE_URL}${endpoint}`, {
@@ -77,6 +113,46 @@ export async function invokeAgent(request: AgentInvokeRequest): Promise<AgentInv
   });
 }
 
+// Queue an agent run; poll getAgentJob with the returned jobId
+export async function invokeAgentAsync(request: AgentInvokeRequest): Promise<AgentJob> {
+  return apiCall<AgentJob>('/agent/invoke', {
+    method: 'POST',
+    body: JSON.stringify({ ...request, async: true }),
+  });
+}
+
+// Get an async agent run's status and, once complete, its output
+export async function getAgentJob(jobId: string): Promise<AgentJob> {
+  return apiCall<AgentJob>(`/agent/jobs/${jobId}`, {
+    method: 'GET',
+  });
+}
+
+// Run the agent as an async job, calling onOutput with the output so far as it grows.
+// The server times out stuck jobs; maxWaitMs (a little over the worker's
+// 15-minute limit) stops polling if that report never arrives
+export async function streamAgent(
+  request: AgentInvokeRequest,
+  onOutput: (output: string) => void,
+  pollIntervalMs: number = 1000,
+  maxWaitMs: number = 16 * 60 * 1000,
+): Promise<AgentJob> {
+  const { jobId } = await invokeAgentAsync(request);
+  const giveUpAt = Date.now() + maxWaitMs;
+  let shown = '';
+  while (Date.now() < giveUpAt) {
+    const job = await getAgentJob(jobId);
+    if (job.output && job.output !== shown) {
+      shown = job.output;
+      onOutput(shown);
+    }
+    if (job.status === 'COMPLETE') return job;
+    if (job.status === 'FAILED' || job.status === 'TIMED_OUT') throw new Error(job.error || 'Agent job failed');
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+  }
+  throw new Error('Agent job did not finish in time');
+}
+
 // Start a new claim session
 export async function startClaimSession(): Promise<{ sessionId: string }> {
   return apiCall<{ sessionId: string }>('/claim/start', {
@@ -91,9 +167,13 @@ export async function getClaimStatus(claimId: string): Promise<any> {
   });
 }
 
-// List all claims (for dashboard)
-export async function listClaims(limit: number = 50): Promise<any[]> {
-  return apiCall(`/claims?limit=${limit}`, {
+// List claims newest first, one page at a time (for dashboard)
+export async function listClaims(options: ListClaimsOptions = {}): Promise<ClaimsPage> {
+  const params = new URLSearchParams({ limit: String(options.limit ?? 50) });
+  if (options.nextToken) params.set('nextToken', options.nextToken);
+  if (options.status) params.set('status', options.status);
+  if (options.customerId) params.set('customer_id', options.customerId);
+  return apiCall<ClaimsPage>(`/claims?${params.toString()}`, {
     method: 'GET',
   });
 }
@@ -1,7 +1,15 @@
-import boto3
 import json
-import base64
 from decimal import Decimal
+from autosettled_common.cache import record_cache
+from autosettled_common import claim_context, repositories
+from autosettled_common.analysis_cache import get_cached_result, make_cache_key, put_cached_result
+from autosettled_common.bedrock import bedrock_invoker
+from autosettled_common.schemas import DAMAGE_SCHEMA, DAMAGE_TOOL
+from autosettled_common.structured import invoke_structured, tool_fields
+from autosettled_common.s3_objects import fetch_objects
+from autosettled_common.prompts import STEP_BUDGETS, estimate_tokens, record_prompt_metrics
+from autosettled_common.payloads import MessagesBodyBuilder, container_peak_memory_mb
+from autosettled_common.images import PREPROCESSING_VERSION, estimate_image_tokens, find_near_duplicates, prepare_image
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -9,8 +17,14 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+DAMAGE_MODEL_ID = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+
+# Bump whenever the damage prompt or result shape changes, so cached results are not reused
+DAMAGE_PROMPT_VERSION = 'damage-v2'
+
 def lambda_handler(event, context):
     print("Received event:", json.dumps(event))
+    bedrock_invoker.start_invocation(context)
 
     # Bedrock Agents for Amazon Bedrock has TWO formats:
     # 1. Old format: actionGroup, apiPath, parameters
@@ -19,10 +33,15 @@ def lambda_handler(event, context):
     # Check which format we received
     if 'agent' in event:
         # New agent format with tool use
-        return handle_new_format(event, context)
+        response = handle_new_format(event, context)
     else:
         # Old action group format
-        return handle_old_format(event, context)
+        response = handle_old_format(event, context)
+
+    print(f"Record cache stats: {json.dumps(record_cache.stats())}")
+    print(f"Container peak memory: {container_peak_memory_mb():.1f} MB")
+    bedrock_invoker.flush_metrics()
+    return response
 
 def handle_new_format(event, context):
     """Handle new Bedrock Agent format with function/tool use"""
@@ -50,7 +69,7 @@ def handle_new_format(event, context):
         image_uris = [uri.strip() for uri in image_uris]
 
     # Perform damage analysis (VIN will be fetched from policy)
-    result_body = perform_damage_analysis(image_uris, policy_id)
+    result_body = perform_damage_analysis(image_uris, policy_id, claim_context.context_key(event))
 
     # New format response
     return {
@@ -90,7 +109,7 @@ def handle_old_format(event, context):
         image_uris = [uri.strip() for uri in image_uris]
 
     # Perform damage analysis (VIN will be fetched from policy)
-    result = perform_damage_analysis(image_uris, policy_id)
+    result = perform_damage_analysis(image_uris, policy_id, claim_context.context_key(event))
 
     # Build response
     bedrock_response = {
@@ -116,42 +135,77 @@ def handle_old_format(event, context):
     print(f"Response: {json.dumps(bedrock_response)}")
     return bedrock_response
 
-def perform_damage_analysis(image_uris, policy_id):
+def perform_damage_analysis(image_uris, policy_id, context_key=None):
     """Core business logic for damage analysis"""
     from datetime import datetime
 
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    vehicles_table = dynamodb.Table('autosettled-vehicles')
-
     try:
         # Fetch vehicle using policy_id
-        vehicle_response = vehicles_table.scan(
-            FilterExpression='policy_id = :pid',
-            ExpressionAttributeValues={':pid': policy_id}
-        )
+        vehicle = repositories.get_vehicle_for_policy(policy_id)
 
-        if not vehicle_response.get('Items'):
+        if not vehicle:
+            claim_context.clear_section(context_key, 'damage_analysis')
             return {
                 'success': False,
                 'message': 'No vehicle found for this policy.'
             }
 
-        vehicle = vehicle_response['Items'][0]
         vehicle_vin = vehicle.get('vin')
 
         # Get current date
         current_date = datetime.now().strftime('%B %d, %Y')
 
-        # VIN is valid, proceed with damage analysis
-        s3 = boto3.client('s3', region_name='us-east-1')
-        images_base64 = []
+        # VIN is valid, proceed with damage analysis; all images are fetched at once
+        images = [obj.data for obj in fetch_objects(image_uris)]
 
-        for uri in image_uris:
-            bucket, key = parse_s3_uri(uri)
-            img_obj = s3.get_object(Bucket=bucket, Key=key)
-            images_base64.append(base64.b64encode(img_obj['Body'].read()).decode())
+        vehicle_data = json.loads(json.dumps(vehicle, cls=DecimalEncoder))
 
-        bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+        # Identical images, vehicle, preprocessing, prompt and model give the same answer
+        cache_attributes = {field: vehicle_data.get(field) for field in ('vin', 'make', 'model', 'year_of_manufacture', 'color')}
+        cache_attributes['image_preprocessing'] = PREPROCESSING_VERSION
+        cache_key = make_cache_key(
+            'damage',
+            images,
+            cache_attributes,
+            DAMAGE_PROMPT_VERSION,
+            DAMAGE_MODEL_ID
+        )
+        cached_result = get_cached_result(cache_key)
+        if cached_result is not None:
+            print(f"Damage analysis cache hit: {cache_key}")
+            cached_result['cache_hit'] = True
+            return summarize_damage_result(cached_result, context_key)
+
+        # Downscale and re-encode before sending; fewer bytes and image tokens
+        # Release each original as soon as it has been prepared
+        prepared_images = []
+        for index, uri in enumerate(image_uris):
+            prepared = prepare_image(images[index])
+            images[index] = None
+            print(f"Image {uri}: {prepared.original_bytes} -> {len(prepared.data)} bytes, "
+                  f"{prepared.original_size} -> {prepared.size} px, "
+                  f"~{estimate_image_tokens(prepared.original_size)} -> ~{estimate_image_tokens(prepared.size)} tokens, "
+                  f"{prepared.media_type}")
+            prepared_images.append(prepared)
+        del images
+
+        # Collapse near-identical shots of the same damage into one image
+        duplicates = find_near_duplicates([img.dhash for img in prepared_images])
+        dropped_indexes = {dup.index for dup in duplicates}
+        dropped_images = [
+            {'uri': image_uris[dup.index], 'duplicate_of': image_uris[dup.duplicate_of], 'hash_distance': dup.distance}
+            for dup in duplicates
+        ]
+        for dropped in dropped_images:
+            print(f"Dropping near-duplicate image {dropped['uri']} (matches {dropped['duplicate_of']}, distance {dropped['hash_distance']})")
+
+        # Images are base64-encoded straight into one preallocated request body
+        body_builder = MessagesBodyBuilder(max_tokens=1000, **tool_fields(DAMAGE_TOOL, DAMAGE_SCHEMA))
+        for index, img in enumerate(prepared_images):
+            if index not in dropped_indexes:
+                body_builder.add_image(img.media_type, img.data)
+        images_analyzed = len(prepared_images) - len(dropped_indexes)
+        del prepared_images
 
         prompt = f"""Today's date is {current_date}.
 
@@ -160,7 +214,7 @@ Make: {vehicle['make']}, Model: {vehicle['model']}, Year: {vehicle['year_of_manu
 
 IMPORTANT: Compare the car in the images with the database vehicle details above. Only flag if there's an obvious mismatch (different color, completely different vehicle type).
 
-Then provide a detailed analysis in JSON format:
+Then record a detailed analysis with the record_damage_analysis tool:
 {{
     "vehicle_matches_policy": true/false,
     "vehicle_match_notes": "explanation of match/mismatch",
@@ -172,48 +226,45 @@ Then provide a detailed analysis in JSON format:
     "suspicious_indicators": ["any red flags or concerns"]
 }}"""
 
-        response = bedrock.invoke_model(
-            modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "messages": [{
-                    "role": "user",
-                    "content": [
-                        {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": img}}
-                        for img in images_base64
-                    ] + [{"type": "text", "text": prompt}]
-                }]
-            })
-        )
-
-        bedrock_result = json.loads(response['body'].read())
-        analysis_text = bedrock_result['content'][0]['text']
-
-        # Try to parse as JSON, fallback to text
-        try:
-            analysis_json = json.loads(analysis_text)
-            return {
-                'success': True,
-                'vehicle_vin': vehicle_vin,
-                'analysis': analysis_json,
-                'vehicle_data': json.loads(json.dumps(vehicle, cls=DecimalEncoder))
-            }
-        except:
-            return {
-                'success': True,
-                'vehicle_vin': vehicle_vin,
-                'analysis': analysis_text,
-                'vehicle_data': json.loads(json.dumps(vehicle, cls=DecimalEncoder))
-            }
+        record_prompt_metrics('damage', prompt, estimate_tokens(prompt), STEP_BUDGETS['damage'])
+        request_body = body_builder.add_text(prompt).build()
+        print(f"Damage request body: {len(request_body)} bytes")
+        # Parsed and validated once here; later steps receive the typed result
+        analysis = invoke_structured(DAMAGE_MODEL_ID, request_body, DAMAGE_TOOL, DAMAGE_SCHEMA)
+        del request_body
+
+        result = {
+            'success': True,
+            'vehicle_vin': vehicle_vin,
+            'analysis': analysis,
+            'vehicle_data': vehicle_data,
+            'images_analyzed': images_analyzed,
+            'dropped_duplicate_images': dropped_images
+        }
+        put_cached_result(cache_key, result)
+        result['cache_hit'] = False
+        return summarize_damage_result(result, context_key)
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        # Don't let a later step pick up an earlier attempt's analysis
+        claim_context.clear_section(context_key, 'damage_analysis')
         return {
             'success': False,
             'error': str(e)
         }
 
-def parse_s3_uri(uri):
-    parts = uri.replace("s3://", "").split("/", 1)
-    return parts[0], parts[1]
\ No newline at end of file
+def summarize_damage_result(result, context_key):
+    """Store the full damage result in the claim context and return the summary the agent sees"""
+    analysis = result['analysis']
+    return claim_context.store_and_summarize(context_key, 'damage_analysis', result, {
+        'success': True,
+        'cache_hit': result['cache_hit'],
+        'vehicle_vin': result['vehicle_vin'],
+        'images_analyzed': result['images_analyzed'],
+        'dropped_duplicate_images': result.get('dropped_duplicate_images', []),
+        'severity': analysis['severity'],
+        'estimated_repair_cost_usd': analysis['estimated_repair_cost_usd'],
+        'vehicle_matches_policy': analysis['vehicle_matches_policy'],
+        'damage_summary': analysis['damage_summary']
+    })
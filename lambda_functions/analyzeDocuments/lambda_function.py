@@ -1,9 +1,16 @@
-import boto3
 import json
-import base64
+from autosettled_common import claim_context
+from autosettled_common.bedrock import bedrock_invoker
+from autosettled_common.schemas import DOCUMENT_SCHEMA, DOCUMENT_TOOL
+from autosettled_common.structured import invoke_structured, tool_fields
+from autosettled_common.s3_objects import FETCH_TIMEOUT_SECONDS, fetch_executor, open_objects
+from autosettled_common.payloads import MessagesBodyBuilder, container_peak_memory_mb
+from autosettled_common.pdf_triage import triage_pdf
+from autosettled_common.prompts import DAMAGE_FIELDS_FOR_DOCUMENTS, damage_findings, render_prompt
 
 def lambda_handler(event, context):
     print("Received event:", json.dumps(event))
+    bedrock_invoker.start_invocation(context)
 
     # Bedrock Agents for Amazon Bedrock has TWO formats:
     # 1. Old format: actionGroup, apiPath, parameters
@@ -12,10 +19,14 @@ def lambda_handler(event, context):
     # Check which format we received
     if 'agent' in event:
         # New agent format with tool use
-        return handle_new_format(event, context)
+        response = handle_new_format(event, context)
     else:
         # Old action group format
-        return handle_old_format(event, context)
+        response = handle_old_format(event, context)
+
+    bedrock_invoker.flush_metrics()
+    print(f"Container peak memory: {container_peak_memory_mb():.1f} MB")
+    return response
 
 def handle_new_format(event, context):
     """Handle new Bedrock Agent format with function/tool use"""
@@ -38,7 +49,8 @@ def handle_new_format(event, context):
     print(f"Parameters - police_report: {police_report_uri}, repair_estimate: {repair_estimate_uri}")
 
     # Perform document analysis
-    result_body = perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis)
+    result_body = perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis,
+                                       claim_context.context_key(event))
 
     # New format response
     return {
@@ -73,7 +85,8 @@ def handle_old_format(event, context):
     print(f"Parameters - police_report: {police_report_uri}, repair_estimate: {repair_estimate_uri}")
 
     # Perform document analysis
-    result = perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis)
+    result = perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis,
+                                       claim_context.context_key(event))
 
     # Build response
     bedrock_response = {
@@ -99,27 +112,21 @@ def handle_old_format(event, context):
     print(f"Response: {json.dumps(bedrock_response)}")
     return bedrock_response
 
-def perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis):
+def perform_document_analysis(police_report_uri, repair_estimate_uri, damage_analysis, context_key=None):
     """Core business logic for document analysis using Claude vision (no Textract)"""
     from datetime import datetime
 
-    s3 = boto3.client('s3', region_name='us-east-1')
-    bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-
     try:
+        # The damage result comes from the claim context when the agent omits it or passes its summary
+        damage_analysis = claim_context.fill_missing(context_key, {'damage_analysis': damage_analysis})['damage_analysis']
+
         # Get current date
         current_date = datetime.now().strftime('%B %d, %Y')
 
-        # Read police report from S3 and convert to base64
-        police_bucket, police_key = parse_s3_uri(police_report_uri)
-        police_obj = s3.get_object(Bucket=police_bucket, Key=police_key)
-        police_base64 = base64.b64encode(police_obj['Body'].read()).decode()
+        # Open the police report and repair estimate together; their bodies
+        # are read once, concurrently, straight into the request body
+        police_obj, estimate_obj = open_objects([police_report_uri, repair_estimate_uri])
         police_content_type = police_obj['ContentType']
-
-        # Read repair estimate from S3 and convert to base64
-        estimate_bucket, estimate_key = parse_s3_uri(repair_estimate_uri)
-        estimate_obj = s3.get_object(Bucket=estimate_bucket, Key=estimate_key)
-        estimate_base64 = base64.b64encode(estimate_obj['Body'].read()).decode()
         estimate_content_type = estimate_obj['ContentType']
 
         # Extract VIN and vehicle details from damage analysis
@@ -129,17 +136,20 @@ def perform_document_analysis(police_report_uri, repair_estimate_uri, damage_ana
             try:
                 damage_data = json.loads(damage_analysis) if isinstance(damage_analysis, str) else damage_analysis
                 vin_from_db = damage_data.get('vehicle_vin', '')
-                vehicle_data = damage_data.get('vehicle_data', {})
-                vehicle_details = f"\nVehicle in our database: {vehicle_data.get('make', '')} {vehicle_data.get('model', '')} {vehicle_data.get('year_of_manufacture', '')}, VIN: {vin_from_db}"
+                vehicle_data = damage_data.get('vehicle_data') or {}
+                vehicle_description = ' '.join(str(vehicle_data[field]) for field in ('make', 'model', 'year_of_manufacture')
+                                               if vehicle_data.get(field))
+                vehicle_details = f"\nVehicle in our database: {vehicle_description or 'details unavailable'}, VIN: {vin_from_db}"
             except:
                 pass
 
-        # Include damage analysis for cross-verification if provided
-        damage_context = ""
-        if damage_analysis:
-            damage_context = f"\n\nPREVIOUS DAMAGE ANALYSIS FROM IMAGES:\n{damage_analysis}\n\nIMPORTANT: Cross-verify the repair estimate against the damage seen in images."
+        def render(damage):
+            # Include the damage findings the estimate is checked against, if provided
+            damage_context = ""
+            if damage:
+                damage_context = f"\n\nPREVIOUS DAMAGE ANALYSIS FROM IMAGES:\n{damage}\n\nIMPORTANT: Cross-verify the repair estimate against the damage seen in images."
 
-        prompt = f"""Today's date is {current_date}.{vehicle_details}
+            return f"""Today's date is {current_date}.{vehicle_details}
 
 Extract and analyze key information from these claim documents (police report and repair estimate).{damage_context}
 
@@ -147,90 +157,74 @@ IMPORTANT:
 - Only compare dates with today's date ({current_date}). Do not use your training knowledge cutoff.
 - If VIN is present in documents, compare it ONLY with the database VIN: {vin_from_db}. Do not validate VIN format independently.
 
-Return a JSON object with:
+Record the result with the record_document_analysis tool:
 {{
-    "incident_date": "date from report",
-    "incident_location": "location",
-    "police_case_number": "case number",
+    "incident_date": "date from report, or null if not stated",
+    "incident_location": "location, or null if not stated",
+    "police_case_number": "case number, or null if the report has none",
     "fault_determination": "who was at fault",
-    "estimated_repair_cost": numeric value from estimate,
+    "estimated_repair_cost": numeric total from estimate, or null if none,
     "repair_items": ["list of items to be repaired"],
     "inconsistencies": ["any discrepancies between documents or with image analysis"],
     "red_flags": ["any suspicious elements"],
     "document_authenticity_assessment": "your assessment"
 }}"""
 
-        # Build content array with documents
-        content = []
-
-        # Add police report
-        if police_content_type == 'application/pdf':
-            content.append({
-                "type": "document",
-                "source": {
-                    "type": "base64",
-                    "media_type": "application/pdf",
-                    "data": police_base64
-                }
-            })
-        else:
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": police_content_type,
-                    "data": police_base64
-                }
-            })
-
-        # Add repair estimate
-        if estimate_content_type == 'application/pdf':
-            content.append({
-                "type": "document",
-                "source": {
-                    "type": "base64",
-                    "media_type": "application/pdf",
-                    "data": estimate_base64
-                }
-            })
-        else:
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": estimate_content_type,
-                    "data": estimate_base64
-                }
-            })
+        prompt = render_prompt('documents', render, {
+            'damage': damage_findings(damage_analysis, DAMAGE_FIELDS_FOR_DOCUMENTS) if damage_analysis else None
+        })
+
+        # PDFs are read and trimmed to their relevant pages (concurrently);
+        # images stay as streams
+        triage_futures = [
+            fetch_executor.submit(triage_document, uri, obj) if content_type == 'application/pdf' else None
+            for uri, obj, content_type in ((police_report_uri, police_obj, police_content_type),
+                                           (repair_estimate_uri, estimate_obj, estimate_content_type))
+        ]
+
+        # Build the request body with both documents, base64-encoded into one buffer
+        body_builder = MessagesBodyBuilder(max_tokens=1500, **tool_fields(DOCUMENT_TOOL, DOCUMENT_SCHEMA))
+        for future, obj, content_type in ((triage_futures[0], police_obj, police_content_type),
+                                          (triage_futures[1], estimate_obj, estimate_content_type)):
+            if future is not None:
+                body_builder.add_document(content_type, future.result(timeout=FETCH_TIMEOUT_SECONDS))
+            else:
+                body_builder.add_image(content_type, obj['Body'], obj['ContentLength'])
 
         # Add text prompt
-        content.append({"type": "text", "text": prompt})
-
-        response = bedrock.invoke_model(
-            modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1500,
-                "messages": [{"role": "user", "content": content}]
-            })
-        )
-
-        bedrock_result = json.loads(response['body'].read())
-        analysis_text = bedrock_result['content'][0]['text']
-
-        # Try to parse as JSON
-        try:
-            return json.loads(analysis_text)
-        except:
-            return {'raw_analysis': analysis_text}
+        request_body = body_builder.add_text(prompt).build(executor=fetch_executor, timeout=FETCH_TIMEOUT_SECONDS)
+        print(f"Document request body: {len(request_body)} bytes")
+
+        # Parsed and validated once here; later steps receive the typed result
+        analysis = invoke_structured('us.anthropic.claude-3-7-sonnet-20250219-v1:0', request_body, DOCUMENT_TOOL, DOCUMENT_SCHEMA)
+        del request_body
+
+        # The full analysis goes to the claim context; the agent gets a summary and the key
+        return claim_context.store_and_summarize(context_key, 'document_analysis', analysis, {
+            'success': True,
+            'incident_date': analysis['incident_date'],
+            'police_case_number': analysis['police_case_number'],
+            'fault_determination': analysis['fault_determination'],
+            'estimated_repair_cost': analysis['estimated_repair_cost'],
+            'inconsistency_count': len(analysis['inconsistencies']),
+            'red_flag_count': len(analysis['red_flags'])
+        })
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        # Don't let settlement pick up an earlier attempt's analysis
+        claim_context.clear_section(context_key, 'document_analysis')
         return {
             'error': str(e),
             'message': 'Error analyzing documents'
         }
 
-def parse_s3_uri(uri):
-    parts = uri.replace("s3://", "").split("/", 1)
-    return parts[0], parts[1]
\ No newline at end of file
+def triage_document(uri, obj):
+    """Read a PDF and keep only the pages worth sending under the page and byte budget"""
+    result = triage_pdf(obj['Body'].read())
+    if result.split:
+        print(f"PDF {uri}: {result.page_count} pages, {result.original_bytes} bytes -> "
+              f"pages {result.selected_pages}, {len(result.data)} bytes")
+    else:
+        print(f"PDF {uri}: {result.page_count} pages, {result.original_bytes} bytes sent whole")
+    return result.data
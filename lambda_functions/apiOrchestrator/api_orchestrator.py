@@ -1,8 +1,12 @@
+import base64
+import codecs
 import json
 import boto3
 from botocore.config import Config
 import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Configure boto3 with extended timeouts for long-running agent calls
@@ -12,19 +16,75 @@ bedrock_config = Config(
     retries={'max_attempts': 3, 'mode': 'adaptive'}
 )
 
+# Step Lambdas run for minutes; never retry an invocation that may still be running
+lambda_config = Config(
+    read_timeout=900,
+    connect_timeout=60,
+    retries={'total_max_attempts': 1, 'mode': 'standard'}
+)
+
 bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', config=bedrock_config)
+lambda_client = boto3.client('lambda', config=lambda_config)
 dynamodb = boto3.resource('dynamodb')
+s3 = boto3.client('s3')
 
 BEDROCK_AGENT_ID = os.environ['BEDROCK_AGENT_ID']
 BEDROCK_AGENT_ALIAS_ID = os.environ['BEDROCK_AGENT_ALIAS_ID']
 CLAIMS_TABLE = os.environ.get('CLAIMS_TABLE', 'autosettled-claims')
 
+# Claims listing: GSIs sorted by timestamp (see template.yaml), newest first
+# ?status= filters on dashboard_status, the same value claim_summary returns
+CLAIM_STATUS_INDEX = 'dashboard_status-timestamp-index'
+CLAIM_CUSTOMER_INDEX = 'customer_id-timestamp-index'
+# The all-claims listing is partitioned by month ('claims#2025-06') and read
+# month by month, newest first, going back at most CLAIM_LISTING_MONTHS
+CLAIM_LISTING_INDEX = 'listing-timestamp-index'
+CLAIM_LISTING_PREFIX = 'claims#'
+CLAIM_LISTING_MONTHS = int(os.environ.get('CLAIM_LISTING_MONTHS', 24))
+# status and timestamp are DynamoDB reserved words, hence the placeholders
+CLAIM_SUMMARY_FIELDS = ('claim_id', 'customer_id', 'customer_name', 'policy_number', '#status',
+                        'recommendation', 'risk_assessment', 'approved_amount', '#timestamp')
+MAX_CLAIMS_PAGE_SIZE = 100
+
+# Async agent runs: POST /agent/invoke with "async": true queues a job that a
+# worker invocation of this same function runs; clients poll GET /agent/jobs/{jobId}
+AGENT_JOBS_TABLE = os.environ.get('AGENT_JOBS_TABLE', 'autosettled-agent-jobs')
+AGENT_JOB_TTL_SECONDS = int(os.environ.get('AGENT_JOB_TTL_SECONDS', 24 * 3600))
+# Larger traces go to S3 so the job item stays under DynamoDB's 400 KB limit
+AGENT_JOB_INLINE_TRACE_BYTES = 300 * 1024
+# A worker killed by the Lambda timeout or a crash never marks its job finished,
+# so each job carries a deadline; a poll past it reports the job TIMED_OUT.
+# Queued jobs get AGENT_JOB_QUEUE_SECONDS to be picked up, running jobs the
+# worker's remaining invocation time
+AGENT_JOB_QUEUE_SECONDS = int(os.environ.get('AGENT_JOB_QUEUE_SECONDS', 300))
+AGENT_JOB_FINISHED_STATUSES = ('COMPLETE', 'FAILED', 'TIMED_OUT')
+# While a job runs, its partial output is written at most this often for pollers
+AGENT_JOB_PROGRESS_INTERVAL_SECONDS = float(os.environ.get('AGENT_JOB_PROGRESS_INTERVAL_SECONDS', 0.5))
+S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', '')
+
+# Action-group Lambdas the direct pipeline (POST /claim/process) calls in order
+CUSTOMER_VERIFICATION_FUNCTION = os.environ.get('CUSTOMER_VERIFICATION_FUNCTION', 'autosettled-customer-verification')
+POLICY_VERIFICATION_FUNCTION = os.environ.get('POLICY_VERIFICATION_FUNCTION', 'autosettled-policy-verification')
+DAMAGE_ANALYSIS_FUNCTION = os.environ.get('DAMAGE_ANALYSIS_FUNCTION', 'autosettled-damage-analysis')
+DOCUMENT_ANALYSIS_FUNCTION = os.environ.get('DOCUMENT_ANALYSIS_FUNCTION', 'autosettled-document-analysis')
+SETTLEMENT_DECISION_FUNCTION = os.environ.get('SETTLEMENT_DECISION_FUNCTION', 'autosettled-settlement-decision')
+
+PROCESS_CLAIM_FIELDS = ('first_name', 'last_name', 'email', 'policy_id', 'image_uris',
+                        'police_report_uri', 'repair_estimate_uri')
+
+# Damage and document analysis run side by side
+pipeline_executor = ThreadPoolExecutor(max_workers=2)
+
 def lambda_handler(event, context):
     """
     API Gateway Orchestrator for AutoSettled
     Handles all API routes and invokes Bedrock Agent
     """
 
+    # Worker invocation queued by an async /agent/invoke request
+    if 'agent_job' in event:
+        return run_agent_job(event['agent_job'], context)
+
     # Headers (CORS handled by Lambda Function URL)
     headers = {
         'Content-Type': 'application/json'
@@ -55,12 +115,24 @@ def lambda_handler(event, context):
 
         # Route: POST /agent/invoke - Invoke Bedrock Agent
         if path == '/agent/invoke' and method == 'POST':
+            if body.get('async'):
+                return enqueue_agent_job(body, headers)
             return invoke_bedrock_agent(body, headers)
 
+        # Route: GET /agent/jobs/{jobId} - Poll an async agent run
+        elif path.startswith('/agent/jobs/') and method == 'GET':
+            path_params = event.get('pathParameters', {})
+            job_id = path_params.get('jobId') if path_params else path.split('/')[-1]
+            return get_agent_job(job_id, headers)
+
         # Route: POST /claim/start - Start new claim session
         elif path == '/claim/start' and method == 'POST':
             return start_claim_session(headers)
 
+        # Route: POST /claim/process - Run a complete submission without the agent
+        elif path == '/claim/process' and method == 'POST':
+            return process_claim(body, headers)
+
         # Route: GET /claim/{claimId} - Get claim status
         elif path.startswith('/claim/') and method == 'GET':
             # Extract claim_id from path
@@ -74,8 +146,8 @@ def lambda_handler(event, context):
 
         # Route: GET /claims - List all claims
         elif path == '/claims' and method == 'GET':
-            limit = int(event.get('queryStringParameters', {}).get('limit', 50))
-            return list_claims(limit, headers)
+            query = event.get('queryStringParameters') or {}
+            return list_claims(query, headers)
 
         else:
             return {
@@ -93,6 +165,60 @@ def lambda_handler(event, context):
         }
 
 
+def run_agent(input_text, session_id, enable_trace, on_chunk=None):
+    """Invoke the Bedrock Agent and read its whole response stream; returns (output text, trace events)
+
+    on_chunk, if given, is called with each piece of decoded text as it arrives.
+    """
+    print(f"Invoking Bedrock Agent - Session: {session_id}, Input: {input_text[:100]}...")
+
+    # Invoke Bedrock Agent; streamFinalResponse sends the final answer in chunks
+    # as it is generated instead of one chunk at the end
+    response = bedrock_agent_runtime.invoke_agent(
+        agentId=BEDROCK_AGENT_ID,
+        agentAliasId=BEDROCK_AGENT_ALIAS_ID,
+        sessionId=session_id,
+        inputText=input_text,
+        enableTrace=enable_trace,
+        streamingConfigurations={'streamFinalResponse': True}
+    )
+
+    print("Agent invoked, processing stream...")
+
+    # Process streaming response; a multi-byte character may be split across
+    # chunks, so decode incrementally and join once at the end
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    output_parts = []
+    output_length = 0
+    trace_data = []
+    chunk_count = 0
+
+    def emit(text):
+        if text:
+            output_parts.append(text)
+            if on_chunk:
+                on_chunk(text)
+        return len(text)
+
+    event_stream = response['completion']
+    for event in event_stream:
+        if 'chunk' in event:
+            chunk = event['chunk']
+            if 'bytes' in chunk:
+                output_length += emit(decoder.decode(chunk['bytes']))
+                chunk_count += 1
+                if chunk_count % 10 == 0:
+                    print(f"Processed {chunk_count} chunks, output length: {output_length}")
+
+        if enable_trace and 'trace' in event:
+            trace_data.append(event['trace'])
+
+    output_length += emit(decoder.decode(b'', final=True))
+
+    print(f"Stream complete. Total chunks: {chunk_count}, Total output: {output_length} chars")
+    return ''.join(output_parts), trace_data
+
+
 def invoke_bedrock_agent(body, headers):
     """Invoke Bedrock Agent with user input"""
 
@@ -108,38 +234,7 @@ def invoke_bedrock_agent(body, headers):
         }
 
     try:
-        print(f"Invoking Bedrock Agent - Session: {session_id}, Input: {input_text[:100]}...")
-
-        # Invoke Bedrock Agent
-        response = bedrock_agent_runtime.invoke_agent(
-            agentId=BEDROCK_AGENT_ID,
-            agentAliasId=BEDROCK_AGENT_ALIAS_ID,
-            sessionId=session_id,
-            inputText=input_text,
-            enableTrace=enable_trace
-        )
-
-        print("Agent invoked, processing stream...")
-
-        # Process streaming response
-        output_text = ""
-        trace_data = []
-        chunk_count = 0
-
-        event_stream = response['completion']
-        for event in event_stream:
-            if 'chunk' in event:
-                chunk = event['chunk']
-                if 'bytes' in chunk:
-                    output_text += chunk['bytes'].decode('utf-8')
-                    chunk_count += 1
-                    if chunk_count % 10 == 0:
-                        print(f"Processed {chunk_count} chunks, output length: {len(output_text)}")
-
-            if enable_trace and 'trace' in event:
-                trace_data.append(event['trace'])
-
-        print(f"Stream complete. Total chunks: {chunk_count}, Total output: {len(output_text)} chars")
+        output_text, trace_data = run_agent(input_text, session_id, enable_trace)
 
         result = {
             'sessionId': session_id,
@@ -165,6 +260,313 @@ def invoke_bedrock_agent(body, headers):
         }
 
 
+def enqueue_agent_job(body, headers):
+    """Record an agent run as a queued job, hand it to a worker invocation and return 202 right away"""
+
+    input_text = body.get('inputText', '')
+    if not input_text:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': 'inputText is required'})
+        }
+
+    job = {
+        'job_id': str(uuid.uuid4()),
+        'session_id': body.get('sessionId', str(uuid.uuid4())),
+        'input_text': input_text,
+        'enable_trace': bool(body.get('enableTrace', False))
+    }
+    now = datetime.utcnow().isoformat()
+    table = dynamodb.Table(AGENT_JOBS_TABLE)
+    table.put_item(Item={
+        'job_id': job['job_id'],
+        'session_id': job['session_id'],
+        'status': 'QUEUED',
+        'created_at': now,
+        'updated_at': now,
+        'deadline_at': int(time.time()) + AGENT_JOB_QUEUE_SECONDS,
+        'expires_at': int(time.time()) + AGENT_JOB_TTL_SECONDS
+    })
+
+    try:
+        lambda_client.invoke(
+            FunctionName=os.environ['AWS_LAMBDA_FUNCTION_NAME'],
+            InvocationType='Event',
+            Payload=json.dumps({'agent_job': job})
+        )
+    except Exception as e:
+        print(f"Error queueing agent job {job['job_id']}: {str(e)}")
+        update_agent_job(job['job_id'], 'FAILED', error=f'Failed to queue job: {str(e)}')
+        raise
+
+    print(f"Queued agent job {job['job_id']} - Session: {job['session_id']}")
+
+    return {
+        'statusCode': 202,
+        'headers': headers,
+        'body': json.dumps({'jobId': job['job_id'], 'sessionId': job['session_id'], 'status': 'QUEUED'})
+    }
+
+
+def update_agent_job(job_id, status, condition_status=None, **fields):
+    """Set a job's status and fields; with condition_status, only if the job is still in that status"""
+    fields.update(status=status, updated_at=datetime.utcnow().isoformat())
+    kwargs = {
+        'Key': {'job_id': job_id},
+        'UpdateExpression': 'SET ' + ', '.join(f"#{name} = :{name}" for name in fields),
+        'ExpressionAttributeNames': {f"#{name}": name for name in fields},
+        'ExpressionAttributeValues': {f":{name}": value for name, value in fields.items()}
+    }
+    if condition_status:
+        kwargs['ConditionExpression'] = '#status = :expected'
+        kwargs['ExpressionAttributeValues'][':expected'] = condition_status
+    dynamodb.Table(AGENT_JOBS_TABLE).update_item(**kwargs)
+
+
+def run_agent_job(job, context):
+    """Worker: run a queued agent job and store its output and trace for polling"""
+    job_id = job['job_id']
+
+    # Claim the job; a duplicate delivery of the same event finds it already taken.
+    # Past the deadline this invocation has been killed, whatever the job item says
+    deadline_at = int(time.time() + context.get_remaining_time_in_millis() / 1000)
+    try:
+        update_agent_job(job_id, 'RUNNING', condition_status='QUEUED', deadline_at=deadline_at)
+    except Exception as e:
+        print(f"Agent job {job_id} not started: {str(e)}")
+        return {'jobId': job_id, 'status': 'SKIPPED'}
+
+    started = time.time()
+    progress = {'parts': [], 'written_at': None}
+
+    def on_chunk(text):
+        # Publish the output so far: right away for the first chunk, then throttled
+        progress['parts'].append(text)
+        now = time.time()
+        if progress['written_at'] is not None and now - progress['written_at'] < AGENT_JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        fields = {'output': ''.join(progress['parts'])}
+        if progress['written_at'] is None:
+            fields['first_output_ms'] = int((now - started) * 1000)
+            print(f"Agent job {job_id} first output after {now - started:.1f}s")
+        progress['written_at'] = now
+        try:
+            update_agent_job(job_id, 'RUNNING', **fields)
+        except Exception as e:
+            print(f"Error writing agent job progress: {str(e)}")
+
+    try:
+        output_text, trace_data = run_agent(job['input_text'], job['session_id'], job['enable_trace'], on_chunk)
+        result = {'output': output_text, 'completion': 'COMPLETE'}
+        if job['enable_trace']:
+            trace_json = json.dumps(trace_data, default=str)
+            if len(trace_json) <= AGENT_JOB_INLINE_TRACE_BYTES:
+                result['trace'] = trace_json
+            else:
+                trace_key = f"agent-jobs/{job_id}/trace.json"
+                s3.put_object(Bucket=S3_BUCKET_NAME, Key=trace_key, Body=trace_json.encode('utf-8'),
+                              ContentType='application/json')
+                result['trace_s3_key'] = trace_key
+        update_agent_job(job_id, 'COMPLETE', duration_seconds=int(time.time() - started), **result)
+        print(f"Agent job {job_id} complete in {time.time() - started:.1f}s")
+        return {'jobId': job_id, 'status': 'COMPLETE'}
+
+    except Exception as e:
+        print(f"Error running agent job {job_id}: {str(e)}")
+        update_agent_job(job_id, 'FAILED', error=f'Failed to invoke agent: {str(e)}')
+        return {'jobId': job_id, 'status': 'FAILED'}
+
+
+def get_agent_job(job_id, headers):
+    """Get an async agent run's status, and its output once complete"""
+
+    try:
+        table = dynamodb.Table(AGENT_JOBS_TABLE)
+        item = table.get_item(Key={'job_id': job_id}).get('Item')
+
+        if not item:
+            return {
+                'statusCode': 404,
+                'headers': headers,
+                'body': json.dumps({'error': 'Job not found'})
+            }
+
+        # The worker died (timeout, crash) or never started: finish the job for it
+        if item['status'] not in AGENT_JOB_FINISHED_STATUSES and int(item.get('deadline_at', time.time())) < time.time():
+            stuck_status = item['status']
+            error = 'Agent job was not picked up in time' if stuck_status == 'QUEUED' else 'Agent job timed out'
+            try:
+                update_agent_job(job_id, 'TIMED_OUT', condition_status=stuck_status, error=error)
+                print(f"Agent job {job_id} timed out while {stuck_status}")
+            except Exception as e:
+                # The worker finished in the meantime
+                print(f"Agent job {job_id} not timed out: {str(e)}")
+            item = table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+
+        result = {
+            'jobId': item['job_id'],
+            'sessionId': item['session_id'],
+            'status': item['status'],
+            'createdAt': item['created_at'],
+            'updatedAt': item['updated_at']
+        }
+        if item['status'] == 'COMPLETE':
+            result['output'] = item.get('output', '')
+            result['completion'] = item.get('completion', 'COMPLETE')
+            if 'trace' in item:
+                result['trace'] = json.loads(item['trace'])
+            elif 'trace_s3_key' in item:
+                result['traceUrl'] = s3.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': S3_BUCKET_NAME, 'Key': item['trace_s3_key']},
+                    ExpiresIn=3600
+                )
+        elif item['status'] == 'RUNNING':
+            # Partial output published by the worker as the agent streams
+            result['output'] = item.get('output', '')
+        elif item['status'] in ('FAILED', 'TIMED_OUT'):
+            result['error'] = item.get('error')
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps(result, default=str)
+        }
+
+    except Exception as e:
+        print(f"Error getting agent job: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def invoke_step(function_name, function, parameters, session_id):
+    """Invoke an action-group Lambda directly with an agent-format event and return its result body"""
+    event = {
+        'messageVersion': '1.0',
+        'agent': {'name': 'direct-pipeline'},
+        'actionGroup': 'direct-pipeline',
+        'function': function,
+        'sessionId': session_id,
+        'parameters': [{'name': name, 'value': value} for name, value in parameters.items() if value is not None]
+    }
+    started = time.time()
+    response = lambda_client.invoke(FunctionName=function_name, Payload=json.dumps(event))
+    payload = json.loads(response['Payload'].read())
+    print(f"Step {function} finished in {time.time() - started:.1f}s")
+    if response.get('FunctionError'):
+        raise RuntimeError(f"{function} failed: {payload.get('errorMessage', payload)}")
+    return json.loads(payload['response']['functionResponse']['responseBody']['TEXT']['body'])
+
+
+def inline_sections(**results):
+    """Full step results a step returned inline because it could not save them to the claim context"""
+    return {section: json.dumps(result[section]) for section, result in results.items() if section in result}
+
+
+def pipeline_stopped(step, session_id, steps, headers):
+    print(f"Claim pipeline stopped at {step} - Session: {session_id}")
+    return {
+        'statusCode': 422,
+        'headers': headers,
+        'body': json.dumps({'sessionId': session_id, 'status': 'STOPPED', 'failed_step': step, 'steps': steps})
+    }
+
+
+def process_claim(body, headers):
+    """Run a complete claim submission through the step Lambdas in order, without agent orchestration"""
+
+    missing = [field for field in PROCESS_CLAIM_FIELDS if not body.get(field)]
+    if missing:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': f"Missing required fields: {', '.join(missing)}"})
+        }
+
+    # The session ID is also the claim context key the steps share
+    session_id = body.get('sessionId', str(uuid.uuid4()))
+    image_uris = body['image_uris']
+    if isinstance(image_uris, str):
+        image_uris = [uri.strip() for uri in image_uris.strip('[]').split(',')]
+    steps = {}
+    started = time.time()
+
+    try:
+        print(f"Processing claim directly - Session: {session_id}")
+
+        customer = invoke_step(CUSTOMER_VERIFICATION_FUNCTION, 'verifyCustomer', {
+            'first_name': body['first_name'],
+            'last_name': body['last_name'],
+            'email': body['email']
+        }, session_id)
+        steps['customer'] = customer
+        if not customer.get('verified'):
+            return pipeline_stopped('customer', session_id, steps, headers)
+
+        policy = invoke_step(POLICY_VERIFICATION_FUNCTION, 'verifyPolicy', {
+            'policy_id': body['policy_id'],
+            'customer_id': customer['customer_id']
+        }, session_id)
+        steps['policy'] = policy
+        if not policy.get('verified'):
+            return pipeline_stopped('policy', session_id, steps, headers)
+
+        # Document analysis gets the policy vehicle (VIN, make, model, year) up front instead
+        # of waiting for the damage result; the settlement step still weighs the two against each other
+        damage_future = pipeline_executor.submit(invoke_step, DAMAGE_ANALYSIS_FUNCTION, 'analyzeDamageImages', {
+            'image_uris': image_uris,
+            'policy_id': body['policy_id']
+        }, session_id)
+        document_future = pipeline_executor.submit(invoke_step, DOCUMENT_ANALYSIS_FUNCTION, 'analyzeDocuments', {
+            'police_report_uri': body['police_report_uri'],
+            'repair_estimate_uri': body['repair_estimate_uri'],
+            'damage_analysis': json.dumps({'vehicle_vin': policy.get('vehicle_vin'),
+                                           'vehicle_data': policy.get('vehicle_data') or {}})
+        }, session_id)
+        damage = damage_future.result()
+        documents = document_future.result()
+        steps['damage'] = damage
+        steps['documents'] = documents
+        if not damage.get('success'):
+            return pipeline_stopped('damage', session_id, steps, headers)
+        if 'error' in documents:
+            return pipeline_stopped('documents', session_id, steps, headers)
+
+        # Settlement loads everything else from the claim context
+        settlement = invoke_step(SETTLEMENT_DECISION_FUNCTION, 'generateSettlementDecision', inline_sections(
+            customer_data=customer, policy_data=policy, damage_analysis=damage, document_analysis=documents
+        ), session_id)
+        steps['settlement'] = settlement
+        if 'error' in settlement:
+            return pipeline_stopped('settlement', session_id, steps, headers)
+
+        print(f"Claim {settlement['claim_id']} processed directly in {time.time() - started:.1f}s")
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'sessionId': session_id,
+                'status': 'COMPLETE',
+                'claim_id': settlement['claim_id'],
+                'pdf_url': settlement['pdf_url'],
+                'steps': steps
+            })
+        }
+
+    except Exception as e:
+        print(f"Error processing claim: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': f'Failed to process claim: {str(e)}', 'sessionId': session_id, 'steps': steps})
+        }
+
+
 def start_claim_session(headers):
     """Start a new claim session"""
 
@@ -173,12 +575,16 @@ def start_claim_session(headers):
     # Create claim record in DynamoDB
     try:
         table = dynamodb.Table(CLAIMS_TABLE)
+        now = datetime.utcnow().isoformat()
         table.put_item(
             Item={
                 'claim_id': session_id,
                 'status': 'IN_PROGRESS',
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat()
+                'dashboard_status': 'IN_PROGRESS',
+                'listing': CLAIM_LISTING_PREFIX + now[:7],
+                'timestamp': now,
+                'created_at': now,
+                'updated_at': now
             }
         )
     except Exception as e:
@@ -239,19 +645,136 @@ def get_claim_status(claim_id, headers):
         }
 
 
-def list_claims(limit, headers):
-    """List all claims"""
+def encode_page_token(index_name, last_key, month=None):
+    """Opaque cursor for the next page; bound to the index (and listing month) it came from"""
+    cursor = {'index': index_name, 'key': last_key}
+    if month:
+        cursor['month'] = month
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
 
+
+def decode_page_token(token, index_name):
+    """Returns (last key or None, listing month or None)"""
     try:
-        table = dynamodb.Table(CLAIMS_TABLE)
-        response = table.scan(Limit=limit)
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid nextToken')
+    if not isinstance(cursor, dict) or cursor.get('index') != index_name:
+        raise ValueError('nextToken does not match this listing')
+    return cursor['key'], cursor.get('month')
+
+
+def previous_month(month):
+    """'2025-01' -> '2024-12'"""
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year - 1}-12" if number == 1 else f"{year}-{number - 1:02d}"
+
+
+def listing_months(start_month):
+    """The listing partitions still to read, newest first, from start_month back to the oldest listed month"""
+    oldest = datetime.utcnow().strftime('%Y-%m')
+    for _ in range(CLAIM_LISTING_MONTHS - 1):
+        oldest = previous_month(oldest)
+    month = start_month
+    while month >= oldest:
+        yield month
+        month = previous_month(month)
+
+
+def claim_summary(item):
+    """The fields the dashboard shows for one claim"""
+    amount = item.get('approved_amount')
+    return {
+        'claim_id': item['claim_id'],
+        'customer_id': item.get('customer_id'),
+        'customer_name': item.get('customer_name', ''),
+        'policy_number': item.get('policy_number', ''),
+        'status': item.get('recommendation', 'MANUAL_REVIEW') if item.get('status') == 'processed' else 'IN_PROGRESS',
+        'risk_level': item.get('risk_assessment'),
+        'amount': float(amount) if amount is not None else None,
+        'created_at': item.get('timestamp')
+    }
+
+
+def query_claims_page(index_name, key_name, partitions, limit, start_key):
+    """Query index partitions in order until limit claims are read
+
+    Returns the items and where the next page starts: (last key or None,
+    partition), or None when every partition has been read.
+    """
+    table = dynamodb.Table(CLAIMS_TABLE)
+    items = []
+    for position, partition in enumerate(partitions):
+        query_kwargs = {
+            'IndexName': index_name,
+            'KeyConditionExpression': f"{key_name} = :key",
+            'ExpressionAttributeValues': {':key': partition},
+            'ProjectionExpression': ', '.join(CLAIM_SUMMARY_FIELDS),
+            'ExpressionAttributeNames': {'#status': 'status', '#timestamp': 'timestamp'},
+            'ScanIndexForward': False,
+            'Limit': limit - len(items)
+        }
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        if start_key:
+            return items, (start_key, partition)
+        if len(items) >= limit:
+            if position + 1 < len(partitions):
+                return items, (None, partitions[position + 1])
+            return items, None
+    return items, None
+
+
+def list_claims(query, headers):
+    """List claims newest first, one indexed page at a time"""
+
+    try:
+        try:
+            limit = max(1, min(int(query.get('limit', 50)), MAX_CLAIMS_PAGE_SIZE))
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': f"limit must be an integer, got {query.get('limit')!r}"})
+            }
+
+        start_key, month = None, None
+        if query.get('nextToken'):
+            index_name = CLAIM_CUSTOMER_INDEX if query.get('customer_id') else (
+                CLAIM_STATUS_INDEX if query.get('status') else CLAIM_LISTING_INDEX)
+            try:
+                start_key, month = decode_page_token(query['nextToken'], index_name)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': str(e)})
+                }
+
+        # Filter by customer or status if asked, otherwise read the monthly all-claims listing
+        if query.get('customer_id'):
+            index_name, key_name, partitions = CLAIM_CUSTOMER_INDEX, 'customer_id', [query['customer_id']]
+        elif query.get('status'):
+            index_name, key_name, partitions = CLAIM_STATUS_INDEX, 'dashboard_status', [query['status']]
+        else:
+            index_name, key_name = CLAIM_LISTING_INDEX, 'listing'
+            partitions = [CLAIM_LISTING_PREFIX + m for m in listing_months(month or datetime.utcnow().strftime('%Y-%m'))]
+
+        items, resume = query_claims_page(index_name, key_name, partitions, limit, start_key)
 
-        claims = response.get('Items', [])
+        result = {'claims': [claim_summary(item) for item in items]}
+        if resume:
+            last_key, partition = resume
+            month = partition[len(CLAIM_LISTING_PREFIX):] if index_name == CLAIM_LISTING_INDEX else None
+            result['nextToken'] = encode_page_token(index_name, last_key, month)
 
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps(claims, default=str)
+            'body': json.dumps(result, default=str)
         }
 
     except Exception as e:
@@ -1,5 +1,8 @@
-import boto3
 import json
+from autosettled_common.bloom import customer_filter_key
+from autosettled_common.cache import record_cache
+from autosettled_common.snapshot import current_snapshot
+from autosettled_common import claim_context, portfolio, repositories
 
 def lambda_handler(event, context):
     print("Received event:", json.dumps(event))
@@ -11,10 +14,25 @@ def lambda_handler(event, context):
     # Check which format we received
     if 'agent' in event:
         # New agent format with tool use
-        return handle_new_format(event, context)
+        response = handle_new_format(event, context)
     else:
         # Old action group format
-        return handle_old_format(event, context)
+        response = handle_old_format(event, context)
+
+    print(f"Record cache stats: {json.dumps(record_cache.stats())}")
+    return response
+
+def lookup_customer(first_name, last_name, email):
+    """Skip the snapshot for identities its membership filter rules out; DynamoDB stays authoritative"""
+    # Membership filter over (normalized email, last name), built with the snapshot.
+    # A miss only means the snapshot lacks the customer: anyone added since the
+    # export is still found through the email index.
+    snapshot = current_snapshot()
+    customer_filter = snapshot.customer_filter() if snapshot else None
+    if customer_filter is not None and customer_filter_key(email, last_name) not in customer_filter:
+        print("Customer not in snapshot filter; querying DynamoDB")
+        return repositories.find_customer(first_name, last_name, email, use_snapshot=False)
+    return repositories.find_customer(first_name, last_name, email)
 
 def handle_new_format(event, context):
     """Handle new Bedrock Agent format with function/tool use"""
@@ -36,74 +54,28 @@ def handle_new_format(event, context):
 
     print(f"Parameters - first_name: {first_name}, last_name: {last_name}, email: {email}")
 
-    # Query DynamoDB
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamodb.Table('autosettled-customers')
-
     try:
-        response = table.scan(
-            FilterExpression='first_name = :fn AND last_name = :ln AND email = :em',
-            ExpressionAttributeValues={
-                ':fn': first_name,
-                ':ln': last_name,
-                ':em': email
-            }
-        )
+        customer = lookup_customer(first_name, last_name, email)
 
-        if response['Items']:
-            customer = response['Items'][0]
+        if customer:
             customer_id = customer.get('customer_id')
 
-            # Fetch all active policies for this customer
+            # Active policies come from the materialized portfolio item (one GetItem)
             policies = []
             try:
-                policy_table = dynamodb.Table('autosettled-policies')
-                policy_response = policy_table.scan(
-                    FilterExpression='customer_id = :cid AND policy_status = :status',
-                    ExpressionAttributeValues={
-                        ':cid': customer_id,
-                        ':status': 'Active'
-                    }
-                )
-
-                # For each policy, fetch vehicle information
-                vehicle_table = dynamodb.Table('autosettled-vehicles')
-                for policy in policy_response.get('Items', []):
-                    policy_id = policy.get('policy_id')
-
-                    # Fetch vehicle for this policy
-                    vehicle_response = vehicle_table.scan(
-                        FilterExpression='policy_id = :pid',
-                        ExpressionAttributeValues={':pid': policy_id}
-                    )
-
-                    vehicle = vehicle_response.get('Items', [{}])[0] if vehicle_response.get('Items') else {}
-
-                    # Build enriched policy object
-                    policies.append({
-                        'policy_id': policy.get('policy_id'),
-                        'policy_number': policy.get('policy_number'),
-                        'policy_type': policy.get('policy_type'),
-                        'vehicle_year': str(vehicle.get('year_of_manufacture', '')),
-                        'vehicle_make': vehicle.get('make', ''),
-                        'vehicle_model': vehicle.get('model', ''),
-                        'vehicle_type': vehicle.get('vehicle_type', ''),
-                        'premium_amount': float(policy.get('premium_amount', 0)),
-                        'coverage_amount': float(policy.get('coverage_amount', 0)),
-                        'deductible_amount': float(policy.get('deductible_amount', 0))
-                    })
-
+                policies = portfolio.get_portfolio_policies(customer_id)
             except Exception as pe:
                 print(f"Error fetching policies: {str(pe)}")
                 # Continue even if policy fetch fails
 
-            result_body = {
+            # The full customer record starts a fresh claim context; the agent gets a summary and the key
+            result_body = claim_context.store_and_summarize(claim_context.context_key(event), 'customer_data', customer, {
                 'verified': True,
                 'customer_id': customer_id,
-                'customer_data': customer,
+                'customer_name': f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip(),
                 'policies': policies,
                 'message': f"Customer {first_name} {last_name} verified successfully. Found {len(policies)} active policy(ies)"
-            }
+            }, new_claim=True)
         else:
             result_body = {
                 'verified': False,
@@ -157,74 +129,28 @@ def handle_old_format(event, context):
 
     print(f"Parameters - first_name: {first_name}, last_name: {last_name}, email: {email}")
 
-    # Query DynamoDB
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamodb.Table('autosettled-customers')
-
     try:
-        response = table.scan(
-            FilterExpression='first_name = :fn AND last_name = :ln AND email = :em',
-            ExpressionAttributeValues={
-                ':fn': first_name,
-                ':ln': last_name,
-                ':em': email
-            }
-        )
+        customer = lookup_customer(first_name, last_name, email)
 
-        if response['Items']:
-            customer = response['Items'][0]
+        if customer:
             customer_id = customer.get('customer_id')
 
-            # Fetch all active policies for this customer
+            # Active policies come from the materialized portfolio item (one GetItem)
             policies = []
             try:
-                policy_table = dynamodb.Table('autosettled-policies')
-                policy_response = policy_table.scan(
-                    FilterExpression='customer_id = :cid AND policy_status = :status',
-                    ExpressionAttributeValues={
-                        ':cid': customer_id,
-                        ':status': 'Active'
-                    }
-                )
-
-                # For each policy, fetch vehicle information
-                vehicle_table = dynamodb.Table('autosettled-vehicles')
-                for policy in policy_response.get('Items', []):
-                    policy_id = policy.get('policy_id')
-
-                    # Fetch vehicle for this policy
-                    vehicle_response = vehicle_table.scan(
-                        FilterExpression='policy_id = :pid',
-                        ExpressionAttributeValues={':pid': policy_id}
-                    )
-
-                    vehicle = vehicle_response.get('Items', [{}])[0] if vehicle_response.get('Items') else {}
-
-                    # Build enriched policy object
-                    policies.append({
-                        'policy_id': policy.get('policy_id'),
-                        'policy_number': policy.get('policy_number'),
-                        'policy_type': policy.get('policy_type'),
-                        'vehicle_year': str(vehicle.get('year_of_manufacture', '')),
-                        'vehicle_make': vehicle.get('make', ''),
-                        'vehicle_model': vehicle.get('model', ''),
-                        'vehicle_type': vehicle.get('vehicle_type', ''),
-                        'premium_amount': float(policy.get('premium_amount', 0)),
-                        'coverage_amount': float(policy.get('coverage_amount', 0)),
-                        'deductible_amount': float(policy.get('deductible_amount', 0))
-                    })
-
+                policies = portfolio.get_portfolio_policies(customer_id)
             except Exception as pe:
                 print(f"Error fetching policies: {str(pe)}")
                 # Continue even if policy fetch fails
 
-            result = {
+            # The full customer record starts a fresh claim context; the agent gets a summary and the key
+            result = claim_context.store_and_summarize(claim_context.context_key(event), 'customer_data', customer, {
                 'verified': True,
                 'customer_id': customer_id,
-                'customer_data': customer,
+                'customer_name': f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip(),
                 'policies': policies,
                 'message': f"Customer {first_name} {last_name} verified successfully. Found {len(policies)} active policy(ies)"
-            }
+            }, new_claim=True)
         else:
             result = {
                 'verified': False,
@@ -1,16 +1,47 @@
-import boto3
 import json
 from datetime import datetime
 import uuid
 from decimal import Decimal
 import io
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from autosettled_common import claim_context, repositories
+from autosettled_common.bedrock import bedrock_invoker
+from autosettled_common.clients import get_s3
+from autosettled_common.prompts import (DAMAGE_FIELDS_FOR_DECISION, DOCUMENT_FIELDS_FOR_DECISION, STEP_BUDGETS,
+                                        damage_findings, document_findings, estimate_tokens,
+                                        record_prompt_metrics, render_prompt)
+from autosettled_common.schemas import DECISION_SCHEMA, DECISION_TOOL, SINGLE_PASS_DECISION_SCHEMA, coerce
+from autosettled_common.streaming import IncrementalJsonObjectParser, iter_text_deltas
+from autosettled_common.structured import invoke_tool, tool_fields, validated
+
+# Bounded pool for the report prose calls, reused across warm invocations
+PROSE_MAX_WORKERS = int(os.environ.get('PROSE_MAX_WORKERS', 2))
+PROSE_TIMEOUT_SECONDS = int(os.environ.get('PROSE_TIMEOUT_SECONDS', 120))
+prose_executor = ThreadPoolExecutor(max_workers=PROSE_MAX_WORKERS)
+
+DECISION_MODEL_ID = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+
+# 'separate': the report summary and reasoning are two extra model calls
+# 'single_pass': the decision call returns them as claim_summary / decision_reasoning
+SETTLEMENT_REPORT_MODE = os.environ.get('SETTLEMENT_REPORT_MODE', 'separate')
+
+SINGLE_PASS_REPORT_FIELDS = """
+- claim_summary: professional 2-paragraph summary for the settlement report: what happened (incident date, location, police case, fault, damage severity, estimated repair cost, crash cause) and how the claim was analyzed
+- decision_reasoning: professional 2-paragraph explanation for the settlement report of why this decision was made: how the photos, police report and documents were weighed, the genuine and suspicious factors, and the risk criteria considered"""
+
+# Stream the decision call and, as soon as the leading fields below have
+# arrived, build the report tables and write a preliminary claim record while
+# the long reasoning fields are still being generated
+SETTLEMENT_STREAMING = os.environ.get('SETTLEMENT_STREAMING', 'false').lower() == 'true'
+EARLY_DECISION_FIELDS = ('recommendation', 'approved_amount', 'deductible_applies', 'customer_pays', 'insurance_pays')
+early_executor = ThreadPoolExecutor(max_workers=2)
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -25,58 +56,92 @@ def safe_float(value, default=0):
     except (ValueError, TypeError):
         return default
 
-def extract_json_from_text(text):
-    """Extract JSON from text that may contain ```json code blocks or raw JSON"""
-    if not isinstance(text, str):
-        return text
-
-    # Try to find JSON in code blocks first
-    import re
-    json_pattern = r'```json\s*(.*?)\s*```'
-    matches = re.findall(json_pattern, text, re.DOTALL)
-
-    if matches:
-        # Try to parse the first JSON block found
-        for match in matches:
-            try:
-                return json.loads(match)
-            except:
-                continue
-
-    # If no code blocks, try to parse the entire text as JSON
+def generate_report_prose(prompt, max_tokens):
+    """Ask Claude for one prose section of the settlement report"""
+    record_prompt_metrics('report_prose', prompt, estimate_tokens(prompt), STEP_BUDGETS['report_prose'])
+    result = bedrock_invoker.invoke(
+        'us.anthropic.claude-3-7-sonnet-20250219-v1:0',
+        json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+            "messages": [{"role": "user", "content": prompt}]
+        })
+    )
+    return result['content'][0]['text']
+
+def start_report_prose(precomputed, prompt, max_tokens):
+    """Return a future for a prose section, calling the model only if the decision did not already include it"""
+    if isinstance(precomputed, str) and precomputed.strip():
+        future = Future()
+        future.set_result(precomputed)
+        return future
+    return prose_executor.submit(generate_report_prose, prompt, max_tokens)
+
+def collect_report_prose(future, section, fallback):
+    """Wait for a prose section; a failed or slow call falls back without affecting the other"""
     try:
-        return json.loads(text)
-    except:
-        # If all fails, return as dict with raw text
-        return {'raw_text': text}
-
-def generate_settlement_pdf(claim_id, customer_data, policy_data, damage_analysis, document_analysis, decision_json, timestamp):
-    """Generate a professional PDF settlement report"""
-
-    # Extract JSON from text responses
-    damage_analysis = extract_json_from_text(damage_analysis) if isinstance(damage_analysis, str) else damage_analysis
-    document_analysis = extract_json_from_text(document_analysis) if isinstance(document_analysis, str) else document_analysis
-
-    # Get nested analysis data if available
-    if isinstance(damage_analysis, dict):
-        damage_data = damage_analysis.get('analysis', damage_analysis)
-        # If 'analysis' is a string, extract JSON from it
-        if isinstance(damage_data, str):
-            damage_data = extract_json_from_text(damage_data)
-    else:
-        damage_data = {}
-
-    # Handle document_analysis similarly
-    if isinstance(document_analysis, dict):
-        doc_data = document_analysis.get('raw_analysis', document_analysis)
-        if isinstance(doc_data, str):
-            doc_data = extract_json_from_text(doc_data)
-    else:
-        doc_data = {}
+        return future.result(timeout=PROSE_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"Error generating report {section}: {str(e)}")
+        future.cancel()
+        return fallback
+
+def invoke_decision_model(request_body):
+    """Call the decision model and return its tool input, unvalidated"""
+    return invoke_tool(DECISION_MODEL_ID, request_body, DECISION_TOOL)
+
+def stream_decision_model(request_body, on_early_fields):
+    """Stream the decision model, calling on_early_fields once the leading fields are complete; returns the tool input"""
+    events = bedrock_invoker.invoke_stream(DECISION_MODEL_ID, request_body)
+    parser = IncrementalJsonObjectParser()
+    fields = {}
+    parts = []
+    early_started = False
+    for text in iter_text_deltas(events):
+        parts.append(text)
+        for key, value in parser.feed(text):
+            fields[key] = value
+        if not early_started and all(name in fields for name in EARLY_DECISION_FIELDS):
+            early_started = True
+            on_early_fields(dict(fields))
+    try:
+        return json.loads(''.join(parts))
+    except ValueError:
+        # A truncated tool input still yields its completed members
+        return fields
+
+def start_early_settlement_work(claim_id, timestamp, customer_data, policy_data, early_fields):
+    """Build the report tables and write a preliminary claim record from the leading decision fields"""
+    header_future = early_executor.submit(build_report_header, claim_id, customer_data, policy_data, early_fields, timestamp)
+    record_future = early_executor.submit(repositories.put_claim, {
+        'claim_id': claim_id,
+        'customer_id': customer_data.get('customer_id', 'unknown'),
+        'policy_id': policy_data.get('policy_id', 'unknown'),
+        'timestamp': timestamp,
+        'recommendation': early_fields.get('recommendation', 'MANUAL_REVIEW'),
+        'approved_amount': early_fields.get('approved_amount', 0),
+        'status': 'deciding',
+        **claim_listing_fields(customer_data, policy_data)
+    })
+    return header_future, record_future
+
+def claim_listing_fields(customer_data, policy_data):
+    """Denormalized names the claims listing index projects, so the dashboard never reads the full record"""
+    return {
+        'customer_name': f"{customer_data.get('first_name', '')} {customer_data.get('last_name', '')}".strip(),
+        'policy_number': policy_data.get('policy_number', policy_data.get('policy_id', 'unknown'))
+    }
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+def fallback_summary(doc_data, damage_data, decision_json):
+    """Plain summary used when the model call for the report summary fails"""
+    return (f"Incident on {doc_data.get('incident_date') or 'N/A'} at {doc_data.get('incident_location') or 'N/A'}. "
+            f"Damage severity: {damage_data.get('severity', 'N/A')}. "
+            f"{damage_data.get('damage_summary', '')} "
+            f"Decision: {decision_json.get('recommendation', 'PENDING')}.")
 
+def build_report_header(claim_id, customer_data, policy_data, decision_json, timestamp):
+    """Build the report title and the claim, customer, policy and decision tables"""
     elements = []
     styles = getSampleStyleSheet()
 
@@ -186,17 +251,22 @@ def generate_settlement_pdf(claim_id, customer_data, policy_data, damage_analysi
     elements.append(decision_table)
     elements.append(Spacer(1, 20))
 
-    # AI-Generated Claim Summary - Comprehensive narrative
-    elements.append(Paragraph("Claim Summary", heading_style))
+    return elements, styles, heading_style
 
-    # Generate AI summary using Bedrock
-    bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+def generate_settlement_pdf(claim_id, customer_data, policy_data, damage_data, doc_data, decision_json, timestamp, header=None):
+    """Generate a professional PDF settlement report from the parsed damage and document findings"""
 
+    # Findings that never parsed to fields (e.g. free text passed by the agent) leave the table cells as N/A
+    damage_data = damage_data if isinstance(damage_data, dict) else {}
+    doc_data = doc_data if isinstance(doc_data, dict) else {}
+
+    # Both prose sections are independent, so request them together and
+    # build the tables while the model is writing
     summary_prompt = f"""Write a professional 2-paragraph summary for an insurance claim settlement report. Use the following data:
 
-Incident Date: {doc_data.get('incident_date', 'N/A')}
-Location: {doc_data.get('incident_location', 'N/A')}
-Police Case: {doc_data.get('police_case_number', 'N/A')}
+Incident Date: {doc_data.get('incident_date') or 'N/A'}
+Location: {doc_data.get('incident_location') or 'N/A'}
+Police Case: {doc_data.get('police_case_number') or 'N/A'}
 Fault Determination: {doc_data.get('fault_determination', 'N/A')}
 Damage Severity: {damage_data.get('severity', 'N/A')}
 Estimated Repair Cost: ${safe_float(damage_data.get('estimated_repair_cost_usd', 0)):,.2f}
@@ -207,25 +277,6 @@ Customer Name: {customer_data.get('first_name', '')} {customer_data.get('last_na
 
 Write a professional, factual summary explaining what happened and how our AI system analyzed the claim. Make it sound authoritative and show our AI's analytical capabilities."""
 
-    summary_response = bedrock.invoke_model(
-        modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 500,
-            "temperature": 0.7,
-            "messages": [{"role": "user", "content": summary_prompt}]
-        })
-    )
-
-    summary_result = json.loads(summary_response['body'].read())
-    ai_summary = summary_result['content'][0]['text']
-
-    elements.append(Paragraph(ai_summary, styles['BodyText']))
-    elements.append(Spacer(1, 20))
-
-    # AI-Generated Decision Reasoning
-    elements.append(Paragraph("Decision Reasoning", heading_style))
-
     reasoning_prompt = f"""Write a detailed 2-paragraph explanation of why this insurance claim decision was made. Use the following information:
 
 Decision: {decision_json.get('recommendation', 'PENDING')}
@@ -243,18 +294,30 @@ Write professionally, explaining:
 
 Make it sound like a sophisticated AI reasoning system made this decision."""
 
-    reasoning_response = bedrock.invoke_model(
-        modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 600,
-            "temperature": 0.7,
-            "messages": [{"role": "user", "content": reasoning_prompt}]
-        })
-    )
+    summary_future = start_report_prose(decision_json.get('claim_summary'), summary_prompt, 500)
+    reasoning_future = start_report_prose(decision_json.get('decision_reasoning'), reasoning_prompt, 600)
 
-    reasoning_result = json.loads(reasoning_response['body'].read())
-    ai_reasoning = reasoning_result['content'][0]['text']
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+    # The header and tables only need the leading decision fields, so the
+    # streaming path may already have built them
+    if header is None:
+        header = build_report_header(claim_id, customer_data, policy_data, decision_json, timestamp)
+    elements, styles, heading_style = header
+
+    # AI-Generated Claim Summary - Comprehensive narrative
+    elements.append(Paragraph("Claim Summary", heading_style))
+
+    ai_summary = collect_report_prose(summary_future, 'summary', fallback_summary(doc_data, damage_data, decision_json))
+
+    elements.append(Paragraph(ai_summary, styles['BodyText']))
+    elements.append(Spacer(1, 20))
+
+    # AI-Generated Decision Reasoning
+    elements.append(Paragraph("Decision Reasoning", heading_style))
+
+    ai_reasoning = collect_report_prose(reasoning_future, 'reasoning', decision_json.get('detailed_reasoning', 'Reasoning unavailable.'))
 
     elements.append(Paragraph(ai_reasoning, styles['BodyText']))
     elements.append(Spacer(1, 12))
@@ -281,6 +344,7 @@ Make it sound like a sophisticated AI reasoning system made this decision."""
 
 def lambda_handler(event, context):
     print("Received event:", json.dumps(event))
+    bedrock_invoker.start_invocation(context)
 
     # Bedrock Agents for Amazon Bedrock has TWO formats:
     # 1. Old format: actionGroup, apiPath, parameters
@@ -289,10 +353,13 @@ def lambda_handler(event, context):
     # Check which format we received
     if 'agent' in event:
         # New agent format with tool use
-        return handle_new_format(event, context)
+        response = handle_new_format(event, context)
     else:
         # Old action group format
-        return handle_old_format(event, context)
+        response = handle_old_format(event, context)
+
+    bedrock_invoker.flush_metrics()
+    return response
 
 def handle_new_format(event, context):
     """Handle new Bedrock Agent format with function/tool use"""
@@ -314,6 +381,14 @@ def handle_new_format(event, context):
     damage_analysis = param_dict.get('damage_analysis', {})
     document_analysis = param_dict.get('document_analysis', {})
 
+    # Anything the agent did not pass, or passed as a summary, is loaded from the claim context
+    claim = claim_context.fill_missing(claim_context.context_key(event), {
+        'customer_data': customer_data, 'policy_data': policy_data,
+        'damage_analysis': damage_analysis, 'document_analysis': document_analysis
+    })
+    customer_data, policy_data = claim['customer_data'], claim['policy_data']
+    damage_analysis, document_analysis = claim['damage_analysis'], claim['document_analysis']
+
     # Parse JSON strings if needed (handle both pure JSON and text with embedded JSON)
     if isinstance(customer_data, str):
         try:
@@ -325,18 +400,7 @@ def handle_new_format(event, context):
             policy_data = json.loads(policy_data)
         except:
             policy_data = {}
-    if isinstance(damage_analysis, str):
-        try:
-            damage_analysis = json.loads(damage_analysis)
-        except:
-            # Keep as text if not valid JSON
-            damage_analysis = {'raw_text': damage_analysis}
-    if isinstance(document_analysis, str):
-        try:
-            document_analysis = json.loads(document_analysis)
-        except:
-            # Keep as text if not valid JSON
-            document_analysis = {'raw_text': document_analysis}
+    # The analyses are parsed once, in generate_settlement_decision
 
     print(f"Processing claim for customer: {customer_data.get('customer_id', 'unknown')}")
 
@@ -369,24 +433,30 @@ def handle_old_format(event, context):
     http_method = event.get('httpMethod', 'POST')
     parameters = event.get('parameters', [])
 
-    # Helper function to safely parse JSON or keep as dict/text
+    # Helper function to safely parse JSON, falling back to an empty dict
     def safe_json_parse(value):
         if isinstance(value, str):
             try:
                 return json.loads(value)
             except:
-                return {'raw_text': value}
+                return {}
         return value
 
-    # Extract all data from parameters
+    # Extract all data from parameters; the analyses are parsed once, in generate_settlement_decision
     customer_data = next((safe_json_parse(p['value'])
                          for p in parameters if p['name'] == 'customer_data'), {})
     policy_data = next((safe_json_parse(p['value'])
                        for p in parameters if p['name'] == 'policy_data'), {})
-    damage_analysis = next((safe_json_parse(p['value'])
-                           for p in parameters if p['name'] == 'damage_analysis'), {})
-    document_analysis = next((safe_json_parse(p['value'])
-                             for p in parameters if p['name'] == 'document_analysis'), {})
+    damage_analysis = next((p['value'] for p in parameters if p['name'] == 'damage_analysis'), {})
+    document_analysis = next((p['value'] for p in parameters if p['name'] == 'document_analysis'), {})
+
+    # Anything the agent did not pass, or passed as a summary, is loaded from the claim context
+    claim = claim_context.fill_missing(claim_context.context_key(event), {
+        'customer_data': customer_data, 'policy_data': policy_data,
+        'damage_analysis': damage_analysis, 'document_analysis': document_analysis
+    })
+    customer_data, policy_data = claim['customer_data'], claim['policy_data']
+    damage_analysis, document_analysis = claim['damage_analysis'], claim['document_analysis']
 
     print(f"Processing claim for customer: {customer_data.get('customer_id', 'unknown')}")
 
@@ -421,14 +491,27 @@ def generate_settlement_decision(customer_data, policy_data, damage_analysis, do
     """Core business logic for generating settlement decision"""
     from datetime import datetime
 
-    try:
-        bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+    # Work started from the streamed leading fields (preliminary record, report header)
+    early_work = {}
 
+    try:
         # Get current date
         current_date = datetime.now().strftime('%B %d, %Y')
 
-        # Enhanced prompt for comprehensive reasoning
-        prompt = f"""Today's date is {current_date}.
+        # In single-pass mode the decision also carries the report prose, so
+        # the PDF needs no further model calls
+        single_pass = SETTLEMENT_REPORT_MODE == 'single_pass'
+        report_fields = SINGLE_PASS_REPORT_FIELDS if single_pass else ""
+        decision_schema = SINGLE_PASS_DECISION_SCHEMA if single_pass else DECISION_SCHEMA
+
+        # Parse each upstream analysis once; the prompt and the PDF both use these
+        damage_data = damage_findings(damage_analysis, DAMAGE_FIELDS_FOR_DECISION)
+        doc_data = document_findings(document_analysis, DOCUMENT_FIELDS_FOR_DECISION)
+
+        # Enhanced prompt for comprehensive reasoning; the analyses are
+        # embedded as compact JSON holding only the fields the decision uses
+        def render(damage, documents):
+            return f"""Today's date is {current_date}.
 
 You are an expert insurance claims adjuster. Analyze this auto insurance claim comprehensively and provide a detailed settlement decision with full reasoning.
 
@@ -447,52 +530,80 @@ POLICY DETAILS:
 - Policy Status: {policy_data.get('policy_status', 'N/A')}
 
 DAMAGE ANALYSIS FROM IMAGES:
-{json.dumps(damage_analysis, indent=2)}
+{damage}
 
 DOCUMENT ANALYSIS (Police Report & Repair Estimate):
-{json.dumps(document_analysis, indent=2)}
-
-Provide a comprehensive JSON response with:
-{{
-    "recommendation": "APPROVE/MANUAL_REVIEW/DENY",
-    "approved_amount": numeric value (or 0 if denied),
-    "deductible_applies": boolean,
-    "customer_pays": numeric value,
-    "insurance_pays": numeric value,
-    "genuine_factors": ["list of legitimate aspects"],
-    "suspicious_factors": ["list of questionable aspects"],
-    "risk_assessment": "low/medium/high",
-    "detailed_reasoning": "comprehensive explanation of decision",
-    "supporting_evidence": ["key points that support the decision"],
-    "next_steps": ["what should happen next"]
-}}
+{documents}
+
+Record your decision with the {DECISION_TOOL} tool:
+- recommendation: APPROVE, MANUAL_REVIEW or DENY
+- approved_amount: numeric value (or 0 if denied)
+- deductible_applies, customer_pays, insurance_pays
+- genuine_factors: legitimate aspects of the claim
+- suspicious_factors: questionable aspects of the claim
+- risk_assessment: low, medium or high
+- detailed_reasoning: comprehensive explanation of the decision
+- supporting_evidence: key points that support the decision
+- next_steps: what should happen next{report_fields}
 
 Be thorough, fair, and provide detailed reasoning for your decision."""
 
-        response = bedrock.invoke_model(
-            modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 2000,
-                "temperature": 0.3,
-                "messages": [{"role": "user", "content": prompt}]
-            })
-        )
-
-        bedrock_result = json.loads(response['body'].read())
-        decision_text = bedrock_result['content'][0]['text']
+        prompt = render_prompt('decision', render, {'damage': damage_data, 'documents': doc_data})
 
-        # Extract JSON from the decision text (may contain ```json blocks)
-        decision_json = extract_json_from_text(decision_text)
+        request_body = json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 3500 if single_pass else 2000,
+            "temperature": 0.3,
+            "messages": [{"role": "user", "content": prompt}],
+            **tool_fields(DECISION_TOOL, decision_schema)
+        })
 
         claim_id = str(uuid.uuid4())
         timestamp = datetime.now().isoformat()
 
+        def on_early_fields(fields):
+            fields = coerce(fields, decision_schema)
+            print(f"Early decision fields for claim {claim_id}: {fields.get('recommendation')}")
+            early_work['fields'] = fields
+            early_work['claim_id'] = claim_id
+            early_work['header'], early_work['record'] = start_early_settlement_work(
+                claim_id, timestamp, customer_data, policy_data, fields)
+
+        raw_decision = None
+        if SETTLEMENT_STREAMING:
+            try:
+                raw_decision = stream_decision_model(request_body, on_early_fields)
+            except Exception as e:
+                # Retry without streaming only if nothing was started from the stream
+                if early_work:
+                    raise
+                print(f"Streaming decision failed, falling back to invoke_model: {str(e)}")
+        if raw_decision is None:
+            raw_decision = invoke_decision_model(request_body)
+
+        # Validated against the decision schema, with one repair call if needed
+        decision_json = validated(raw_decision, decision_schema, DECISION_TOOL, DECISION_MODEL_ID)
+
+        # Reuse the early tables only if the final decision agrees with the
+        # streamed fields, and let the preliminary write land before the final one
+        header = None
+        if early_work:
+            try:
+                early_work['record'].result()
+            except Exception as e:
+                print(f"Error writing preliminary claim record: {str(e)}")
+            try:
+                header = early_work['header'].result()
+            except Exception as e:
+                print(f"Error building report header early: {str(e)}")
+            if any(decision_json.get(name) != early_work['fields'].get(name) for name in EARLY_DECISION_FIELDS):
+                header = None
+
         # Generate PDF
-        pdf_buffer = generate_settlement_pdf(claim_id, customer_data, policy_data, damage_analysis, document_analysis, decision_json, timestamp)
+        pdf_buffer = generate_settlement_pdf(claim_id, customer_data, policy_data, damage_data, doc_data, decision_json, timestamp, header)
 
         # Upload PDF to S3
-        s3 = boto3.client('s3', region_name='us-east-1')
+        s3 = get_s3()
         bucket_name = os.environ.get('S3_BUCKET_NAME', 'autosettled-documents-986341371998')
         pdf_key = f"settlements/{claim_id}_settlement_decision.pdf"
 
@@ -511,35 +622,24 @@ Be thorough, fair, and provide detailed reasoning for your decision."""
         )
 
         # Save comprehensive record to DynamoDB
-        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-        table = dynamodb.Table('claims-records')
-
-        # Convert to Decimal for DynamoDB
-        def convert_to_decimal(obj):
-            if isinstance(obj, dict):
-                return {k: convert_to_decimal(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_to_decimal(i) for i in obj]
-            elif isinstance(obj, float):
-                return Decimal(str(obj))
-            return obj
-
-        table.put_item(Item={
+        repositories.put_claim({
             'claim_id': claim_id,
             'customer_id': customer_data.get('customer_id', 'unknown'),
             'policy_id': policy_data.get('policy_id', 'unknown'),
             'timestamp': timestamp,
-            'recommendation': decision_json.get('recommendation', 'MANUAL_REVIEW') if isinstance(decision_json, dict) else 'MANUAL_REVIEW',
-            'approved_amount': convert_to_decimal(decision_json.get('approved_amount', 0)) if isinstance(decision_json, dict) else Decimal('0'),
-            'decision_summary': decision_text[:500],
+            'recommendation': decision_json['recommendation'],
+            'approved_amount': decision_json['approved_amount'],
+            'decision_summary': decision_json['detailed_reasoning'][:500],
+            'risk_assessment': decision_json['risk_assessment'],
             'status': 'processed',
+            **claim_listing_fields(customer_data, policy_data),
             'pdf_url': pdf_url,
             'pdf_s3_key': pdf_key,
-            'customer_data': convert_to_decimal(customer_data),
-            'policy_data': convert_to_decimal(policy_data),
-            'damage_analysis': convert_to_decimal(damage_analysis),
-            'document_analysis': convert_to_decimal(document_analysis),
-            'decision': convert_to_decimal(decision_json)
+            'customer_data': customer_data,
+            'policy_data': policy_data,
+            'damage_analysis': damage_analysis,
+            'document_analysis': document_analysis,
+            'decision': decision_json
         })
 
         # Add pdf_url to decision for frontend
@@ -567,7 +667,21 @@ Claim ID: {claim_id}"""
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        if early_work:
+            discard_preliminary_record(early_work)
         return {
             'error': str(e),
             'message': 'Error generating settlement decision'
-        }
\ No newline at end of file
+        }
+
+
+def discard_preliminary_record(early_work):
+    """Remove the 'deciding' record of a settlement that failed, so it is not listed as in progress forever"""
+    try:
+        # Let the preliminary write land first, or it could recreate the record
+        early_work['record'].result()
+        claim_id = early_work['claim_id']
+        if repositories.delete_preliminary_claim(claim_id):
+            print(f"Deleted preliminary record of failed claim {claim_id}")
+    except Exception as e:
+        print(f"Error discarding preliminary claim record: {str(e)}")
\ No newline at end of file
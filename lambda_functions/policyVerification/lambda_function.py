@@ -1,7 +1,9 @@
-import boto3
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
+from autosettled_common.cache import record_cache
+from autosettled_common import claim_context, repositories
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -9,6 +11,9 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+# Module-scope pool so warm invocations reuse the worker threads
+executor = ThreadPoolExecutor(max_workers=4)
+
 def lambda_handler(event, context):
     print("Received event:", json.dumps(event))
 
@@ -19,10 +24,13 @@ def lambda_handler(event, context):
     # Check which format we received
     if 'agent' in event:
         # New agent format with tool use
-        return handle_new_format(event, context)
+        response = handle_new_format(event, context)
     else:
         # Old action group format
-        return handle_old_format(event, context)
+        response = handle_old_format(event, context)
+
+    print(f"Record cache stats: {json.dumps(record_cache.stats())}")
+    return response
 
 def handle_new_format(event, context):
     """Handle new Bedrock Agent format with function/tool use"""
@@ -43,62 +51,7 @@ def handle_new_format(event, context):
 
     print(f"Parameters - policy_id: {policy_id}, customer_id: {customer_id}")
 
-    # Query DynamoDB
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamodb.Table('autosettled-policies')
-
-    try:
-        response = table.get_item(Key={'policy_id': policy_id})
-
-        if 'Item' not in response:
-            result_body = {
-                'verified': False,
-                'message': 'Policy not found'
-            }
-        elif response['Item']['customer_id'] != customer_id:
-            result_body = {
-                'verified': False,
-                'message': 'Policy does not belong to this customer'
-            }
-        elif response['Item']['policy_status'] != 'Active':
-            result_body = {
-                'verified': False,
-                'message': f"Policy is {response['Item']['policy_status']}, not Active"
-            }
-        else:
-            policy = response['Item']
-            end_date = datetime.strptime(policy['policy_end_date'], '%Y-%m-%d')
-            if end_date < datetime.now():
-                result_body = {
-                    'verified': False,
-                    'message': 'Policy expired'
-                }
-            else:
-                # Fetch vehicle data to get VIN
-                vehicle_vin = None
-                try:
-                    vehicle_table = dynamodb.Table('autosettled-vehicles')
-                    vehicle_response = vehicle_table.scan(
-                        FilterExpression='policy_id = :pid',
-                        ExpressionAttributeValues={':pid': policy_id}
-                    )
-                    if vehicle_response.get('Items'):
-                        vehicle_vin = vehicle_response['Items'][0].get('vin')
-                except Exception as ve:
-                    print(f"Error fetching vehicle: {str(ve)}")
-
-                result_body = {
-                    'verified': True,
-                    'policy_data': json.loads(json.dumps(policy, cls=DecimalEncoder)),
-                    'vehicle_vin': vehicle_vin,
-                    'message': f"Policy {policy.get('policy_number', policy_id)} verified successfully" + (f". Vehicle VIN: {vehicle_vin}" if vehicle_vin else "")
-                }
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        result_body = {
-            'verified': False,
-            'error': str(e)
-        }
+    result_body = perform_policy_verification(policy_id, customer_id, claim_context.context_key(event))
 
     # New format response
     return {
@@ -131,61 +84,7 @@ def handle_old_format(event, context):
 
     print(f"Parameters - policy_id: {policy_id}, customer_id: {customer_id}")
 
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamodb.Table('autosettled-policies')
-
-    try:
-        response = table.get_item(Key={'policy_id': policy_id})
-
-        if 'Item' not in response:
-            result = {
-                'verified': False,
-                'message': 'Policy not found'
-            }
-        elif response['Item']['customer_id'] != customer_id:
-            result = {
-                'verified': False,
-                'message': 'Policy does not belong to this customer'
-            }
-        elif response['Item']['policy_status'] != 'Active':
-            result = {
-                'verified': False,
-                'message': f"Policy is {response['Item']['policy_status']}, not Active"
-            }
-        else:
-            policy = response['Item']
-            end_date = datetime.strptime(policy['policy_end_date'], '%Y-%m-%d')
-            if end_date < datetime.now():
-                result = {
-                    'verified': False,
-                    'message': 'Policy expired'
-                }
-            else:
-                # Fetch vehicle data to get VIN
-                vehicle_vin = None
-                try:
-                    vehicle_table = dynamodb.Table('autosettled-vehicles')
-                    vehicle_response = vehicle_table.scan(
-                        FilterExpression='policy_id = :pid',
-                        ExpressionAttributeValues={':pid': policy_id}
-                    )
-                    if vehicle_response.get('Items'):
-                        vehicle_vin = vehicle_response['Items'][0].get('vin')
-                except Exception as ve:
-                    print(f"Error fetching vehicle: {str(ve)}")
-
-                result = {
-                    'verified': True,
-                    'policy_data': json.loads(json.dumps(policy, cls=DecimalEncoder)),
-                    'vehicle_vin': vehicle_vin,
-                    'message': f"Policy {policy.get('policy_number', policy_id)} verified successfully" + (f". Vehicle VIN: {vehicle_vin}" if vehicle_vin else "")
-                }
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        result = {
-            'verified': False,
-            'error': str(e)
-        }
+    result = perform_policy_verification(policy_id, customer_id, claim_context.context_key(event))
 
     # Build response
     bedrock_response = {
@@ -209,4 +108,68 @@ def handle_old_format(event, context):
         bedrock_response['response']['apiPath'] = api_path
 
     print(f"Response: {json.dumps(bedrock_response)}")
-    return bedrock_response
\ No newline at end of file
+    return bedrock_response
+
+def perform_policy_verification(policy_id, customer_id, context_key=None):
+    """Core business logic for policy verification"""
+    # Start the vehicle lookup alongside the policy read so this step costs
+    # max(policy, vehicle) rather than their sum
+    vehicle_future = executor.submit(repositories.get_vehicle_for_policy, policy_id)
+
+    try:
+        policy = repositories.get_policy(policy_id)
+
+        if policy is None:
+            result = {
+                'verified': False,
+                'message': 'Policy not found'
+            }
+        elif policy['customer_id'] != customer_id:
+            result = {
+                'verified': False,
+                'message': 'Policy does not belong to this customer'
+            }
+        elif policy['policy_status'] != 'Active':
+            result = {
+                'verified': False,
+                'message': f"Policy is {policy['policy_status']}, not Active"
+            }
+        elif datetime.strptime(policy['policy_end_date'], '%Y-%m-%d') < datetime.now():
+            result = {
+                'verified': False,
+                'message': 'Policy expired'
+            }
+        else:
+            # Vehicle data gives us the VIN, and the make/model/year documents are checked against
+            vehicle_vin = None
+            vehicle_data = None
+            try:
+                vehicle = vehicle_future.result()
+                if vehicle:
+                    vehicle_vin = vehicle.get('vin')
+                    vehicle_data = json.loads(json.dumps(
+                        {field: vehicle.get(field) for field in ('make', 'model', 'year_of_manufacture')},
+                        cls=DecimalEncoder))
+            except Exception as ve:
+                print(f"Error fetching vehicle: {str(ve)}")
+
+            # The full policy goes to the claim context; the agent gets a summary and the key
+            return claim_context.store_and_summarize(context_key, 'policy_data', json.loads(json.dumps(policy, cls=DecimalEncoder)), {
+                'verified': True,
+                'policy_id': policy_id,
+                'vehicle_vin': vehicle_vin,
+                'vehicle_data': vehicle_data,
+                'message': f"Policy {policy.get('policy_number', policy_id)} verified successfully" + (f". Vehicle VIN: {vehicle_vin}" if vehicle_vin else "")
+            })
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        result = {
+            'verified': False,
+            'error': str(e)
+        }
+
+    # Verification failed: drop the vehicle lookup (a no-op if it already ran)
+    # and any policy an earlier attempt stored
+    vehicle_future.cancel()
+    claim_context.clear_section(context_key, 'policy_data')
+    return result
@@ -0,0 +1,36 @@
+import json
+from autosettled_common.portfolio import refresh_portfolios
+
+def lambda_handler(event, context):
+    """
+    DynamoDB Streams consumer for autosettled-policies and autosettled-vehicles
+    Rebuilds the materialized portfolio of every customer touched by the batch
+    """
+    records = event.get('Records', [])
+    print(f"Received {len(records)} stream records")
+
+    customer_ids = set()
+    policy_ids = set()
+    vehicle_ids = set()
+    for record in records:
+        dynamodb_data = record.get('dynamodb', {})
+        # Check both images so a policy or vehicle moved between customers refreshes both
+        for image_name in ('NewImage', 'OldImage'):
+            customer_id = dynamodb_data.get(image_name, {}).get('customer_id', {}).get('S')
+            if customer_id:
+                customer_ids.add(customer_id)
+        # The customer_id indexes may not show this change yet, so the
+        # changed rows are re-read by key when the portfolios are rebuilt
+        keys = dynamodb_data.get('Keys', {})
+        if 'vehicle_id' in keys:
+            vehicle_ids.add(keys['vehicle_id']['S'])
+        elif 'policy_id' in keys:
+            policy_ids.add(keys['policy_id']['S'])
+
+    refreshed = refresh_portfolios(customer_ids, policy_ids, vehicle_ids)
+    print(f"Refreshed {refreshed} customer portfolio(s)")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'refreshed': refreshed})
+    }
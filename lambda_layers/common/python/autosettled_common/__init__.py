@@ -0,0 +1 @@
+"""Shared helpers for the AutoSettled action-group Lambdas (deployed as a layer)"""
@@ -0,0 +1,55 @@
+"""Content-addressed cache of model analysis results, stored in DynamoDB with a TTL.
+
+The cache key is a SHA-256 over everything that determines the model's
+answer (input bytes, record attributes, prompt template version and model
+ID), so a retry or re-submission with identical inputs is served without
+calling the model again.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .clients import get_table
+
+ANALYSIS_CACHE_TABLE = os.environ.get('ANALYSIS_CACHE_TABLE', 'autosettled-analysis-cache')
+DEFAULT_TTL_SECONDS = int(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+
+
+def make_cache_key(namespace: str, blobs: Iterable[bytes], attributes: Dict[str, Any],
+                   prompt_version: str, model_id: str) -> str:
+    digest = hashlib.sha256()
+    for part in (namespace, prompt_version, model_id, json.dumps(attributes, sort_keys=True, default=str)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    for blob in blobs:
+        # Length-prefix each blob so concatenation boundaries cannot collide
+        digest.update(len(blob).to_bytes(8, 'big'))
+        digest.update(hashlib.sha256(blob).digest())
+    return f"{namespace}#{digest.hexdigest()}"
+
+
+def get_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Return a stored result, or None on a miss, an expired item or a read error"""
+    try:
+        item = get_table(ANALYSIS_CACHE_TABLE).get_item(Key={'cache_key': cache_key}).get('Item')
+    except Exception as e:
+        print(f"Analysis cache read failed: {str(e)}")
+        return None
+    # DynamoDB deletes expired items lazily, so check the TTL ourselves
+    if not item or int(item.get('expires_at', 0)) <= time.time():
+        return None
+    return json.loads(item['result'])
+
+
+def put_cached_result(cache_key: str, result: Dict[str, Any], ttl_seconds: int = DEFAULT_TTL_SECONDS) -> None:
+    try:
+        get_table(ANALYSIS_CACHE_TABLE).put_item(Item={
+            'cache_key': cache_key,
+            'result': json.dumps(result),
+            'created_at': int(time.time()),
+            'expires_at': int(time.time()) + ttl_seconds
+        })
+    except Exception as e:
+        print(f"Analysis cache write failed: {str(e)}")
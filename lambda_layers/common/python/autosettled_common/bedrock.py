@@ -0,0 +1,292 @@
+"""Shared Bedrock model invoker with admission control, backoff and metrics.
+
+Every model call in a container goes through one BedrockInvoker, which
+
+- caps concurrent calls per model with a semaphore,
+- paces call starts per model with a token bucket sized from the account
+  quota (BEDROCK_REQUESTS_PER_MINUTE is this container's share of it), and
+  halves that rate on throttling, growing it back on success,
+- retries throttling, transient errors, dropped connections and read
+  timeouts itself with full-jitter exponential backoff, never waiting past
+  the Lambda invocation deadline,
+- counts calls, retries, throttles and latency per model, flushed as
+  CloudWatch Embedded Metric Format log lines.
+
+botocore's own retries are disabled on the Bedrock client (see clients.py)
+so the two retry layers do not multiply.
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from botocore.exceptions import (ClientError, ConnectionClosedError, ConnectTimeoutError,
+                                 EndpointConnectionError, ReadTimeoutError)
+
+from .clients import get_bedrock_runtime
+
+METRICS_NAMESPACE = 'AutoSettled/Bedrock'
+
+THROTTLE_ERRORS = {'ThrottlingException', 'TooManyRequestsException'}
+RETRYABLE_ERRORS = THROTTLE_ERRORS | {
+    'ServiceUnavailableException', 'ModelNotReadyException', 'InternalServerException'}
+# Network failures botocore would retry itself if its retries were enabled
+CONNECTION_ERRORS = (EndpointConnectionError, ConnectTimeoutError, ConnectionClosedError, ReadTimeoutError)
+
+COUNTERS = ('Calls', 'Successes', 'Failures', 'Retries', 'Throttles', 'DeadlineExceeded')
+
+
+class BedrockDeadlineExceeded(Exception):
+    """Raised instead of waiting for a slot, a token or a retry that would outlive the invocation"""
+
+
+class TokenBucket:
+    """Token bucket whose refill rate backs off on throttling and recovers on success"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.max_rate = rate
+        self.min_rate = rate / 10
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns how many seconds to wait before it may be used"""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def cancel(self):
+        """Give back a reserved token that will not be used"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class _GuardedStream:
+    """Response-stream events that free their concurrency slot once consumed or discarded"""
+
+    def __init__(self, events: Iterable[dict], release: Callable[[], None]):
+        self._events = events
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._events
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    __del__ = close
+
+
+class BedrockInvoker:
+    """Per-container gatekeeper for bedrock-runtime invoke_model calls"""
+
+    def __init__(self, requests_per_minute: float = 20, burst: float = 4, max_concurrency: int = 4,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 20.0,
+                 deadline_margin: float = 5.0, client_factory: Callable[[], Any] = get_bedrock_runtime,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.requests_per_second = requests_per_minute / 60
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_margin = deadline_margin
+        self._client_factory = client_factory
+        self._clock = clock
+        self._sleep = sleep
+        self._deadline = None
+        self._limits = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            requests_per_minute=float(os.environ.get('BEDROCK_REQUESTS_PER_MINUTE', 20)),
+            burst=float(os.environ.get('BEDROCK_BURST', 4)),
+            max_concurrency=int(os.environ.get('BEDROCK_MAX_CONCURRENCY', 4)),
+            max_attempts=int(os.environ.get('BEDROCK_MAX_ATTEMPTS', 5)),
+            deadline_margin=float(os.environ.get('BEDROCK_DEADLINE_MARGIN_SECONDS', 5))
+        )
+
+    def start_invocation(self, context=None):
+        """Take the deadline for this Lambda invocation from its context, less a safety margin"""
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            remaining = context.get_remaining_time_in_millis() / 1000 - self.deadline_margin
+            self._deadline = self._clock() + max(0.0, remaining)
+        else:
+            self._deadline = None
+
+    def invoke(self, model_id: str, body: str) -> Dict[str, Any]:
+        """invoke_model and return the parsed response body"""
+        return self._call(model_id, 'invoke_model', body,
+                          lambda response, release: json.loads(response['body'].read()))
+
+    def invoke_stream(self, model_id: str, body: str) -> Iterable[dict]:
+        """invoke_model_with_response_stream; the model's slot is held until the events are consumed"""
+        return self._call(model_id, 'invoke_model_with_response_stream', body,
+                          lambda response, release: _GuardedStream(response['body'], release),
+                          hold_slot=True)
+
+    def _limits_for(self, model_id):
+        limits = self._limits.get(model_id)
+        if limits is None:
+            with self._lock:
+                limits = self._limits.get(model_id)
+                if limits is None:
+                    limits = (threading.BoundedSemaphore(self.max_concurrency),
+                              TokenBucket(self.requests_per_second, self.burst, self._clock))
+                    self._limits[model_id] = limits
+        return limits
+
+    def _remaining(self) -> Optional[float]:
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - self._clock())
+
+    def _wait(self, model_id, seconds, reason):
+        remaining = self._remaining()
+        if remaining is not None and seconds >= remaining:
+            self._count(model_id, 'DeadlineExceeded')
+            raise BedrockDeadlineExceeded(
+                f"{model_id}: {reason} wait of {seconds:.1f}s exceeds the {remaining:.1f}s left")
+        self._sleep(seconds)
+
+    def _call(self, model_id, operation, body, consume, hold_slot=False):
+        semaphore, bucket = self._limits_for(model_id)
+        self._count(model_id, 'Calls')
+        if not semaphore.acquire(timeout=self._remaining()):
+            self._count(model_id, 'DeadlineExceeded')
+            raise BedrockDeadlineExceeded(f"{model_id}: no free slot before the invocation deadline")
+        slot_handed_over = False
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                delay = bucket.reserve()
+                if delay > 0:
+                    try:
+                        self._wait(model_id, delay, 'rate limit')
+                    except BedrockDeadlineExceeded:
+                        bucket.cancel()
+                        raise
+                started = self._clock()
+                try:
+                    response = getattr(self._client_factory(), operation)(modelId=model_id, body=body)
+                    result = consume(response, semaphore.release)
+                except (ClientError,) + CONNECTION_ERRORS as e:
+                    if isinstance(e, ClientError):
+                        code = e.response.get('Error', {}).get('Code', '')
+                        retryable = code in RETRYABLE_ERRORS
+                    else:
+                        code, retryable = type(e).__name__, True
+                    if code in THROTTLE_ERRORS:
+                        self._count(model_id, 'Throttles')
+                        bucket.on_throttle()
+                    if not retryable or attempt >= self.max_attempts:
+                        self._count(model_id, 'Failures')
+                        raise
+                    self._count(model_id, 'Retries')
+                    backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                    print(f"Bedrock {code} on {model_id}, retry {attempt} in {backoff:.2f}s")
+                    self._wait(model_id, backoff, 'backoff')
+                    continue
+                except Exception:
+                    self._count(model_id, 'Failures')
+                    raise
+                bucket.on_success()
+                self._record_success(model_id, (self._clock() - started) * 1000)
+                slot_handed_over = hold_slot
+                return result
+        finally:
+            if not slot_handed_over:
+                semaphore.release()
+
+    def _model_stats(self, model_id):
+        stats = self._stats.get(model_id)
+        if stats is None:
+            stats = dict.fromkeys(COUNTERS, 0)
+            stats.update({'LatencyMsSum': 0.0, 'LatencyMsMax': 0.0})
+            self._stats[model_id] = stats
+        return stats
+
+    def _count(self, model_id, counter):
+        with self._lock:
+            self._model_stats(model_id)[counter] += 1
+
+    def _record_success(self, model_id, latency_ms):
+        with self._lock:
+            stats = self._model_stats(model_id)
+            stats['Successes'] += 1
+            stats['LatencyMsSum'] += latency_ms
+            stats['LatencyMsMax'] = max(stats['LatencyMsMax'], latency_ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Counters per model since the last flush, with average latency and current rate"""
+        with self._lock:
+            result = {}
+            for model_id, stats in self._stats.items():
+                entry = dict(stats)
+                latency_sum = entry.pop('LatencyMsSum')
+                entry['LatencyMsAvg'] = round(latency_sum / stats['Successes'], 1) if stats['Successes'] else 0.0
+                entry['LatencyMsMax'] = round(entry['LatencyMsMax'], 1)
+                limits = self._limits.get(model_id)
+                if limits is not None:
+                    entry['RequestsPerMinute'] = round(limits[1].rate * 60, 2)
+                result[model_id] = entry
+            return result
+
+    def flush_metrics(self):
+        """Print the counters as CloudWatch EMF log lines and reset them"""
+        stats = self.stats()
+        with self._lock:
+            self._stats = {}
+        for model_id, entry in stats.items():
+            print(json.dumps({
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [['ModelId']],
+                        'Metrics': [{'Name': name, 'Unit': 'Count'} for name in COUNTERS] + [
+                            {'Name': 'LatencyMsAvg', 'Unit': 'Milliseconds'},
+                            {'Name': 'LatencyMsMax', 'Unit': 'Milliseconds'},
+                            {'Name': 'RequestsPerMinute', 'Unit': 'Count'}
+                        ]
+                    }]
+                },
+                'ModelId': model_id,
+                **entry
+            }))
+
+
+# One invoker per container, shared by every thread making model calls
+bedrock_invoker = BedrockInvoker.from_env()
@@ -0,0 +1,85 @@
+"""Compact Bloom filter used to reject unknown customers without a DynamoDB call.
+
+The filter is built by export_reference_snapshot.py from the customers table
+and shipped inside the reference snapshot. Its header records the snapshot
+version and the number of customers it was built from, so a reader can
+refuse a filter that does not describe the data it is paired with.
+"""
+import hashlib
+import math
+import struct
+from typing import Iterable, Optional
+
+MAGIC = b'ASBF'
+# magic, format version, bit count, hash count, item count, source version
+HEADER = struct.Struct('>4sIQIQ32s')
+FORMAT_VERSION = 2
+
+
+def customer_filter_key(email: Optional[str], last_name: Optional[str]) -> str:
+    """Normalized (email, last name) pair used for both building and probing"""
+    return f"{(email or '').strip().lower()}|{(last_name or '').strip().lower()}"
+
+
+class BloomFilter:
+    """Bit-array Bloom filter with double hashing over a SHA-256 digest.
+
+    A negative answer is definitive; a positive answer must still be confirmed
+    against the table.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytearray] = None,
+                 item_count: int = 0, source_version: str = ''):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.item_count = item_count
+        self.source_version = source_version
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    @classmethod
+    def build(cls, keys: Iterable[str], source_version: str = '', false_positive_rate: float = 0.01):
+        keys = list(keys)
+        bloom = cls.for_capacity(len(keys), false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        bloom.item_count = len(keys)
+        bloom.source_version = source_version
+        return bloom
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        h1, h2 = struct.unpack_from('>QQ', digest)
+        h2 |= 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.num_bits, self.num_hashes, self.item_count,
+                           self.source_version.encode('utf-8')) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        try:
+            magic, version, num_bits, num_hashes, item_count, source_version = HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError('Truncated customer membership filter')
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('Not a customer membership filter of this format version')
+        bits = bytearray(data[HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError('Truncated customer membership filter')
+        return cls(num_bits, num_hashes, bits, item_count, source_version.rstrip(b'\0').decode('utf-8'))
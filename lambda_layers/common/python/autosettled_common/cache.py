@@ -0,0 +1,125 @@
+"""Warm-container read-through cache for customer and vehicle records
+
+Nothing invalidates entries across containers, so only records that can be
+served a few minutes stale belong here. Policies and portfolios are always
+read from DynamoDB.
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_ENTRIES = 1024
+
+# Reference tables change rarely compared with how often a claim reads them
+TABLE_TTLS = {
+    'autosettled-customers': 300,
+    'autosettled-vehicles': 300,
+}
+
+
+class RecordCache:
+    """Size-bounded LRU cache with a TTL per table and hit/miss counters.
+
+    Entries are keyed by (table name, record key). Values are deep-copied on
+    the way in and out so callers can mutate what they get back without
+    corrupting the cached copy. Missing records (None) are never cached, so a
+    newly created record is visible on the next lookup.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttls = dict(TABLE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, table: str) -> float:
+        return self.ttls.get(table, self.default_ttl)
+
+    def get(self, table: str, key: Hashable) -> Optional[Any]:
+        """Return a cached record, or None if it is absent or expired"""
+        cache_key = (table, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[cache_key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, table: str, key: Hashable, value: Any) -> None:
+        if value is None or self.max_entries <= 0:
+            return
+        cache_key = (table, key)
+        expires_at = self._clock() + self.ttl_for(table)
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[cache_key] = (expires_at, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, table: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached record, calling loader() and caching its result on a miss"""
+        value = self.get(table, key)
+        if value is not None:
+            return value
+        value = loader()
+        self.put(table, key, value)
+        return value
+
+    def invalidate(self, table: Optional[str] = None, key: Optional[Hashable] = None) -> int:
+        """Drop one record, every record of a table, or the whole cache.
+
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            if table is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            if key is not None:
+                return 1 if self._entries.pop((table, key), None) is not None else 0
+            stale = [cache_key for cache_key in self._entries if cache_key[0] == table]
+            for cache_key in stale:
+                del self._entries[cache_key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# One cache per container; it survives across warm invocations
+record_cache = RecordCache(
+    max_entries=int(os.environ.get('RECORD_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+)
@@ -0,0 +1,156 @@
+"""Per-session claim context, stored in DynamoDB with a TTL.
+
+Each action-group Lambda writes its full result into the item for the
+agent session (one attribute per section: customer_data, policy_data,
+damage_analysis, document_analysis) and returns only a compact summary
+plus the context_key. Later steps load the sections they need by key
+instead of receiving them back from the agent as stringified JSON
+parameters, so the agent's context stays small on every turn.
+
+The agent tends to forward each tool's output to the next tool anyway; a
+forwarded summary carries its context_key, so it is treated as a reference
+and the full section is loaded in its place. Customer verification starts
+a fresh item for every claim (new_claim), and a step that fails clears its own section,
+so a later claim in the same session never picks up an earlier claim's
+results.
+
+Sections are stored as compact JSON strings, like the analysis cache, so
+floats and nested lists round-trip without Decimal conversion.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .clients import get_table
+from .prompts import compact_json
+
+CLAIM_CONTEXT_TABLE = os.environ.get('CLAIM_CONTEXT_TABLE', 'autosettled-claim-context')
+CONTEXT_TTL_SECONDS = int(os.environ.get('CLAIM_CONTEXT_TTL_SECONDS', 24 * 3600))
+
+SECTIONS = ('customer_data', 'policy_data', 'damage_analysis', 'document_analysis')
+
+EMPTY_VALUES = (None, '', {}, [])
+
+
+def context_key(event: Dict[str, Any]) -> Optional[str]:
+    """The key of the claim context: the agent session ID, else an explicit context_key parameter
+
+    A context_key parameter is only honoured for events without a session, so a
+    value the model writes into a tool call cannot point at another session.
+    """
+    if event.get('sessionId'):
+        return event['sessionId']
+    for param in event.get('parameters', []):
+        if param.get('name') == 'context_key' and param.get('value'):
+            return param['value']
+    return None
+
+
+def save_section(key: Optional[str], section: str, value: Any, new_claim: bool = False) -> bool:
+    """Store one section of the claim context; returns False if it could not be written
+
+    new_claim replaces the whole item, dropping every section of an earlier
+    claim in the same session.
+    """
+    if not key:
+        return False
+    try:
+        if new_claim:
+            get_table(CLAIM_CONTEXT_TABLE).put_item(Item={
+                'context_key': key,
+                section: compact_json(value),
+                'updated_at': int(time.time()),
+                'expires_at': int(time.time()) + CONTEXT_TTL_SECONDS
+            })
+            return True
+        get_table(CLAIM_CONTEXT_TABLE).update_item(
+            Key={'context_key': key},
+            UpdateExpression='SET #section = :value, updated_at = :now, expires_at = :expires',
+            ExpressionAttributeNames={'#section': section},
+            ExpressionAttributeValues={
+                ':value': compact_json(value),
+                ':now': int(time.time()),
+                ':expires': int(time.time()) + CONTEXT_TTL_SECONDS
+            }
+        )
+        return True
+    except Exception as e:
+        print(f"Claim context write failed for {section}: {str(e)}")
+        return False
+
+
+def clear_section(key: Optional[str], section: str) -> None:
+    """Remove one section, e.g. after its step failed, so a stale result is not reused"""
+    if not key:
+        return
+    try:
+        get_table(CLAIM_CONTEXT_TABLE).update_item(
+            Key={'context_key': key},
+            UpdateExpression='REMOVE #section',
+            ExpressionAttributeNames={'#section': section}
+        )
+    except Exception as e:
+        print(f"Claim context clear failed for {section}: {str(e)}")
+
+
+def load_sections(key: Optional[str], sections: Iterable[str]) -> Dict[str, Any]:
+    """Read the requested sections; missing sections, an expired item or a read error give {}"""
+    sections = list(sections)
+    if not key or not sections:
+        return {}
+    try:
+        item = get_table(CLAIM_CONTEXT_TABLE).get_item(
+            Key={'context_key': key},
+            ProjectionExpression=', '.join(f"#s{i}" for i in range(len(sections))) + ', expires_at',
+            ExpressionAttributeNames={f"#s{i}": section for i, section in enumerate(sections)}
+        ).get('Item')
+    except Exception as e:
+        print(f"Claim context read failed: {str(e)}")
+        return {}
+    # DynamoDB deletes expired items lazily, so check the TTL ourselves
+    if not item or int(item.get('expires_at', 0)) <= time.time():
+        return {}
+    return {section: json.loads(item[section]) for section in sections if section in item}
+
+
+def reference_key(value: Any) -> Optional[str]:
+    """The context_key of a value that is a stored-section summary (dict or JSON text), else None"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, dict) and isinstance(value.get('context_key'), str):
+        return value['context_key']
+    return None
+
+
+def fill_missing(key: Optional[str], values: Dict[str, Any]) -> Dict[str, Any]:
+    """Load from the claim context every section that was not passed or was passed as a summary"""
+    wanted = []
+    for section, value in values.items():
+        if value in EMPTY_VALUES:
+            wanted.append(section)
+        elif reference_key(value) is not None:
+            # Only this event's own context: a summary naming another key is kept as passed
+            if reference_key(value) == key:
+                wanted.append(section)
+            else:
+                print(f"Ignoring {section} reference to another claim context")
+    stored = load_sections(key, wanted)
+    if stored:
+        print(f"Loaded {sorted(stored)} from claim context {key}")
+    for section in wanted:
+        if section not in stored and values[section] not in EMPTY_VALUES:
+            print(f"Claim context {key} has no {section}; using the summary that was passed")
+    values.update(stored)
+    return values
+
+
+def store_and_summarize(key: Optional[str], section: str, value: Any, summary: Dict[str, Any],
+                        new_claim: bool = False) -> Dict[str, Any]:
+    """Save value as a section and return summary + context_key; if it was not saved, the value goes inline"""
+    if save_section(key, section, value, new_claim):
+        return dict(summary, context_key=key)
+    return dict(summary, **{section: value})
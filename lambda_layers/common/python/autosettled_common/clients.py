@@ -0,0 +1,70 @@
+"""Module-scope, connection-pooled boto3 clients shared by every handler.
+
+Clients are created lazily on first use and then reused for the life of the
+container, so warm invocations skip client construction and keep their TLS
+connections alive between requests.
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# DynamoDB and S3: short timeouts, adaptive retries, enough pooled connections
+# for the concurrent fetches done by the analysis Lambdas
+DEFAULT_CONFIG = Config(
+    region_name=REGION,
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 32)),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30,
+    retries={'max_attempts': 5, 'mode': 'adaptive'}
+)
+
+# Bedrock model calls run for tens of seconds, so allow a long read timeout.
+# Retries, including connection errors and read timeouts, are left to
+# bedrock.BedrockInvoker, which backs off across threads and respects the
+# invocation deadline
+BEDROCK_CONFIG = Config(
+    region_name=REGION,
+    max_pool_connections=int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', 10)),
+    tcp_keepalive=True,
+    connect_timeout=10,
+    read_timeout=300,
+    retries={'total_max_attempts': 1, 'mode': 'standard'}
+)
+
+# Reentrant: a factory may build the client it depends on (get_table -> get_dynamodb)
+_lock = threading.RLock()
+_clients = {}
+
+
+def _get(name, factory):
+    instance = _clients.get(name)
+    if instance is None:
+        with _lock:
+            instance = _clients.get(name)
+            if instance is None:
+                instance = factory()
+                _clients[name] = instance
+    return instance
+
+
+def get_dynamodb():
+    """DynamoDB service resource"""
+    return _get('dynamodb', lambda: boto3.resource('dynamodb', config=DEFAULT_CONFIG))
+
+
+def get_s3():
+    return _get('s3', lambda: boto3.client('s3', config=DEFAULT_CONFIG))
+
+
+def get_bedrock_runtime():
+    return _get('bedrock-runtime', lambda: boto3.client('bedrock-runtime', config=BEDROCK_CONFIG))
+
+
+def get_table(table_name):
+    """DynamoDB Table resource, reused across invocations"""
+    return _get(f'table:{table_name}', lambda: get_dynamodb().Table(table_name))
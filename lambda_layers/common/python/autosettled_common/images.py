@@ -0,0 +1,143 @@
+"""Shrink claim photos before they are sent to a vision model.
+
+Phone photos are usually 12 MP JPEGs (sometimes PNG or WebP), far above the
+resolution the model actually looks at. prepare_image detects the real
+format from the bytes, decodes JPEGs in draft mode (a cheap 1/2, 1/4 or 1/8
+scale decode), applies the EXIF orientation, downscales to MAX_EDGE and
+re-encodes as JPEG. PIL comes from the pdf-generation layer; without it the
+original bytes are passed through with their detected media type.
+
+Each prepared image also carries a 64-bit difference hash (dHash), so
+near-identical shots of the same damage can be collapsed with
+find_near_duplicates before the model call.
+"""
+import io
+import os
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# Claude vision downsizes anything whose long edge exceeds ~1568px anyway
+MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', 1568))
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+
+# Images whose 64-bit dHashes differ in at most this many bits are treated as
+# the same shot (5 bits is roughly 92% similar); -1 disables de-duplication
+DUPLICATE_MAX_DISTANCE = int(os.environ.get('IMAGE_DUPLICATE_MAX_DISTANCE', 5))
+HASH_SIZE = 8
+
+# Part of the damage cache key, so results are not replayed across settings
+PREPROCESSING_VERSION = (f"{MAX_EDGE}px-q{JPEG_QUALITY}-d{DUPLICATE_MAX_DISTANCE}"
+                         if Image is not None else 'original')
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    media_type: str
+    original_bytes: int
+    original_size: Optional[Tuple[int, int]]
+    size: Optional[Tuple[int, int]]
+    dhash: Optional[int] = None
+
+
+class NearDuplicate(NamedTuple):
+    index: int
+    duplicate_of: int
+    distance: int
+
+
+def detect_media_type(data: bytes) -> Optional[str]:
+    """Media type from the file signature, or None if it is not a supported image"""
+    for signature, media_type in SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def estimate_image_tokens(size: Optional[Tuple[int, int]]) -> Optional[int]:
+    """Approximate input tokens for an image (width * height / 750)"""
+    if not size:
+        return None
+    return int(size[0] * size[1] / 750)
+
+
+def difference_hash(img, hash_size: int = HASH_SIZE) -> int:
+    """dHash: one bit per horizontally adjacent pixel pair of a tiny grayscale copy"""
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def find_near_duplicates(hashes: Sequence[Optional[int]],
+                         max_distance: int = DUPLICATE_MAX_DISTANCE) -> List[NearDuplicate]:
+    """Later images within max_distance bits of an earlier kept image; unhashed images are always kept"""
+    if max_distance < 0:
+        return []
+    kept = []
+    duplicates = []
+    for index, value in enumerate(hashes):
+        if value is None:
+            continue
+        match = None
+        for kept_index, kept_value in kept:
+            distance = bin(value ^ kept_value).count('1')
+            if distance <= max_distance and (match is None or distance < match[1]):
+                match = (kept_index, distance)
+        if match is None:
+            kept.append((index, value))
+        else:
+            duplicates.append(NearDuplicate(index, match[0], match[1]))
+    return duplicates
+
+
+def prepare_image(data: bytes, max_edge: int = MAX_EDGE, quality: int = JPEG_QUALITY) -> PreparedImage:
+    """Orient, downscale and re-encode one image; falls back to the original bytes on any failure"""
+    media_type = detect_media_type(data) or 'image/jpeg'
+    original = PreparedImage(data, media_type, len(data), None, None)
+    if Image is None:
+        return original
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            original_size = img.size
+            scale = min(1.0, max_edge / max(original_size))
+            target = (max(1, int(original_size[0] * scale)), max(1, int(original_size[1] * scale)))
+            if img.format == 'JPEG' and scale < 1.0:
+                # Smallest DCT scale that still covers the target size
+                img.draft('RGB', target)
+            rotated = img.getexif().get(0x0112, 1) != 1
+            oriented = ImageOps.exif_transpose(img)
+            if max(oriented.size) > max_edge:
+                oriented.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            if oriented.mode != 'RGB':
+                oriented = oriented.convert('RGB')
+            dhash = difference_hash(oriented)
+            out = io.BytesIO()
+            oriented.save(out, 'JPEG', quality=quality, optimize=True)
+            size = oriented.size
+    except Exception as e:
+        print(f"Image preprocessing failed, sending original: {str(e)}")
+        return original
+
+    encoded = out.getvalue()
+    if scale == 1.0 and not rotated and len(encoded) >= len(data) and media_type == 'image/jpeg':
+        # Already small enough; re-encoding would only cost quality
+        return PreparedImage(data, media_type, len(data), original_size, original_size, dhash)
+    return PreparedImage(encoded, 'image/jpeg', len(data), original_size, size, dhash)
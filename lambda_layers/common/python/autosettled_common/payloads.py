@@ -0,0 +1,139 @@
+"""Bounded-memory assembly of Anthropic messages request bodies.
+
+Building a body the obvious way keeps several full copies of every image or
+PDF alive at once: the raw bytes, the base64 str and the json.dumps output.
+MessagesBodyBuilder instead works out the exact size of the final JSON up
+front, preallocates one bytearray and base64-encodes each attachment into
+it chunk by chunk, reading S3 StreamingBody objects directly. Peak memory is
+then about one copy of the encoded payload. Given an executor, the
+attachments are streamed into their (disjoint) slices of the buffer
+concurrently.
+"""
+import binascii
+import json
+import resource
+from concurrent.futures import Executor
+from typing import Any, BinaryIO, List, Optional, Tuple, Union
+
+# Multiple of 3 so every chunk except the last encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+def base64_length(length: int) -> int:
+    return 4 * ((length + 2) // 3)
+
+
+def container_peak_memory_mb() -> float:
+    """Peak resident memory of this process in MB.
+
+    ru_maxrss never resets, so on Lambda this is the high-water mark of the
+    container across every invocation it has served, not of the current one.
+    It shows whether MemorySize is sized right, not what one request used.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MessagesBodyBuilder:
+    """Single user-message request body with base64 attachments followed by text"""
+
+    def __init__(self, max_tokens: int, anthropic_version: str = 'bedrock-2023-05-31', **fields: Any):
+        self._fields = dict(anthropic_version=anthropic_version, max_tokens=max_tokens, **fields)
+        self._blocks: List[Tuple[str, Any]] = []
+
+    def add_attachment(self, block_type: str, media_type: str, data: Union[bytes, BinaryIO],
+                       length: Optional[int] = None) -> 'MessagesBodyBuilder':
+        """Add an image or document block from bytes, or from a stream of known length"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            length = len(data)
+        elif length is None:
+            raise ValueError('length is required when data is a stream')
+        prefix = json.dumps({'type': block_type, 'source': {'type': 'base64', 'media_type': media_type, 'data': ''}})
+        # Split the dumped block around the empty data string
+        head, tail = prefix[:-3], prefix[-3:]
+        self._blocks.append(('attachment', (head.encode(), data, length, tail.encode())))
+        return self
+
+    def add_image(self, media_type: str, data: Union[bytes, BinaryIO], length: Optional[int] = None):
+        return self.add_attachment('image', media_type, data, length)
+
+    def add_document(self, media_type: str, data: Union[bytes, BinaryIO], length: Optional[int] = None):
+        return self.add_attachment('document', media_type, data, length)
+
+    def add_text(self, text: str) -> 'MessagesBodyBuilder':
+        self._blocks.append(('text', json.dumps({'type': 'text', 'text': text}).encode()))
+        return self
+
+    def _fragments(self):
+        head = json.dumps(self._fields)[:-1] + ', "messages": [{"role": "user", "content": ['
+        yield head.encode()
+        for index, (kind, block) in enumerate(self._blocks):
+            if index:
+                yield b', '
+            if kind == 'text':
+                yield block
+            else:
+                prefix, data, length, suffix = block
+                yield prefix
+                yield (data, length)
+                yield suffix
+        yield b']}]}'
+
+    def size(self) -> int:
+        """Exact length of the body build() will return"""
+        return sum(base64_length(part[1]) if isinstance(part, tuple) else len(part) for part in self._fragments())
+
+    def build(self, executor: Optional[Executor] = None, timeout: Optional[float] = None) -> bytearray:
+        """Encode every block into one preallocated buffer; streams are read to the end once"""
+        body = bytearray(self.size())
+        view = memoryview(body)
+        offset = 0
+        futures = []
+        try:
+            for part in self._fragments():
+                if isinstance(part, tuple):
+                    if executor is None:
+                        self._encode_into(view, offset, *part)
+                    else:
+                        futures.append(executor.submit(self._encode_into, view, offset, *part))
+                    offset += base64_length(part[1])
+                else:
+                    view[offset:offset + len(part)] = part
+                    offset += len(part)
+            for future in futures:
+                future.result(timeout=timeout)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            self._blocks = []
+        view.release()
+        return body
+
+    @staticmethod
+    def _encode_into(view: memoryview, offset: int, data: Union[bytes, BinaryIO], length: int) -> int:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            source = memoryview(data)
+            chunks = (source[start:start + CHUNK_SIZE] for start in range(0, length, CHUNK_SIZE))
+        else:
+            chunks = _read_chunks(data, length)
+        for chunk in chunks:
+            encoded = binascii.b2a_base64(chunk, newline=False)
+            view[offset:offset + len(encoded)] = encoded
+            offset += len(encoded)
+        return offset
+
+
+def _read_chunks(stream: BinaryIO, length: int):
+    """Read exactly length bytes in CHUNK_SIZE pieces, regrouping short reads"""
+    remaining = length
+    pending = b''
+    while remaining > 0:
+        data = stream.read(min(CHUNK_SIZE - len(pending), remaining))
+        if not data:
+            raise ValueError(f"Stream ended {remaining} bytes short of the expected {length}")
+        remaining -= len(data)
+        pending = pending + data if pending else data
+        if len(pending) == CHUNK_SIZE or remaining == 0:
+            yield pending
+            pending = b''
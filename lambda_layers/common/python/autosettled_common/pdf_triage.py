@@ -0,0 +1,338 @@
+"""Pure-Python PDF triage ahead of document analysis.
+
+Police reports and repair estimates are sometimes long scans. triage_pdf
+parses just enough of the PDF structure to count the pages and, when a
+document is over the page or byte budget, writes a smaller PDF holding only
+the pages that matter: the first few pages plus any page whose text mentions
+a total (or the last page when no text can be read, as with scans).
+
+The parser reads objects by scanning for "n g obj ... endobj", including
+objects packed in Flate-compressed object streams, and follows the page tree
+from /Root. It does not need the xref table, so slightly damaged files still
+parse. Encrypted or unparseable documents are passed through whole when they
+fit the byte budget and rejected otherwise.
+"""
+import base64
+import binascii
+import os
+import re
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 6))
+LEADING_PAGES = int(os.environ.get('PDF_LEADING_PAGES', 3))
+# Claude's per-document limit on Bedrock is 4.5 MB
+MAX_BYTES = int(os.environ.get('PDF_MAX_BYTES', 4500000))
+KEY_TERMS = tuple(term.strip() for term in
+                  os.environ.get('PDF_KEY_TERMS', 'total,amount due,balance due').split(',') if term.strip())
+
+INHERITABLE_KEYS = (b'Resources', b'MediaBox', b'CropBox', b'Rotate')
+
+OBJ_RE = re.compile(rb'(?<![0-9])(\d+)\s+(\d+)\s+obj\b')
+REF_RE = re.compile(rb'(\d+)\s+(\d+)\s+R(?![A-Za-z])')
+STREAM_RE = re.compile(rb'>>\s*stream\r?\n')
+# Text-showing operands: literal strings "(...)" and hex strings "<...>"
+STRING_RE = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>', re.DOTALL)
+LITERAL_ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|\r\n|.)', re.DOTALL)
+LITERAL_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                   b'\r\n': b'', b'\r': b'', b'\n': b''}
+ROOT_RE = re.compile(rb'/Root\s+(\d+)\s+\d+\s+R')
+
+
+class PdfTriageError(Exception):
+    """The document cannot be brought under the configured budget"""
+
+
+class TriageResult(NamedTuple):
+    data: bytes
+    original_bytes: int
+    page_count: Optional[int]
+    selected_pages: Optional[List[int]]
+    split: bool
+
+
+def _key_pattern(key: bytes):
+    return re.compile(rb'/' + key + rb'(?![A-Za-z0-9])\s*')
+
+
+def _value_at(data: bytes, pos: int) -> bytes:
+    """Raw PDF value starting at pos: a dictionary, array, reference or single token"""
+    if data.startswith(b'<<', pos):
+        depth, i = 0, pos
+        while i < len(data):
+            if data.startswith(b'<<', i):
+                depth += 1
+                i += 2
+            elif data.startswith(b'>>', i):
+                depth -= 1
+                i += 2
+                if depth == 0:
+                    return data[pos:i]
+            else:
+                i += 1
+        raise ValueError('unterminated dictionary')
+    if data.startswith(b'[', pos):
+        depth = 0
+        for i in range(pos, len(data)):
+            if data[i:i + 1] == b'[':
+                depth += 1
+            elif data[i:i + 1] == b']':
+                depth -= 1
+                if depth == 0:
+                    return data[pos:i + 1]
+        raise ValueError('unterminated array')
+    ref = REF_RE.match(data, pos)
+    if ref:
+        return ref.group(0)
+    token = re.compile(rb'/?[^\s/<>\[\]()]+').match(data, pos)
+    if not token:
+        raise ValueError('unreadable value')
+    return token.group(0)
+
+
+def _get_value(dict_bytes: bytes, key: bytes) -> Optional[bytes]:
+    match = _key_pattern(key).search(dict_bytes)
+    return _value_at(dict_bytes, match.end()) if match else None
+
+
+def _string_bytes(token: bytes) -> bytes:
+    """Bytes of a PDF string token: escapes resolved for literals, digit pairs decoded for hex"""
+    if token.startswith(b'('):
+        def unescape(match):
+            escaped = match.group(1)
+            if escaped[:1] in b'01234567':
+                return bytes([int(escaped, 8) & 0xFF])
+            return LITERAL_ESCAPES.get(escaped, escaped)
+        return LITERAL_ESCAPE_RE.sub(unescape, token[1:-1])
+    digits = re.sub(rb'\s+', b'', token[1:-1])
+    # An odd final digit is followed by an implied 0
+    return binascii.unhexlify(digits + b'0' * (len(digits) % 2))
+
+
+def _as_ref(value: Optional[bytes]) -> Optional[int]:
+    match = REF_RE.fullmatch(value.strip()) if value else None
+    return int(match.group(1)) if match else None
+
+
+class PdfDocument:
+    """Object table and page list of one PDF file"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.objects: Dict[int, Tuple[int, bytes]] = {}
+        self._parse_objects()
+        self._unpack_object_streams()
+        roots = ROOT_RE.findall(data)
+        if not roots:
+            raise ValueError('no /Root')
+        self.root = int(roots[-1])
+        self.encrypted = re.search(rb'/Encrypt\s+\d+\s+\d+\s+R', data) is not None
+        self.page_tree_nodes = set()
+        self.pages: List[Tuple[int, Dict[bytes, bytes]]] = []
+        catalog = self._dict(self.root)
+        self._walk(_as_ref(_get_value(catalog, b'Pages')), {}, 0)
+        if not self.pages:
+            raise ValueError('no pages found')
+
+    def _parse_objects(self):
+        data = self.data
+        pos = 0
+        while True:
+            match = OBJ_RE.search(data, pos)
+            if not match:
+                break
+            start = match.end()
+            end = data.find(b'endobj', start)
+            if end == -1:
+                break
+            stream = STREAM_RE.search(data, start, end)
+            if stream:
+                length = _get_value(data[start:stream.start() + 2], b'Length')
+                if length is not None and length.isdigit():
+                    end = data.find(b'endobj', stream.end() + int(length))
+                else:
+                    end = data.find(b'endobj', data.find(b'endstream', stream.end()))
+                if end == -1:
+                    break
+            # Later definitions (incremental updates) replace earlier ones
+            self.objects[int(match.group(1))] = (int(match.group(2)), data[start:end])
+            pos = end + 6
+
+    def _unpack_object_streams(self):
+        for num, (gen, body) in list(self.objects.items()):
+            if not re.search(rb'/Type\s*/ObjStm', self._dict_part(body)):
+                continue
+            content = self._stream_content(body)
+            if content is None:
+                continue
+            dictionary = self._dict_part(body)
+            count = int(_get_value(dictionary, b'N'))
+            first = int(_get_value(dictionary, b'First'))
+            header = [int(n) for n in content[:first].split()]
+            entries = [(header[i], header[i + 1]) for i in range(0, 2 * count, 2)]
+            for index, (obj_num, offset) in enumerate(entries):
+                stop = entries[index + 1][1] if index + 1 < len(entries) else len(content) - first
+                self.objects.setdefault(obj_num, (0, b' ' + content[first + offset:first + stop].strip() + b'\n'))
+
+    @staticmethod
+    def _dict_part(body: bytes) -> bytes:
+        stream = STREAM_RE.search(body)
+        return body[:stream.start() + 2] if stream else body
+
+    def _dict(self, num: Optional[int]) -> bytes:
+        if num is None or num not in self.objects:
+            raise ValueError(f'missing object {num}')
+        return self._dict_part(self.objects[num][1])
+
+    @staticmethod
+    def _stream_content(body: bytes) -> Optional[bytes]:
+        """Decoded stream data, or None when it uses a filter other than Flate, ASCII85 or ASCIIHex"""
+        stream = STREAM_RE.search(body)
+        if not stream:
+            return None
+        content = body[stream.end():body.rfind(b'endstream')]
+        filters = _get_value(body[:stream.start() + 2], b'Filter') or b''
+        for name in re.findall(rb'/([A-Za-z0-9]+)', filters):
+            if name in (b'FlateDecode', b'Fl'):
+                content = zlib.decompressobj().decompress(content)
+            elif name in (b'ASCII85Decode', b'A85'):
+                content = base64.a85decode(re.sub(rb'\s+', b'', content).split(b'~>')[0])
+            elif name in (b'ASCIIHexDecode', b'AHx'):
+                content = binascii.unhexlify(re.sub(rb'\s+', b'', content).split(b'>')[0])
+            else:
+                return None
+        return content
+
+    def _walk(self, num, inherited, depth):
+        if num is None or depth > 64 or num in self.page_tree_nodes:
+            raise ValueError('broken page tree')
+        node = self._dict(num)
+        kids = _get_value(node, b'Kids')
+        if kids is None:
+            self.pages.append((num, inherited))
+            return
+        self.page_tree_nodes.add(num)
+        inherited = dict(inherited)
+        for key in INHERITABLE_KEYS:
+            value = _get_value(node, key)
+            if value is not None:
+                inherited[key] = value
+        for kid in REF_RE.findall(kids):
+            self._walk(int(kid[0]), inherited, depth + 1)
+
+    def page_text(self, index: int) -> str:
+        """String text (literal and hex) of a page's content streams, without whitespace, lower-cased"""
+        contents = _get_value(self._dict(self.pages[index][0]), b'Contents')
+        if contents is None:
+            return ''
+        parts = []
+        for ref in REF_RE.findall(contents):
+            body = self.objects.get(int(ref[0]), (0, b''))[1]
+            try:
+                content = self._stream_content(body)
+            except (ValueError, zlib.error):
+                content = None
+            if content:
+                parts.extend(_string_bytes(token) for token in STRING_RE.findall(content))
+        text = b''.join(parts).decode('latin-1')
+        return re.sub(r'\s+', '', text).lower()
+
+    def write_pages(self, indexes: Sequence[int]) -> bytes:
+        """A new PDF holding only the given pages (0-based, in the given order)"""
+        selected = [self.pages[i] for i in indexes]
+        selected_nums = {num for num, _ in selected}
+        all_page_nums = {num for num, _ in self.pages}
+        pages_num = max(self.objects) + 1
+        catalog_num = pages_num + 1
+
+        bodies = {}
+        for num, inherited in selected:
+            body = self.objects[num][1]
+            dictionary = self._dict_part(body)
+            body = re.sub(rb'/Parent\s+\d+\s+\d+\s+R', b'/Parent %d 0 R' % pages_num, body, count=1)
+            missing = b''.join(b' /' + key + b' ' + value for key, value in inherited.items()
+                               if _get_value(dictionary, key) is None)
+            if missing:
+                body = body.replace(b'<<', b'<<' + missing, 1)
+            bodies[num] = body
+
+        # Copy everything the selected pages reach, except the page tree and other pages
+        pending = list(bodies.values())
+        while pending:
+            body = pending.pop()
+            for ref in REF_RE.findall(self._dict_part(body)):
+                ref_num = int(ref[0])
+                if (ref_num in bodies or ref_num not in self.objects or ref_num in self.page_tree_nodes
+                        or (ref_num in all_page_nums and ref_num not in selected_nums)):
+                    continue
+                bodies[ref_num] = self.objects[ref_num][1]
+                pending.append(bodies[ref_num])
+
+        bodies[pages_num] = b' << /Type /Pages /Kids [%s] /Count %d >>\n' % (
+            b' '.join(b'%d 0 R' % num for num, _ in selected), len(selected))
+        bodies[catalog_num] = b' << /Type /Catalog /Pages %d 0 R >>\n' % pages_num
+
+        out = bytearray(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        offsets = {}
+        for num in sorted(bodies):
+            gen = self.objects[num][0] if num in self.objects else 0
+            offsets[num] = (len(out), gen)
+            out += b'%d %d obj' % (num, gen) + bodies[num] + b'endobj\n'
+        xref_at = len(out)
+        size = catalog_num + 1
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+        for num in range(1, size):
+            if num in offsets:
+                out += b'%010d %05d n \n' % offsets[num]
+            else:
+                out += b'0000000000 65535 f \n'
+        out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, catalog_num, xref_at)
+        return bytes(out)
+
+
+def select_pages(doc: PdfDocument, max_pages: int, leading_pages: int, key_terms: Sequence[str]) -> List[int]:
+    """Page indexes in priority order: first page, pages with key terms, other leading pages, last page"""
+    terms = [re.sub(r'\s+', '', term).lower() for term in key_terms]
+    key_pages = []
+    for index in range(len(doc.pages)):
+        try:
+            text = doc.page_text(index)
+        except Exception:
+            continue
+        if text and any(term in text for term in terms):
+            key_pages.append(index)
+    priority = [0] + key_pages + list(range(1, leading_pages))
+    if not key_pages:
+        # No readable totals (typically a scan): estimates put them at the end
+        priority.append(len(doc.pages) - 1)
+    ordered = []
+    for index in priority:
+        if index < len(doc.pages) and index not in ordered:
+            ordered.append(index)
+    return ordered[:max_pages]
+
+
+def triage_pdf(data: bytes, max_pages: int = MAX_PAGES, leading_pages: int = LEADING_PAGES,
+               max_bytes: int = MAX_BYTES, key_terms: Sequence[str] = KEY_TERMS) -> TriageResult:
+    """Return the PDF unchanged if within budget, else a split copy of its most relevant pages"""
+    try:
+        doc = PdfDocument(data)
+    except Exception as e:
+        print(f"PDF structure not parsed ({str(e)}); sending whole document")
+        doc = None
+    if doc is None or doc.encrypted:
+        if len(data) > max_bytes:
+            raise PdfTriageError(f"PDF of {len(data)} bytes exceeds the {max_bytes} byte budget and cannot be split")
+        return TriageResult(data, len(data), len(doc.pages) if doc else None, None, False)
+
+    page_count = len(doc.pages)
+    if page_count <= max_pages and len(data) <= max_bytes:
+        return TriageResult(data, len(data), page_count, list(range(1, page_count + 1)), False)
+
+    priority = select_pages(doc, max_pages, leading_pages, key_terms)
+    for keep in range(len(priority), 0, -1):
+        indexes = sorted(priority[:keep])
+        split = doc.write_pages(indexes)
+        if len(split) <= max_bytes:
+            return TriageResult(split, len(data), page_count, [i + 1 for i in indexes], True)
+    raise PdfTriageError(f"Even a single page of this {page_count}-page PDF exceeds the {max_bytes} byte budget")
@@ -0,0 +1,65 @@
+"""Materialized customer portfolio: one item per customer holding the enriched policy list.
+
+The item is rebuilt whenever a customer's policies or vehicles are written
+(by load_dummy_data.py or the portfolioSync stream consumer), so
+customerVerification answers with a single GetItem however many policies
+the customer holds.
+"""
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from .clients import get_table
+from .repositories import Record, build_enriched_policies, from_decimal, to_decimal
+
+PORTFOLIO_TABLE = os.environ.get('PORTFOLIO_TABLE', 'autosettled-customer-portfolios')
+
+
+def build_portfolio(customer_id: str, policy_ids: Iterable[str] = (), vehicle_ids: Iterable[str] = ()) -> Record:
+    policies = build_enriched_policies(customer_id, policy_ids, vehicle_ids)
+    return {
+        'customer_id': customer_id,
+        'policies': policies,
+        'policy_count': len(policies),
+        'updated_at': datetime.utcnow().isoformat()
+    }
+
+
+def refresh_portfolio(customer_id: str, policy_ids: Iterable[str] = (), vehicle_ids: Iterable[str] = ()) -> Record:
+    """Rebuild and store the portfolio item for one customer; policy_ids/vehicle_ids are rows known to have changed"""
+    portfolio = build_portfolio(customer_id, policy_ids, vehicle_ids)
+    get_table(PORTFOLIO_TABLE).put_item(Item=to_decimal(portfolio))
+    return portfolio
+
+
+def refresh_portfolios(customer_ids: Iterable[str], policy_ids: Iterable[str] = (),
+                       vehicle_ids: Iterable[str] = ()) -> int:
+    """Rebuild the portfolios of several customers, skipping duplicates and blanks"""
+    policy_ids, vehicle_ids = set(policy_ids), set(vehicle_ids)
+    refreshed = 0
+    for customer_id in sorted({cid for cid in customer_ids if cid}):
+        refresh_portfolio(customer_id, policy_ids, vehicle_ids)
+        refreshed += 1
+    return refreshed
+
+
+def get_portfolio(customer_id: str) -> Optional[Record]:
+    # Not cached per container: portfolioSync rewrites the item on any policy change
+    item = get_table(PORTFOLIO_TABLE).get_item(Key={'customer_id': customer_id}).get('Item')
+    return from_decimal(item) if item else None
+
+
+def get_portfolio_policies(customer_id: str) -> List[Record]:
+    """Enriched active policies for a customer, read from the portfolio item.
+
+    Not from the reference snapshot: the portfolio item is kept current by
+    portfolioSync, while a snapshot would keep listing a cancelled policy
+    until the next export. A customer without a portfolio item yet (e.g.
+    data written before the table existed) gets one built and stored on the
+    spot.
+    """
+    portfolio = get_portfolio(customer_id)
+    if portfolio is None:
+        print(f"No portfolio item for customer {customer_id}, building it")
+        portfolio = refresh_portfolio(customer_id)
+    return portfolio.get('policies', [])
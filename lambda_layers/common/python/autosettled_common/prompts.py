@@ -0,0 +1,173 @@
+"""Compact, budgeted prompt assembly for the analysis chain.
+
+Each step embeds earlier results in its prompt. Those results arrive as
+whatever the agent passed along: wrapper dicts, JSON strings, pretty-printed
+JSON or raw-text fallbacks, often with fields the next step never reads.
+The helpers here unwrap them, keep only the fields a given step uses,
+serialize them without whitespace, estimate the prompt's tokens and, when a
+step's budget is exceeded, shorten the longest strings until it fits.
+Every rendered prompt logs its size as CloudWatch EMF metrics.
+"""
+import json
+import math
+import os
+import re
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Sequence
+
+METRICS_NAMESPACE = 'AutoSettled/Prompts'
+
+# Rough token estimate for English prose and JSON
+CHARS_PER_TOKEN = 4
+MIN_STRING_CHARS = 80
+
+STEP_BUDGETS = {
+    'damage': int(os.environ.get('PROMPT_BUDGET_DAMAGE', 1000)),
+    'documents': int(os.environ.get('PROMPT_BUDGET_DOCUMENTS', 2000)),
+    'decision': int(os.environ.get('PROMPT_BUDGET_DECISION', 3000)),
+    'report_prose': int(os.environ.get('PROMPT_BUDGET_REPORT_PROSE', 800)),
+}
+
+# Fields of each upstream result that a downstream prompt actually uses
+DAMAGE_FIELDS_FOR_DOCUMENTS = ('damaged_parts', 'damage_summary', 'estimated_repair_cost_usd', 'severity')
+DAMAGE_FIELDS_FOR_DECISION = ('vehicle_matches_policy', 'vehicle_match_notes', 'damaged_parts', 'damage_summary',
+                              'estimated_repair_cost_usd', 'likely_crash_reason', 'severity', 'suspicious_indicators')
+DOCUMENT_FIELDS_FOR_DECISION = ('incident_date', 'incident_location', 'police_case_number', 'fault_determination',
+                                'estimated_repair_cost', 'repair_items', 'inconsistencies', 'red_flags',
+                                'document_authenticity_assessment')
+
+# Keys the lambdas and agent use to carry unparsed model text
+RAW_TEXT_KEYS = ('raw_text', 'raw_analysis')
+FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=_default)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _parse(value: Any) -> Any:
+    """JSON from a string, including one wrapped in a ```json fence; anything else is returned as is"""
+    if isinstance(value, str):
+        fenced = FENCE_RE.search(value)
+        try:
+            return json.loads(fenced.group(1) if fenced else value)
+        except ValueError:
+            return value
+    return value
+
+
+def unwrap_result(result: Any, wrapper_key: Optional[str] = None) -> Any:
+    """The model's findings from a step result: a dict of fields, or the raw text if it never parsed"""
+    result = _parse(result)
+    if isinstance(result, dict) and wrapper_key and wrapper_key in result:
+        result = _parse(result[wrapper_key])
+    if isinstance(result, dict):
+        for key in RAW_TEXT_KEYS:
+            if key in result and len(result) == 1:
+                return _parse(result[key])
+    return result
+
+
+def project(findings: Any, fields: Sequence[str]) -> Any:
+    """Keep only the given fields (and drop empty ones); raw text passes through"""
+    if not isinstance(findings, dict):
+        return findings
+    return {field: findings[field] for field in fields if findings.get(field) not in (None, '', [], {})}
+
+
+def damage_findings(damage_analysis: Any, fields: Sequence[str]) -> Any:
+    return project(unwrap_result(damage_analysis, 'analysis'), fields)
+
+
+def document_findings(document_analysis: Any, fields: Sequence[str]) -> Any:
+    return project(unwrap_result(document_analysis), fields)
+
+
+def _truncate(value: Any, max_chars: Optional[int]) -> Any:
+    if max_chars is None:
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + '...'
+    if isinstance(value, dict):
+        return {key: _truncate(item, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate(item, max_chars) for item in value]
+    return value
+
+
+def _longest_string(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return max((_longest_string(item) for item in value.values()), default=0)
+    if isinstance(value, list):
+        return max((_longest_string(item) for item in value), default=0)
+    return 0
+
+
+def _serialize(value: Any) -> str:
+    if value in (None, '', {}, []):
+        return ''
+    return value if isinstance(value, str) else compact_json(value)
+
+
+def render_prompt(step: str, render: Callable[..., str], sections: Optional[Dict[str, Any]] = None,
+                  budget: Optional[int] = None) -> str:
+    """Call render(**serialized sections); over budget, halve the longest strings in sections and retry"""
+    sections = sections or {}
+    budget = budget or STEP_BUDGETS.get(step)
+    max_chars = None
+    while True:
+        prompt = render(**{name: _serialize(_truncate(value, max_chars)) for name, value in sections.items()})
+        tokens = estimate_tokens(prompt)
+        if budget is None or tokens <= budget:
+            break
+        # Longest string as rendered, not counting the '...' marker; the limit
+        # only ever shrinks, and stops at the floor
+        longest = _longest_string(sections)
+        if max_chars is not None:
+            longest = min(longest, max_chars)
+        next_max_chars = max(MIN_STRING_CHARS, longest // 2)
+        if longest <= MIN_STRING_CHARS or next_max_chars == max_chars:
+            break
+        max_chars = next_max_chars
+    if budget is not None and tokens > budget:
+        print(f"Prompt for {step} is ~{tokens} tokens, over its {budget} token budget")
+    record_prompt_metrics(step, prompt, tokens, budget, truncated=max_chars is not None)
+    return prompt
+
+
+def record_prompt_metrics(step: str, prompt: str, tokens: int, budget: Optional[int], truncated: bool = False):
+    """Log one prompt's size as a CloudWatch EMF line"""
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Step']],
+                'Metrics': [
+                    {'Name': 'PromptChars', 'Unit': 'Count'},
+                    {'Name': 'PromptTokensEstimate', 'Unit': 'Count'},
+                    {'Name': 'PromptOverBudget', 'Unit': 'Count'},
+                    {'Name': 'PromptTruncated', 'Unit': 'Count'}
+                ]
+            }]
+        },
+        'Step': step,
+        'PromptChars': len(prompt),
+        'PromptTokensEstimate': tokens,
+        'PromptBudget': budget,
+        'PromptOverBudget': int(budget is not None and tokens > budget),
+        'PromptTruncated': int(truncated)
+    }))
@@ -0,0 +1,252 @@
+"""Typed data-access functions for customers, policies, vehicles and claims.
+
+Customer and vehicle lookups consult the local reference snapshot first
+(when enabled) and fall back to DynamoDB for records the snapshot does not
+contain. Policies are always read from DynamoDB.
+"""
+import os
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .cache import record_cache
+from .clients import get_dynamodb, get_table
+from .snapshot import current_snapshot
+
+CUSTOMER_TABLE = os.environ.get('CUSTOMER_TABLE', 'autosettled-customers')
+POLICY_TABLE = os.environ.get('POLICY_TABLE', 'autosettled-policies')
+VEHICLES_TABLE = os.environ.get('VEHICLES_TABLE', 'autosettled-vehicles')
+CLAIMS_TABLE = os.environ.get('CLAIMS_TABLE', 'claims-records')
+
+# Global secondary indexes (see template.yaml)
+CUSTOMER_EMAIL_INDEX = 'email-index'
+POLICY_CUSTOMER_INDEX = 'customer_id-index'
+VEHICLE_POLICY_INDEX = 'policy_id-index'
+VEHICLE_CUSTOMER_INDEX = 'customer_id-index'
+CLAIM_STATUS_INDEX = 'dashboard_status-timestamp-index'
+CLAIM_CUSTOMER_INDEX = 'customer_id-timestamp-index'
+CLAIM_LISTING_INDEX = 'listing-timestamp-index'
+
+# The unfiltered dashboard view reads one listing partition per calendar month
+# ('claims#2025-06'), so no single index partition takes every claim write
+CLAIM_LISTING_PREFIX = 'claims#'
+
+Record = Dict[str, Any]
+
+
+def query_all(table, **query_kwargs) -> List[Record]:
+    """Run a query and follow LastEvaluatedKey until every page is read"""
+    items = []
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def batch_get_consistent(table_name: str, key_name: str, key_values: Iterable[str]) -> List[Record]:
+    """Strongly consistent reads of items by key, 100 keys per BatchGetItem, retrying unprocessed keys"""
+    keys = sorted(set(key_values))
+    items = []
+    for start in range(0, len(keys), 100):
+        request = {table_name: {'Keys': [{key_name: key} for key in keys[start:start + 100]], 'ConsistentRead': True}}
+        attempt = 0
+        while request:
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+            response = get_dynamodb().batch_get_item(RequestItems=request)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys')
+            attempt += 1
+    return items
+
+
+def from_decimal(obj: Any) -> Any:
+    """Convert Decimals read from DynamoDB back to int/float (recursively)"""
+    if isinstance(obj, dict):
+        return {k: from_decimal(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [from_decimal(i) for i in obj]
+    elif isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    return obj
+
+
+def to_decimal(obj: Any) -> Any:
+    """Convert floats (recursively) to Decimal so DynamoDB accepts them"""
+    if isinstance(obj, dict):
+        return {k: to_decimal(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [to_decimal(i) for i in obj]
+    elif isinstance(obj, float):
+        return Decimal(str(obj))
+    return obj
+
+
+# Customers
+
+def find_customer(first_name: str, last_name: str, email: str, use_snapshot: bool = True) -> Optional[Record]:
+    """Find a customer by querying the email index, then matching the name
+
+    use_snapshot=False goes straight to the table, for callers that already know
+    the snapshot does not hold this identity.
+    """
+    if not email:
+        return None
+
+    def load():
+        snapshot = current_snapshot() if use_snapshot else None
+        record = snapshot.find_customer(first_name, last_name, email) if snapshot else None
+        if record:
+            return record
+
+        query_kwargs = {
+            'IndexName': CUSTOMER_EMAIL_INDEX,
+            'KeyConditionExpression': 'email = :em',
+            'FilterExpression': 'first_name = :fn AND last_name = :ln',
+            'ExpressionAttributeValues': {
+                ':fn': first_name,
+                ':ln': last_name,
+                ':em': email
+            }
+        }
+        table = get_table(CUSTOMER_TABLE)
+        # Follow pagination so a filtered-out first page never hides a match
+        while True:
+            response = table.query(**query_kwargs)
+            if response.get('Items'):
+                return response['Items'][0]
+            if 'LastEvaluatedKey' not in response:
+                return None
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return record_cache.get_or_load(CUSTOMER_TABLE, ('identity', email, first_name, last_name), load)
+
+
+# Policies
+
+def get_policy(policy_id: str) -> Optional[Record]:
+    # Never from the snapshot or the record cache: policy_status must reflect
+    # cancellations right away, and no other container's cache would hear of them
+    return get_table(POLICY_TABLE).get_item(Key={'policy_id': policy_id}).get('Item')
+
+
+def list_policy_ids_for_customer(customer_id: str) -> List[str]:
+    return [item['policy_id'] for item in query_all(
+        get_table(POLICY_TABLE),
+        IndexName=POLICY_CUSTOMER_INDEX,
+        KeyConditionExpression='customer_id = :cid',
+        ExpressionAttributeValues={':cid': customer_id},
+        ProjectionExpression='policy_id'
+    )]
+
+
+def enrich_policy(policy: Record, vehicle: Optional[Record]) -> Record:
+    """Flatten a policy and its vehicle into the shape returned by customerVerification"""
+    vehicle = vehicle or {}
+    return {
+        'policy_id': policy.get('policy_id'),
+        'policy_number': policy.get('policy_number'),
+        'policy_type': policy.get('policy_type'),
+        'vehicle_year': str(vehicle.get('year_of_manufacture', '')),
+        'vehicle_make': vehicle.get('make', ''),
+        'vehicle_model': vehicle.get('model', ''),
+        'vehicle_type': vehicle.get('vehicle_type', ''),
+        'premium_amount': float(policy.get('premium_amount', 0)),
+        'coverage_amount': float(policy.get('coverage_amount', 0)),
+        'deductible_amount': float(policy.get('deductible_amount', 0))
+    }
+
+
+def build_enriched_policies(customer_id: str, policy_ids: Iterable[str] = (),
+                            vehicle_ids: Iterable[str] = ()) -> List[Record]:
+    """Active policies joined with their vehicles, read consistently from the base tables.
+
+    The customer_id indexes are eventually consistent, so right after a write
+    they can miss the new row or still show its old attributes. They are only
+    used for candidate keys: together with policy_ids and vehicle_ids (rows
+    known to have just changed, e.g. from stream records) every candidate is
+    re-read by key, and rows that no longer belong to the customer or are no
+    longer active are dropped.
+    """
+    policies = [policy for policy in batch_get_consistent(
+                    POLICY_TABLE, 'policy_id', set(list_policy_ids_for_customer(customer_id)) | set(policy_ids))
+                if policy.get('customer_id') == customer_id and policy.get('policy_status') == 'Active']
+    if not policies:
+        return []
+    vehicles_by_policy = {}
+    candidate_vehicle_ids = {vehicle['vehicle_id'] for vehicle in list_vehicles_for_customer(customer_id)} | set(vehicle_ids)
+    for vehicle in sorted(batch_get_consistent(VEHICLES_TABLE, 'vehicle_id', candidate_vehicle_ids),
+                          key=lambda vehicle: vehicle['vehicle_id']):
+        if vehicle.get('customer_id') == customer_id:
+            vehicles_by_policy.setdefault(vehicle.get('policy_id'), vehicle)
+    return [enrich_policy(policy, vehicles_by_policy.get(policy.get('policy_id')))
+            for policy in sorted(policies, key=lambda policy: policy['policy_id'])]
+
+
+# Vehicles
+
+def get_vehicle_for_policy(policy_id: str) -> Optional[Record]:
+    """The vehicle insured under a policy, via the policy_id index"""
+    def load():
+        snapshot = current_snapshot()
+        record = snapshot.get_vehicle_for_policy(policy_id) if snapshot else None
+        if record:
+            return record
+
+        response = get_table(VEHICLES_TABLE).query(
+            IndexName=VEHICLE_POLICY_INDEX,
+            KeyConditionExpression='policy_id = :pid',
+            ExpressionAttributeValues={':pid': policy_id}
+        )
+        return response['Items'][0] if response.get('Items') else None
+    return record_cache.get_or_load(VEHICLES_TABLE, ('policy', policy_id), load)
+
+
+def list_vehicles_for_customer(customer_id: str) -> List[Record]:
+    return query_all(
+        get_table(VEHICLES_TABLE),
+        IndexName=VEHICLE_CUSTOMER_INDEX,
+        KeyConditionExpression='customer_id = :cid',
+        ExpressionAttributeValues={':cid': customer_id}
+    )
+
+
+# Claims
+
+def delete_preliminary_claim(claim_id: str) -> bool:
+    """Delete a claim record still in the 'deciding' state; a finished record is left alone"""
+    try:
+        get_table(CLAIMS_TABLE).delete_item(
+            Key={'claim_id': claim_id},
+            ConditionExpression='#status = :deciding',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':deciding': 'deciding'}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def claim_listing_key(timestamp: str) -> str:
+    return CLAIM_LISTING_PREFIX + timestamp[:7]
+
+
+def claim_dashboard_status(item: Record) -> str:
+    """The status the dashboard shows and filters on: the recommendation once decided"""
+    if item.get('status') == 'processed':
+        return item.get('recommendation', 'MANUAL_REVIEW')
+    return 'IN_PROGRESS'
+
+
+def put_claim(item: Record) -> None:
+    get_table(CLAIMS_TABLE).put_item(Item=to_decimal(dict(
+        item,
+        listing=claim_listing_key(item['timestamp']),
+        dashboard_status=claim_dashboard_status(item)
+    )))
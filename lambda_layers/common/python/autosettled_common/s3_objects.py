@@ -0,0 +1,71 @@
+"""Concurrent S3 retrieval for the claim images and documents.
+
+A module-scope thread pool fetches every object of a request at once, so the
+total fetch time is that of the slowest object rather than the sum. The pool
+never exceeds the S3 client's connection pool, results come back in the
+order the URIs were given, and each object gets a timeout after which the
+whole fetch fails with the URI that was too slow.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+from .clients import DEFAULT_CONFIG, get_s3
+
+FETCH_MAX_WORKERS = min(int(os.environ.get('S3_FETCH_MAX_WORKERS', 8)), DEFAULT_CONFIG.max_pool_connections)
+FETCH_TIMEOUT_SECONDS = float(os.environ.get('S3_FETCH_TIMEOUT_SECONDS', 30))
+
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS)
+
+
+class FetchedObject(NamedTuple):
+    uri: str
+    data: bytes
+    content_type: str
+
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    parts = uri.replace("s3://", "").split("/", 1)
+    return parts[0], parts[1]
+
+
+def open_object(uri: str) -> Dict[str, Any]:
+    """get_object response for an s3:// URI; the Body has not been read"""
+    bucket, key = parse_s3_uri(uri)
+    return get_s3().get_object(Bucket=bucket, Key=key)
+
+
+def read_object(uri: str) -> FetchedObject:
+    response = open_object(uri)
+    return FetchedObject(uri, response['Body'].read(), response.get('ContentType', ''))
+
+
+def _gather(fn: Callable[[str], Any], uris: Sequence[str], timeout: float) -> List[Any]:
+    started = time.monotonic()
+    futures = [fetch_executor.submit(fn, uri) for uri in uris]
+    results = []
+    try:
+        for uri, future in zip(uris, futures):
+            # Objects are fetched side by side, so each one's timeout runs from the start
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                results.append(future.result(timeout=remaining))
+            except TimeoutError:
+                raise TimeoutError(f"Timed out after {timeout:.0f}s fetching {uri}")
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    print(f"Fetched {len(uris)} S3 objects in {time.monotonic() - started:.2f}s")
+    return results
+
+
+def fetch_objects(uris: Sequence[str], timeout: float = FETCH_TIMEOUT_SECONDS) -> List[FetchedObject]:
+    """Read every object concurrently; results are in the order of uris"""
+    return _gather(read_object, uris, timeout)
+
+
+def open_objects(uris: Sequence[str], timeout: float = FETCH_TIMEOUT_SECONDS) -> List[Dict[str, Any]]:
+    """Issue every get_object concurrently, leaving the bodies to be streamed by the caller"""
+    return _gather(open_object, uris, timeout)
@@ -0,0 +1,156 @@
+"""Output schemas for the damage, document and decision results.
+
+The schemas double as the input_schema of the tool each model call is
+forced to use (see structured.py), so every result is produced as JSON,
+parsed once and validated here. validate() covers only the JSON Schema
+keywords these schemas use: type (one type or a list of them), properties,
+required, items and enum.
+
+Facts read from the documents that a report may simply not contain (case
+number, date, location, estimate total) are nullable, so a missing one is
+recorded as null instead of being made up.
+"""
+import re
+from typing import Any, Dict, List
+
+Schema = Dict[str, Any]
+
+STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+NULLABLE_STRING = {'type': ['string', 'null']}
+NULLABLE_NUMBER = {'type': ['number', 'null']}
+
+# Placeholder text a model writes for a value it does not have
+UNKNOWN_TEXT = ('', 'unknown', 'n/a', 'na', 'none', 'null', 'not stated', 'not available')
+
+DAMAGE_TOOL = 'record_damage_analysis'
+DAMAGE_SCHEMA: Schema = {
+    'type': 'object',
+    'properties': {
+        'vehicle_matches_policy': {'type': 'boolean'},
+        'vehicle_match_notes': {'type': 'string'},
+        'damaged_parts': STRING_LIST,
+        'damage_summary': {'type': 'string'},
+        'estimated_repair_cost_usd': {'type': 'number'},
+        'likely_crash_reason': {'type': 'string'},
+        'severity': {'type': 'string', 'enum': ['minor', 'moderate', 'severe']},
+        'suspicious_indicators': STRING_LIST
+    },
+    'required': ['vehicle_matches_policy', 'vehicle_match_notes', 'damaged_parts', 'damage_summary',
+                 'estimated_repair_cost_usd', 'likely_crash_reason', 'severity', 'suspicious_indicators']
+}
+
+DOCUMENT_TOOL = 'record_document_analysis'
+DOCUMENT_SCHEMA: Schema = {
+    'type': 'object',
+    'properties': {
+        'incident_date': NULLABLE_STRING,
+        'incident_location': NULLABLE_STRING,
+        'police_case_number': NULLABLE_STRING,
+        'fault_determination': {'type': 'string'},
+        'estimated_repair_cost': NULLABLE_NUMBER,
+        'repair_items': STRING_LIST,
+        'inconsistencies': STRING_LIST,
+        'red_flags': STRING_LIST,
+        'document_authenticity_assessment': {'type': 'string'}
+    },
+    'required': ['incident_date', 'incident_location', 'police_case_number', 'fault_determination',
+                 'estimated_repair_cost', 'repair_items', 'inconsistencies', 'red_flags',
+                 'document_authenticity_assessment']
+}
+
+DECISION_TOOL = 'record_settlement_decision'
+# Property order matters: the short fields stream first (see settlement streaming)
+DECISION_SCHEMA: Schema = {
+    'type': 'object',
+    'properties': {
+        'recommendation': {'type': 'string', 'enum': ['APPROVE', 'MANUAL_REVIEW', 'DENY']},
+        'approved_amount': {'type': 'number'},
+        'deductible_applies': {'type': 'boolean'},
+        'customer_pays': {'type': 'number'},
+        'insurance_pays': {'type': 'number'},
+        'genuine_factors': STRING_LIST,
+        'suspicious_factors': STRING_LIST,
+        'risk_assessment': {'type': 'string', 'enum': ['low', 'medium', 'high']},
+        'detailed_reasoning': {'type': 'string'},
+        'supporting_evidence': STRING_LIST,
+        'next_steps': STRING_LIST
+    },
+    'required': ['recommendation', 'approved_amount', 'deductible_applies', 'customer_pays', 'insurance_pays',
+                 'genuine_factors', 'suspicious_factors', 'risk_assessment', 'detailed_reasoning',
+                 'supporting_evidence', 'next_steps']
+}
+
+# Single-pass settlement reports also take their prose from the decision
+SINGLE_PASS_DECISION_SCHEMA: Schema = {
+    'type': 'object',
+    'properties': dict(DECISION_SCHEMA['properties'],
+                       claim_summary={'type': 'string'},
+                       decision_reasoning={'type': 'string'}),
+    'required': DECISION_SCHEMA['required'] + ['claim_summary', 'decision_reasoning']
+}
+
+NUMBER_TEXT_RE = re.compile(r'^\s*\$?\s*(-?[\d,]*\.?\d+)\s*$')
+
+
+def _is_type(value: Any, expected) -> bool:
+    if isinstance(expected, list):
+        return any(_is_type(value, option) for option in expected)
+    if expected == 'number':
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected == 'integer':
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, {'string': str, 'boolean': bool, 'array': list, 'object': dict,
+                              'null': type(None)}[expected])
+
+
+def coerce(value: Any, schema: Schema) -> Any:
+    """Fix the cheap, unambiguous mismatches: '$1,200' for a number, 'true' for a boolean, wrong enum case"""
+    expected = schema.get('type')
+    if isinstance(expected, list):
+        # A nullable number given as 'unknown' means null; otherwise use the first type it coerces to
+        if 'null' in expected and 'string' not in expected and isinstance(value, str) \
+                and value.strip().lower() in UNKNOWN_TEXT:
+            return None
+        for option in expected:
+            coerced = coerce(value, dict(schema, type=option))
+            if _is_type(coerced, option):
+                return coerced
+        return value
+    if expected == 'object' and isinstance(value, dict):
+        properties = schema.get('properties', {})
+        return {key: coerce(item, properties[key]) if key in properties else item for key, item in value.items()}
+    if expected == 'array' and isinstance(value, list) and 'items' in schema:
+        return [coerce(item, schema['items']) for item in value]
+    if expected == 'number' and isinstance(value, str):
+        match = NUMBER_TEXT_RE.match(value)
+        if match:
+            number = float(match.group(1).replace(',', ''))
+            return int(number) if number.is_integer() else number
+    if expected == 'boolean' and isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    if expected == 'string' and isinstance(value, str) and 'enum' in schema:
+        for option in schema['enum']:
+            if value.strip().lower() == option.lower():
+                return option
+    return value
+
+
+def validate(value: Any, schema: Schema, path: str = '$') -> List[str]:
+    """List of problems with value against schema; empty when it conforms"""
+    expected = schema.get('type')
+    if expected and not _is_type(value, expected):
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+    errors = []
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if expected == 'object':
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append(f"{path}.{key}: required")
+        for key, subschema in schema.get('properties', {}).items():
+            if key in value:
+                errors.extend(validate(value[key], subschema, f"{path}.{key}"))
+    if expected == 'array' and 'items' in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema['items'], f"{path}[{index}]"))
+    return errors
@@ -0,0 +1,227 @@
+"""Read-only reference-data snapshot (customers, policies, vehicles) as a local SQLite file.
+
+export_reference_snapshot.py writes the tables to a compact, indexed SQLite
+file in S3 and points reference-snapshots/latest.json at it. Each container
+downloads the current file to /tmp once, opens it read-only with SQLite
+memory-mapped I/O, and re-checks the pointer every few minutes so a new
+snapshot is picked up without a redeploy.
+
+Only slow-changing data is served from it: customers and vehicles. A policy
+can be cancelled between exports, so policies (and with them policy_status
+and active-policy lists) are always read from DynamoDB and the portfolio
+item; the policies table is exported for offline inspection only.
+
+The snapshot also carries the customer membership filter (see bloom.py),
+built from the same customer rows, so the filter is never older or newer
+than the customers it describes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .bloom import BloomFilter, customer_filter_key
+from .clients import get_s3
+
+SNAPSHOT_PREFIX = 'reference-snapshots/'
+POINTER_KEY = SNAPSHOT_PREFIX + 'latest.json'
+LOCAL_DIR = '/tmp'
+MMAP_SIZE = 256 * 1024 * 1024
+
+Record = Dict[str, Any]
+
+SCHEMA = """
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE customers (
+    customer_id TEXT PRIMARY KEY,
+    email TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX customers_email ON customers (email);
+CREATE TABLE policies (
+    policy_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    policy_status TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX policies_customer ON policies (customer_id);
+CREATE TABLE vehicles (
+    vehicle_id TEXT PRIMARY KEY,
+    policy_id TEXT,
+    customer_id TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX vehicles_policy ON vehicles (policy_id);
+CREATE TABLE filters (name TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+
+def write_snapshot(path: str, version: str, customers: Iterable[Record],
+                   policies: Iterable[Record], vehicles: Iterable[Record]) -> Dict[str, int]:
+    """Write plain (Decimal-free) records to a new SQLite snapshot file at path"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        counts = {'customers': 0, 'policies': 0, 'vehicles': 0}
+        filter_keys = []
+        for c in customers:
+            conn.execute('INSERT INTO customers VALUES (?, ?, ?, ?, ?)',
+                         (c['customer_id'], c.get('email'), c.get('first_name'), c.get('last_name'), json.dumps(c)))
+            filter_keys.append(customer_filter_key(c.get('email'), c.get('last_name')))
+            counts['customers'] += 1
+        conn.execute('INSERT INTO filters VALUES (?, ?)',
+                     ('customers', BloomFilter.build(filter_keys, source_version=version).to_bytes()))
+        for p in policies:
+            conn.execute('INSERT INTO policies VALUES (?, ?, ?, ?)',
+                         (p['policy_id'], p.get('customer_id'), p.get('policy_status'), json.dumps(p)))
+            counts['policies'] += 1
+        for v in vehicles:
+            conn.execute('INSERT INTO vehicles VALUES (?, ?, ?, ?)',
+                         (v['vehicle_id'], v.get('policy_id'), v.get('customer_id'), json.dumps(v)))
+            counts['vehicles'] += 1
+        conn.execute('INSERT INTO metadata VALUES (?, ?)', ('version', version))
+        conn.execute('INSERT INTO metadata VALUES (?, ?)', ('counts', json.dumps(counts)))
+        conn.commit()
+        conn.execute('VACUUM')
+        return counts
+    finally:
+        conn.close()
+
+
+def publish_snapshot(path: str, bucket: str, version: str) -> str:
+    """Upload a snapshot file and repoint latest.json at it; returns the object key"""
+    s3 = get_s3()
+    key = f"{SNAPSHOT_PREFIX}{version}.sqlite"
+    s3.upload_file(path, bucket, key)
+    s3.put_object(
+        Bucket=bucket,
+        Key=POINTER_KEY,
+        Body=json.dumps({'version': version, 'key': key}),
+        ContentType='application/json'
+    )
+    return key
+
+
+class ReferenceSnapshot:
+    """Lazily downloaded, version-checked, memory-mapped snapshot reader.
+
+    Every lookup returns None when the record is not in the snapshot (or the
+    snapshot is unavailable), so callers fall back to DynamoDB.
+    """
+
+    def __init__(self, bucket: Optional[str], check_interval: float = 300):
+        self.bucket = bucket
+        self.check_interval = check_interval
+        self.version = None
+        self._conn = None
+        self._customer_filter = None
+        self._customer_filter_version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        enabled = os.environ.get('REFERENCE_SNAPSHOT_ENABLED', 'false').lower() == 'true'
+        bucket = os.environ.get('REFERENCE_SNAPSHOT_BUCKET', os.environ.get('S3_BUCKET_NAME'))
+        return cls(bucket if enabled else None,
+                   float(os.environ.get('REFERENCE_SNAPSHOT_CHECK_SECONDS', 300)))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bucket)
+
+    def ensure_current(self) -> bool:
+        """Load or refresh the local copy if due; returns True when a snapshot is usable"""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._conn is not None
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                try:
+                    self._refresh()
+                except Exception as e:
+                    print(f"Reference snapshot unavailable, using DynamoDB: {str(e)}")
+        return self._conn is not None
+
+    def _refresh(self):
+        s3 = get_s3()
+        pointer = json.loads(s3.get_object(Bucket=self.bucket, Key=POINTER_KEY)['Body'].read())
+        if pointer['version'] == self.version:
+            return
+        local_path = os.path.join(LOCAL_DIR, f"reference-{pointer['version']}.sqlite")
+        if not os.path.exists(local_path):
+            s3.download_file(self.bucket, pointer['key'], local_path + '.part')
+            os.replace(local_path + '.part', local_path)
+        conn = sqlite3.connect(f"file:{local_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        old_conn, old_version = self._conn, self.version
+        self._conn, self.version = conn, pointer['version']
+        print(f"Reference snapshot {self.version} loaded from s3://{self.bucket}/{pointer['key']}")
+        if old_conn is not None:
+            old_conn.close()
+            stale_path = os.path.join(LOCAL_DIR, f"reference-{old_version}.sqlite")
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+    def _records(self, sql: str, params: tuple) -> List[Record]:
+        with self._lock:
+            if self._conn is None:
+                return []
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _record(self, sql: str, params: tuple) -> Optional[Record]:
+        records = self._records(sql, params)
+        return records[0] if records else None
+
+    def customer_filter(self) -> Optional[BloomFilter]:
+        """The membership filter over this snapshot's customers; None if missing or not built from them"""
+        with self._lock:
+            if self._conn is None:
+                return None
+            if self._customer_filter_version != self.version:
+                self._customer_filter_version = self.version
+                self._customer_filter = self._load_customer_filter()
+            return self._customer_filter
+
+    def _load_customer_filter(self) -> Optional[BloomFilter]:
+        try:
+            row = self._conn.execute("SELECT data FROM filters WHERE name = 'customers'").fetchone()
+            counts = json.loads(self._conn.execute("SELECT value FROM metadata WHERE key = 'counts'").fetchone()[0])
+            if row is None:
+                raise ValueError('no filter in snapshot')
+            bloom = BloomFilter.from_bytes(row[0])
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print(f"Customer membership filter disabled: {str(e)}")
+            return None
+        # A filter over other data would reject real customers, so never guess
+        if bloom.source_version != self.version or bloom.item_count != counts.get('customers'):
+            print(f"Customer membership filter disabled: built from {bloom.item_count} customers "
+                  f"of {bloom.source_version}, snapshot {self.version} has {counts.get('customers')}")
+            return None
+        return bloom
+
+    def find_customer(self, first_name: str, last_name: str, email: str) -> Optional[Record]:
+        return self._record(
+            'SELECT record FROM customers WHERE email = ? AND first_name = ? AND last_name = ? LIMIT 1',
+            (email, first_name, last_name))
+
+    def get_vehicle_for_policy(self, policy_id: str) -> Optional[Record]:
+        return self._record('SELECT record FROM vehicles WHERE policy_id = ? LIMIT 1', (policy_id,))
+
+
+# One reader per container; disabled unless REFERENCE_SNAPSHOT_ENABLED=true
+reference_snapshot = ReferenceSnapshot.from_env()
+
+
+def current_snapshot() -> Optional[ReferenceSnapshot]:
+    return reference_snapshot if reference_snapshot.ensure_current() else None
@@ -0,0 +1,95 @@
+"""Helpers for Bedrock response streams (invoke_model_with_response_stream).
+
+iter_text_deltas turns the Anthropic messages event stream into plain text
+pieces (or, for a tool call, pieces of its input JSON), and
+IncrementalJsonObjectParser picks complete top-level fields out of a JSON
+object while it is still being generated, so callers can act on the short
+leading fields before the long prose fields have finished.
+"""
+import json
+from typing import Any, Iterable, Iterator, List, Tuple
+
+Field = Tuple[str, Any]
+
+
+def iter_text_deltas(event_stream: Iterable[dict]) -> Iterator[str]:
+    """Yield the text (or tool-input JSON) of each content_block_delta event in a response stream"""
+    for event in event_stream:
+        chunk = event.get('chunk')
+        if chunk is None:
+            # Stream-level errors arrive as events, e.g. throttlingException
+            raise RuntimeError(f"Bedrock stream error: {json.dumps(event, default=str)}")
+        payload = json.loads(chunk['bytes'])
+        if payload.get('type') == 'content_block_delta':
+            delta = payload.get('delta', {})
+            if delta.get('type') == 'text_delta':
+                yield delta.get('text', '')
+            elif delta.get('type') == 'input_json_delta':
+                yield delta.get('partial_json', '')
+
+
+class IncrementalJsonObjectParser:
+    """Emit the members of a streamed top-level JSON object as each one completes.
+
+    Text before the first '{' (for example a ```json fence) is skipped. Only
+    new characters are scanned on each feed, tracking string/escape state and
+    nesting depth; a member is parsed once the ',' or '}' that ends it arrives.
+    Members that fail to parse are dropped, since the caller still parses the
+    full text at the end.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, text: str) -> List[Field]:
+        """Add streamed text; returns the (key, value) pairs completed by it"""
+        if self.done:
+            return []
+        self._text += text
+        fields = []
+        buf = self._text
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._member_start is None:
+                if ch == '{':
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    fields.extend(self._parse_member(buf[self._member_start:i]))
+                    self.done = True
+                    break
+            elif ch == ',' and self._depth == 1:
+                fields.extend(self._parse_member(buf[self._member_start:i]))
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return fields
+
+    @staticmethod
+    def _parse_member(fragment: str) -> List[Field]:
+        if not fragment.strip():
+            return []
+        try:
+            return list(json.loads('{' + fragment + '}').items())
+        except ValueError:
+            return []
@@ -0,0 +1,89 @@
+"""Tool-use structured output for model calls.
+
+Each analysis call forces a single tool whose input_schema is the result
+schema, so the answer comes back as an already-parsed JSON object. That
+object is coerced and validated once, where it is produced; a result that
+still does not conform gets one cheap, text-only repair call (the invalid
+object plus the validation errors, no images or documents), and if that
+fails too a StructuredOutputError is raised rather than passing raw text on.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from .bedrock import bedrock_invoker
+from .schemas import Schema, coerce, validate
+
+REPAIR_MAX_TOKENS = int(os.environ.get('REPAIR_MAX_TOKENS', 2000))
+
+
+class StructuredOutputError(Exception):
+    """The model's output did not match its schema, even after a repair attempt"""
+
+
+def tool_fields(name: str, schema: Schema) -> Dict[str, Any]:
+    """Request-body fields that force the model to answer through one tool"""
+    return {
+        'tools': [{
+            'name': name,
+            'description': f"Record the {name.replace('record_', '').replace('_', ' ')} result.",
+            'input_schema': schema
+        }],
+        'tool_choice': {'type': 'tool', 'name': name}
+    }
+
+
+def tool_input(result: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    """The input of the named tool_use block in an invoke_model response body"""
+    for block in result.get('content', []):
+        if block.get('type') == 'tool_use' and block.get('name') == name:
+            return block.get('input')
+    return None
+
+
+def invoke_tool(model_id: str, body, name: str) -> Dict[str, Any]:
+    """Invoke a forced-tool request and return the tool input, unvalidated"""
+    result = bedrock_invoker.invoke(model_id, body)
+    value = tool_input(result, name)
+    if value is None:
+        raise StructuredOutputError(f"{name}: model returned no tool call (stop_reason {result.get('stop_reason')})")
+    return value
+
+
+def repair(value: Any, errors: List[str], schema: Schema, name: str, model_id: str) -> Any:
+    prompt = f"""This {name} output does not match its schema.
+
+Problems:
+{chr(10).join('- ' + error for error in errors[:20])}
+
+Output:
+{json.dumps(value, separators=(',', ':'))}
+
+Call the {name} tool with a corrected version. Keep every value that is already valid and fix types and enum values. For a missing required field, use only what the output above states. If it does not state the value, use null where the schema allows null, otherwise "unknown" for text. Never guess identifiers, dates or amounts."""
+    body = json.dumps({
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': REPAIR_MAX_TOKENS,
+        'temperature': 0,
+        'messages': [{'role': 'user', 'content': prompt}],
+        **tool_fields(name, schema)
+    })
+    return invoke_tool(model_id, body, name)
+
+
+def validated(value: Any, schema: Schema, name: str, model_id: str) -> Dict[str, Any]:
+    """Coerce and validate a tool input, repairing it once through the model if needed"""
+    value = coerce(value, schema)
+    errors = validate(value, schema)
+    if not errors:
+        return value
+    print(f"{name} failed validation, repairing: {errors[:5]}")
+    value = coerce(repair(value, errors, schema, name, model_id), schema)
+    errors = validate(value, schema)
+    if errors:
+        raise StructuredOutputError(f"{name} still invalid after repair: {errors[:5]}")
+    return value
+
+
+def invoke_structured(model_id: str, body, name: str, schema: Schema) -> Dict[str, Any]:
+    """Invoke a forced-tool request and return its validated result"""
+    return validated(invoke_tool(model_id, body, name), schema, name, model_id)
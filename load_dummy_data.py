@@ -1,5 +1,11 @@
 import boto3
 import csv
+import os
+import sys
+
+# Reuse the portfolio builder shipped in the common Lambda layer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_layers', 'common', 'python'))
+from autosettled_common.portfolio import refresh_portfolios
 
 # Initialize DynamoDB client
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
@@ -42,6 +48,14 @@ def load_vehicles():
             print(f"  Added vehicle: {row['make']} {row['model']} ({row['registration_number']})")
     print("✓ Vehicles loaded\n")
 
+def load_portfolios():
+    """Rebuild the materialized customer portfolios from the loaded policies and vehicles"""
+    print("Building customer portfolios...")
+    with open('dummy_data/customers.csv', 'r') as f:
+        customer_ids = [row['customer_id'] for row in csv.DictReader(f)]
+    refreshed = refresh_portfolios(customer_ids)
+    print(f"✓ {refreshed} portfolios built\n")
+
 if __name__ == '__main__':
     print("=" * 50)
     print("Loading Dummy Data into DynamoDB")
@@ -51,10 +65,13 @@ if __name__ == '__main__':
         load_customers()
         load_policies()
         load_vehicles()
+        load_portfolios()
 
         print("=" * 50)
         print("✓ All data loaded successfully!")
         print("=" * 50)
+        print("Re-run export_reference_snapshot.py so the snapshot and the customer")
+        print("membership filter include the new data")
     except Exception as e:
         print(f"\n❌ Error: {e}")
         print("Make sure your AWS credentials are configured and tables exist.")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The shared layer is importable the same way the Lambdas see it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'lambda_layers', 'common', 'python'))
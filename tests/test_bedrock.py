@@ -0,0 +1,146 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+from autosettled_common import bedrock
+from autosettled_common.bedrock import BedrockDeadlineExceeded, BedrockInvoker
+from autosettled_common.streaming import iter_text_deltas
+
+
+class FakeRuntime:
+    """bedrock-runtime that fails with the queued errors, then answers"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke_model(self, modelId, body):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'body': io.BytesIO(json.dumps({'ok': True}).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'body': [text_event('Hello'), text_event(', world')]}
+
+
+class Context:
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_seconds * 1000
+
+
+def text_event(text):
+    payload = {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': text}}
+    return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+
+def throttle():
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'InvokeModel')
+
+
+def make_invoker(runtime, **kwargs):
+    kwargs.setdefault('requests_per_minute', 6000)
+    kwargs.setdefault('burst', 100)
+    return BedrockInvoker(client_factory=lambda: runtime, sleep=lambda seconds: None, **kwargs)
+
+
+def test_connection_errors_and_read_timeouts_are_retried():
+    runtime = FakeRuntime([EndpointConnectionError(endpoint_url='https://bedrock'),
+                           ReadTimeoutError(endpoint_url='https://bedrock')])
+    invoker = make_invoker(runtime)
+
+    assert invoker.invoke('model', '{}') == {'ok': True}
+    assert runtime.calls == 3
+    assert invoker.stats()['model']['Retries'] == 2
+
+
+def test_validation_errors_are_not_retried():
+    error = ClientError({'Error': {'Code': 'ValidationException', 'Message': 'bad'}}, 'InvokeModel')
+    runtime = FakeRuntime([error])
+    invoker = make_invoker(runtime)
+
+    with pytest.raises(ClientError):
+        invoker.invoke('model', '{}')
+    assert runtime.calls == 1
+    assert invoker.stats()['model']['Failures'] == 1
+
+
+def slot_free(invoker):
+    """Whether a call can start right now, given a deadline too short to wait for a slot"""
+    invoker.start_invocation(Context(invoker.deadline_margin + 0.05))
+    try:
+        invoker.invoke('model', '{}')
+        return True
+    except BedrockDeadlineExceeded:
+        return False
+    finally:
+        invoker.start_invocation(None)
+
+
+def test_stream_holds_its_slot_until_consumed():
+    invoker = make_invoker(FakeRuntime(), max_concurrency=1)
+
+    stream = invoker.invoke_stream('model', '{}')
+    assert not slot_free(invoker)
+
+    assert ''.join(iter_text_deltas(stream)) == 'Hello, world'
+    assert slot_free(invoker)
+
+
+def test_stream_closed_early_releases_its_slot():
+    invoker = make_invoker(FakeRuntime(), max_concurrency=1)
+
+    deltas = iter_text_deltas(invoker.invoke_stream('model', '{}'))
+    assert next(deltas) == 'Hello'
+    deltas.close()
+
+    assert slot_free(invoker)
+
+
+def test_unread_stream_released_on_close():
+    invoker = make_invoker(FakeRuntime(), max_concurrency=1)
+
+    invoker.invoke_stream('model', '{}').close()
+
+    assert slot_free(invoker)
+
+
+def test_failed_stream_call_releases_its_slot():
+    error = ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'no'}}, 'InvokeModelWithResponseStream')
+    invoker = make_invoker(FakeRuntime([error]), max_concurrency=1)
+
+    with pytest.raises(ClientError):
+        invoker.invoke_stream('model', '{}')
+
+    assert slot_free(invoker)
+
+
+def test_backoff_past_the_deadline_raises_instead_of_sleeping(monkeypatch):
+    monkeypatch.setattr(bedrock.random, 'uniform', lambda low, high: high)
+    sleeps = []
+    runtime = FakeRuntime([throttle(), throttle()])
+    invoker = BedrockInvoker(requests_per_minute=6000, burst=100, base_delay=2.0,
+                             client_factory=lambda: runtime, sleep=sleeps.append)
+    invoker.start_invocation(Context(invoker.deadline_margin + 3))
+
+    with pytest.raises(BedrockDeadlineExceeded):
+        invoker.invoke('model', '{}')
+
+    # The first 2 s backoff fits in the 3 s left; the second 4 s one is never slept.
+    # The other (short) sleeps are the rate-limit waits of the throttled bucket
+    assert sleeps[0] == 2.0
+    assert max(sleeps) == 2.0
+    assert runtime.calls == 2
+    stats = invoker.stats()['model']
+    assert (stats['Throttles'], stats['DeadlineExceeded']) == (2, 1)
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from autosettled_common import claim_context
+
+
+class FakeTable:
+    """Just enough of a DynamoDB table for the claim context"""
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, Item):
+        self.items[Item['context_key']] = dict(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues=None):
+        item = self.items.setdefault(Key['context_key'], dict(Key))
+        section = ExpressionAttributeNames['#section']
+        if UpdateExpression.startswith('REMOVE'):
+            item.pop(section, None)
+        else:
+            item.update({section: ExpressionAttributeValues[':value'],
+                         'expires_at': ExpressionAttributeValues[':expires']})
+
+    def get_item(self, Key, ProjectionExpression, ExpressionAttributeNames):
+        item = self.items.get(Key['context_key'])
+        return {'Item': dict(item)} if item else {}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(claim_context, 'get_table', lambda name: table)
+    return table
+
+
+DAMAGE = {'success': True, 'vehicle_vin': 'VIN1', 'vehicle_data': {'make': 'Honda'},
+          'analysis': {'severity': 'moderate', 'damaged_parts': ['bumper'], 'likely_crash_reason': 'rear-ended',
+                       'suspicious_indicators': [], 'estimated_repair_cost_usd': 1200,
+                       'vehicle_matches_policy': True, 'damage_summary': 'dented bumper'}}
+
+
+def test_forwarded_summary_is_replaced_by_the_stored_section(table):
+    summary = claim_context.store_and_summarize('session-1', 'damage_analysis', DAMAGE, {'severity': 'moderate'})
+
+    # The agent passes the summary on as a JSON string parameter
+    values = claim_context.fill_missing('session-1', {'damage_analysis': json.dumps(summary), 'policy_data': ''})
+
+    assert values['damage_analysis'] == DAMAGE
+    assert values['policy_data'] == ''
+
+
+def test_passed_full_values_are_kept(table):
+    claim_context.save_section('session-1', 'damage_analysis', DAMAGE)
+    passed = {'analysis': {'severity': 'minor'}}
+
+    assert claim_context.fill_missing('session-1', {'damage_analysis': passed})['damage_analysis'] is passed
+
+
+def test_new_claim_drops_the_previous_claims_sections(table):
+    claim_context.save_section('session-1', 'damage_analysis', DAMAGE)
+    claim_context.save_section('session-1', 'document_analysis', {'incident_date': '2025-01-01'})
+
+    claim_context.store_and_summarize('session-1', 'customer_data', {'customer_id': 'C2'}, {}, new_claim=True)
+    values = claim_context.fill_missing('session-1', {'customer_data': None, 'damage_analysis': None,
+                                                      'document_analysis': None})
+
+    assert values == {'customer_data': {'customer_id': 'C2'}, 'damage_analysis': None, 'document_analysis': None}
+
+
+def test_cleared_section_is_not_reused(table):
+    claim_context.save_section('session-1', 'damage_analysis', DAMAGE)
+    claim_context.clear_section('session-1', 'damage_analysis')
+
+    assert claim_context.fill_missing('session-1', {'damage_analysis': None})['damage_analysis'] is None
+
+
+def test_reference_to_another_session_is_ignored(table):
+    claim_context.save_section('session-1', 'damage_analysis', DAMAGE)
+    forged = json.dumps({'severity': 'minor', 'context_key': 'session-1'})
+
+    values = claim_context.fill_missing('session-2', {'damage_analysis': forged})
+
+    assert values['damage_analysis'] == forged
+
+
+def test_context_key_parameter_does_not_override_the_session():
+    event = {'sessionId': 'session-2', 'parameters': [{'name': 'context_key', 'value': 'session-1'}]}
+
+    assert claim_context.context_key(event) == 'session-2'
@@ -0,0 +1,25 @@
+import threading
+
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+
+from autosettled_common import clients
+
+
+def test_get_table_builds_its_dynamodb_resource_without_deadlock(monkeypatch):
+    class Resource:
+        def Table(self, name):
+            return ('table', name)
+
+    monkeypatch.setattr(clients, '_clients', {})
+    monkeypatch.setattr(clients.boto3, 'resource', lambda *args, **kwargs: Resource())
+
+    result = {}
+    worker = threading.Thread(daemon=True, target=lambda: result.update(table=clients.get_table('autosettled-customers')))
+    worker.start()
+    worker.join(timeout=5)
+
+    assert not worker.is_alive()
+    assert result['table'] == ('table', 'autosettled-customers')
+    assert clients.get_table('autosettled-customers') is result['table']
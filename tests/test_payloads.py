@@ -0,0 +1,65 @@
+import base64
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from autosettled_common.payloads import CHUNK_SIZE, MessagesBodyBuilder
+
+
+class TrickleStream(io.BytesIO):
+    """A stream that returns fewer bytes than asked for, like a network body"""
+
+    def read(self, size=-1):
+        return super().read(min(size, 1000) if size and size > 0 else size)
+
+
+IMAGE = bytes(range(256)) * 1000  # spans several chunks, length not a multiple of 3
+PDF = b'%PDF-1.4\n' + bytes(CHUNK_SIZE + 7)
+TEXT = 'Analyse the "damage" — café\n\tline two'
+
+
+def expected_body():
+    return json.dumps({
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': 1024,
+        'temperature': 0,
+        'messages': [{'role': 'user', 'content': [
+            {'type': 'image', 'source': {'type': 'base64', 'media_type': 'image/jpeg',
+                                         'data': base64.b64encode(IMAGE).decode()}},
+            {'type': 'document', 'source': {'type': 'base64', 'media_type': 'application/pdf',
+                                            'data': base64.b64encode(PDF).decode()}},
+            {'type': 'text', 'text': TEXT},
+        ]}],
+    }).encode()
+
+
+def builder():
+    return (MessagesBodyBuilder(max_tokens=1024, temperature=0)
+            .add_image('image/jpeg', IMAGE)
+            .add_document('application/pdf', TrickleStream(PDF), length=len(PDF))
+            .add_text(TEXT))
+
+
+def test_body_is_byte_identical_to_json_dumps():
+    built = builder()
+    size = built.size()
+    body = built.build()
+
+    assert bytes(body) == expected_body()
+    assert len(body) == size
+
+
+def test_concurrent_build_is_byte_identical_to_json_dumps():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        body = builder().build(executor=executor)
+
+    assert bytes(body) == expected_body()
+
+
+def test_short_stream_is_an_error():
+    short = MessagesBodyBuilder(max_tokens=10).add_image('image/png', io.BytesIO(b'abc'), length=10)
+
+    with pytest.raises(ValueError):
+        short.build()
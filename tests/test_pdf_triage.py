@@ -0,0 +1,89 @@
+import zlib
+
+import pytest
+
+from autosettled_common.pdf_triage import PdfDocument, PdfTriageError, triage_pdf
+
+
+def make_pdf(page_contents, compress=False):
+    """A minimal PDF with one content stream per page"""
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>'}
+    kids = []
+    for index, content in enumerate(page_contents):
+        page_num, content_num = 3 + 2 * index, 4 + 2 * index
+        stream, extra = (zlib.compress(content), b' /Filter /FlateDecode') if compress else (content, b'')
+        objects[content_num] = b'<< /Length %d%s >>\nstream\n%s\nendstream' % (len(stream), extra, stream)
+        objects[page_num] = b'<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>' % content_num
+        kids.append(page_num)
+    objects[2] = b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 612 792] >>' % (
+        b' '.join(b'%d 0 R' % num for num in kids), len(kids))
+    out = b'%PDF-1.4\n'
+    for num in sorted(objects):
+        out += b'%d 0 obj\n%s\nendobj\n' % (num, objects[num])
+    return out + b'trailer\n<< /Root 1 0 R >>\n%%EOF\n'
+
+
+def filler_pages(count):
+    return [b'BT /F1 12 Tf (Page %d of the report) Tj ET' % (i + 1) for i in range(count)]
+
+
+def split_on_page_three(total_page, compress=False):
+    pages = filler_pages(6)
+    pages[2] = total_page
+    return triage_pdf(make_pdf(pages, compress), max_pages=2, leading_pages=1, key_terms=('total', 'balance due'))
+
+
+def test_small_document_is_passed_through():
+    data = make_pdf(filler_pages(2))
+
+    result = triage_pdf(data, max_pages=6)
+
+    assert result.data == data
+    assert (result.page_count, result.split) == (2, False)
+
+
+def test_literal_string_total_selects_its_page():
+    result = split_on_page_three(b'BT (Grand Total: $1,200) Tj ET')
+
+    assert result.split
+    assert result.selected_pages == [1, 3]
+    assert len(PdfDocument(result.data).pages) == 2
+
+
+def test_literal_string_escapes_are_decoded():
+    result = split_on_page_three(b'BT (Bal\\141nce\\040due) Tj ET')
+
+    assert result.selected_pages == [1, 3]
+
+
+def test_hex_string_total_selects_its_page():
+    # "Total" as a hex string, split across TJ array elements
+    result = split_on_page_three(b'BT [<546f74> -20 <616c>] TJ ET')
+
+    assert result.selected_pages == [1, 3]
+
+
+def test_compressed_content_stream_is_read():
+    result = split_on_page_three(b'BT (Total 980.00) Tj ET', compress=True)
+
+    assert result.selected_pages == [1, 3]
+
+
+def test_unreadable_text_falls_back_to_the_last_page():
+    result = split_on_page_three(b'BT (no amounts here) Tj ET')
+
+    assert result.selected_pages == [1, 6]
+
+
+def test_malformed_document_is_passed_through_within_budget():
+    data = b'%PDF-1.4\nthis is not a pdf body'
+
+    result = triage_pdf(data, max_bytes=1000)
+
+    assert result.data == data
+    assert (result.page_count, result.split) == (None, False)
+
+
+def test_malformed_document_over_budget_is_rejected():
+    with pytest.raises(PdfTriageError):
+        triage_pdf(b'%PDF-1.4\n' + b'x' * 200, max_bytes=100)
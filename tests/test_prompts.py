@@ -0,0 +1,52 @@
+import json
+
+from autosettled_common import prompts
+from autosettled_common.prompts import (DAMAGE_FIELDS_FOR_DECISION, MIN_STRING_CHARS, damage_findings,
+                                        document_findings, estimate_tokens, render_prompt)
+
+
+def render(documents):
+    return f"DOCUMENTS:\n{documents}"
+
+
+def test_over_budget_prompt_that_cannot_fit_stops_at_the_string_floor(monkeypatch):
+    monkeypatch.setattr(prompts, 'record_prompt_metrics', lambda *args, **kwargs: None)
+    calls = []
+
+    def counting_render(documents):
+        calls.append(documents)
+        return render(documents)
+
+    # 150 repair lines: even at the per-string floor this stays over budget
+    sections = {'documents': {'repair_items': [f"Line {i}: " + 'replace panel and refinish ' * 6 for i in range(150)]}}
+    prompt = render_prompt('decision', counting_render, sections, budget=500)
+
+    assert estimate_tokens(prompt) > 500
+    assert len(calls) < 10
+    items = json.loads(calls[-1])['repair_items']
+    assert max(len(item) for item in items) == MIN_STRING_CHARS + len('...')
+
+
+def test_over_budget_prompt_is_shortened_to_fit(monkeypatch):
+    monkeypatch.setattr(prompts, 'record_prompt_metrics', lambda *args, **kwargs: None)
+    sections = {'documents': {'summary': 'x' * 4000, 'case': 'PD-1'}}
+
+    prompt = render_prompt('decision', render, sections, budget=400)
+
+    assert estimate_tokens(prompt) <= 400
+    assert json.loads(prompt.split('\n', 1)[1])['case'] == 'PD-1'
+
+
+def test_prompt_within_budget_is_left_alone(monkeypatch):
+    metrics = []
+    monkeypatch.setattr(prompts, 'record_prompt_metrics', lambda *args, **kwargs: metrics.append(kwargs))
+    sections = {'documents': {'summary': 'short'}}
+
+    assert render_prompt('decision', render, sections, budget=400) == 'DOCUMENTS:\n{"summary":"short"}'
+    assert metrics == [{'truncated': False}]
+
+
+def test_findings_unwrap_fenced_and_wrapped_results():
+    damage = {'analysis': '```json\n{"severity": "minor", "damaged_parts": ["door"], "extra": 1}\n```'}
+    assert damage_findings(damage, DAMAGE_FIELDS_FOR_DECISION) == {'severity': 'minor', 'damaged_parts': ['door']}
+    assert document_findings('{"raw_analysis": "free text"}', ('incident_date',)) == 'free text'
@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip('boto3')
+
+from autosettled_common import repositories
+
+
+class FakeIndexTable:
+    """A customer_id index that still shows the rows as they were before the latest writes"""
+
+    def __init__(self, key_name, stale_items):
+        self.key_name = key_name
+        self.stale_items = stale_items
+
+    def query(self, ExpressionAttributeValues, **kwargs):
+        customer_id = ExpressionAttributeValues[':cid']
+        return {'Items': [{self.key_name: item[self.key_name]} for item in self.stale_items
+                          if item['customer_id'] == customer_id]}
+
+
+class FakeDynamoDB:
+    def __init__(self, tables):
+        self.tables = tables
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        self.requests.append(RequestItems)
+        (table_name, request), = RequestItems.items()
+        assert request['ConsistentRead']
+        key_name, items = self.tables[table_name]
+        wanted = {key[key_name] for key in request['Keys']}
+        return {'Responses': {table_name: [item for item in items if item[key_name] in wanted]}}
+
+
+def test_portfolio_rebuild_reads_changed_rows_from_the_base_tables(monkeypatch):
+    policies = [
+        {'policy_id': 'P1', 'customer_id': 'C1', 'policy_status': 'Cancelled'},  # index still says Active
+        {'policy_id': 'P2', 'customer_id': 'C1', 'policy_status': 'Active', 'policy_number': 'POL-2'},
+        {'policy_id': 'P3', 'customer_id': 'C1', 'policy_status': 'Active', 'policy_number': 'POL-3'},  # not indexed yet
+    ]
+    vehicles = [
+        {'vehicle_id': 'V2', 'policy_id': 'P2', 'customer_id': 'C1', 'make': 'Honda'},
+        {'vehicle_id': 'V3', 'policy_id': 'P3', 'customer_id': 'C1', 'make': 'Ford'},  # not indexed yet
+    ]
+    index_tables = {
+        repositories.POLICY_TABLE: FakeIndexTable('policy_id', policies[:2]),
+        repositories.VEHICLES_TABLE: FakeIndexTable('vehicle_id', vehicles[:1]),
+    }
+    dynamodb = FakeDynamoDB({repositories.POLICY_TABLE: ('policy_id', policies),
+                             repositories.VEHICLES_TABLE: ('vehicle_id', vehicles)})
+    monkeypatch.setattr(repositories, 'get_table', lambda name: index_tables[name])
+    monkeypatch.setattr(repositories, 'get_dynamodb', lambda: dynamodb)
+
+    enriched = repositories.build_enriched_policies('C1', policy_ids={'P3'}, vehicle_ids={'V3'})
+
+    assert [(p['policy_number'], p['vehicle_make']) for p in enriched] == [('POL-2', 'Honda'), ('POL-3', 'Ford')]
+
+
+def test_batch_get_retries_unprocessed_keys(monkeypatch):
+    responses = [
+        {'Responses': {'t': [{'id': 'a'}]}, 'UnprocessedKeys': {'t': {'Keys': [{'id': 'b'}], 'ConsistentRead': True}}},
+        {'Responses': {'t': [{'id': 'b'}]}, 'UnprocessedKeys': {}},
+    ]
+
+    class Retrying:
+        def batch_get_item(self, RequestItems):
+            return responses.pop(0)
+
+    monkeypatch.setattr(repositories, 'get_dynamodb', lambda: Retrying())
+    monkeypatch.setattr(repositories.time, 'sleep', lambda seconds: None)
+
+    assert repositories.batch_get_consistent('t', 'id', ['a', 'b']) == [{'id': 'a'}, {'id': 'b'}]
+
+
+def test_find_customer_without_snapshot_queries_the_email_index(monkeypatch):
+    customer = {'customer_id': 'C9', 'email': 'new@example.com', 'first_name': 'Ana', 'last_name': 'Diaz'}
+
+    class CustomersTable:
+        def query(self, **kwargs):
+            assert kwargs['IndexName'] == repositories.CUSTOMER_EMAIL_INDEX
+            return {'Items': [customer]}
+
+    def no_snapshot():
+        raise AssertionError('snapshot consulted')
+
+    monkeypatch.setattr(repositories, 'current_snapshot', no_snapshot)
+    monkeypatch.setattr(repositories, 'get_table', lambda name: CustomersTable())
+
+    assert repositories.find_customer('Ana', 'Diaz', 'new@example.com', use_snapshot=False) == customer
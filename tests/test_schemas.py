@@ -0,0 +1,46 @@
+from autosettled_common.schemas import DAMAGE_SCHEMA, DECISION_SCHEMA, DOCUMENT_SCHEMA, coerce, validate
+
+DOCUMENT = {
+    'incident_date': '2025-03-02', 'incident_location': 'Main St', 'police_case_number': 'PR-1042',
+    'fault_determination': 'other driver', 'estimated_repair_cost': 1850.5, 'repair_items': ['bumper'],
+    'inconsistencies': [], 'red_flags': [], 'document_authenticity_assessment': 'consistent'
+}
+
+
+def test_cheap_mismatches_are_coerced():
+    value = coerce({'recommendation': 'approve', 'approved_amount': '$1,200.00', 'deductible_applies': 'True',
+                    'risk_assessment': ' Low ', 'next_steps': ['pay']}, DECISION_SCHEMA)
+
+    assert value == {'recommendation': 'APPROVE', 'approved_amount': 1200, 'deductible_applies': True,
+                     'risk_assessment': 'low', 'next_steps': ['pay']}
+
+
+def test_unparseable_values_are_left_for_validation():
+    value = coerce({'estimated_repair_cost_usd': 'about a grand', 'severity': 'catastrophic'}, DAMAGE_SCHEMA)
+
+    assert value == {'estimated_repair_cost_usd': 'about a grand', 'severity': 'catastrophic'}
+    errors = validate(value, DAMAGE_SCHEMA)
+    assert '$.estimated_repair_cost_usd: expected number, got str' in errors
+    assert "$.severity: 'catastrophic' is not one of ['minor', 'moderate', 'severe']" in errors
+    assert '$.damaged_parts: required' in errors
+
+
+def test_document_facts_may_be_null():
+    value = dict(DOCUMENT, police_case_number=None, incident_date=None, estimated_repair_cost=None)
+
+    assert validate(coerce(value, DOCUMENT_SCHEMA), DOCUMENT_SCHEMA) == []
+
+
+def test_unknown_amount_becomes_null_and_text_amount_a_number():
+    assert coerce(dict(DOCUMENT, estimated_repair_cost='Unknown'), DOCUMENT_SCHEMA)['estimated_repair_cost'] is None
+    assert coerce(dict(DOCUMENT, estimated_repair_cost='$980'), DOCUMENT_SCHEMA)['estimated_repair_cost'] == 980
+
+
+def test_unknown_text_is_kept_for_nullable_strings():
+    assert coerce(dict(DOCUMENT, police_case_number='unknown'), DOCUMENT_SCHEMA)['police_case_number'] == 'unknown'
+
+
+def test_required_fields_are_not_nullable_by_default():
+    value = dict(DOCUMENT, fault_determination=None)
+
+    assert validate(value, DOCUMENT_SCHEMA) == ['$.fault_determination: expected string, got NoneType']
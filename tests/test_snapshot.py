@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from autosettled_common.bloom import BloomFilter, customer_filter_key
+from autosettled_common.snapshot import ReferenceSnapshot, write_snapshot
+
+CUSTOMERS = [{'customer_id': f'C{i}', 'email': f'user{i}@example.com', 'first_name': 'Pat', 'last_name': f'Last{i}'}
+             for i in range(50)]
+
+
+def open_snapshot(path, version):
+    snapshot = ReferenceSnapshot('bucket')
+    snapshot._conn = sqlite3.connect(path, check_same_thread=False)
+    snapshot.version = version
+    return snapshot
+
+
+def test_customer_filter_is_built_from_the_exported_customers(tmp_path):
+    path = str(tmp_path / 'snapshot.sqlite')
+    write_snapshot(path, '20260101T000000Z', CUSTOMERS, [], [])
+
+    customer_filter = open_snapshot(path, '20260101T000000Z').customer_filter()
+
+    assert customer_filter.item_count == len(CUSTOMERS)
+    assert all(customer_filter_key(c['email'], c['last_name']) in customer_filter for c in CUSTOMERS)
+
+
+def test_customer_filter_not_matching_its_snapshot_is_disabled(tmp_path):
+    path = str(tmp_path / 'snapshot.sqlite')
+    write_snapshot(path, '20260101T000000Z', CUSTOMERS, [], [])
+    conn = sqlite3.connect(path)
+    stale = BloomFilter.build([customer_filter_key('user1@example.com', 'Last1')], source_version='20260101T000000Z')
+    conn.execute("UPDATE filters SET data = ? WHERE name = 'customers'", (stale.to_bytes(),))
+    conn.commit()
+    conn.close()
+
+    assert open_snapshot(path, '20260101T000000Z').customer_filter() is None
+
+
+def test_filter_header_round_trips():
+    bloom = BloomFilter.build(['a|b', 'c|d'], source_version='v1')
+
+    loaded = BloomFilter.from_bytes(bloom.to_bytes())
+
+    assert (loaded.item_count, loaded.source_version) == (2, 'v1')
+    assert 'a|b' in loaded and 'c|d' in loaded
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from autosettled_common.streaming import IncrementalJsonObjectParser, iter_text_deltas
+
+
+def event(payload):
+    return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+
+def text_delta(text):
+    return event({'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': text}})
+
+
+def json_delta(partial):
+    return event({'type': 'content_block_delta', 'index': 0,
+                  'delta': {'type': 'input_json_delta', 'partial_json': partial}})
+
+
+def test_text_deltas_are_yielded_and_other_events_skipped():
+    stream = [event({'type': 'message_start', 'message': {}}),
+              event({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}),
+              text_delta('Hello, '), text_delta('world'),
+              event({'type': 'content_block_stop', 'index': 0}),
+              event({'type': 'message_stop'})]
+
+    assert list(iter_text_deltas(stream)) == ['Hello, ', 'world']
+
+
+def test_tool_use_partial_json_is_yielded():
+    stream = [event({'type': 'content_block_start', 'index': 0,
+                     'content_block': {'type': 'tool_use', 'name': 'record_decision', 'input': {}}}),
+              json_delta('{"recommendation": "APP'), json_delta('ROVE", "payout": 1200}')]
+
+    assert ''.join(iter_text_deltas(stream)) == '{"recommendation": "APPROVE", "payout": 1200}'
+
+
+def test_stream_error_event_raises():
+    stream = [text_delta('partial'), {'throttlingException': {'message': 'slow down'}}]
+    deltas = iter_text_deltas(stream)
+
+    assert next(deltas) == 'partial'
+    with pytest.raises(RuntimeError, match='throttlingException'):
+        next(deltas)
+
+
+def test_parser_emits_each_member_once_it_completes():
+    parser = IncrementalJsonObjectParser()
+
+    assert parser.feed('```json\n{"recommendation": "APP') == []
+    assert parser.feed('ROVE", "amounts": {"payout": 12') == [('recommendation', 'APPROVE')]
+    assert parser.feed('00, "deductible": 500}, "reasoning": "Rear-ended, {minor} \\"dent\\"') == [
+        ('amounts', {'payout': 1200, 'deductible': 500})]
+    assert parser.feed('"}\n```') == [('reasoning', 'Rear-ended, {minor} "dent"')]
+    assert parser.done
+    assert parser.feed(', "late": 1}') == []
+
+
+def test_parser_drops_a_member_that_does_not_parse():
+    parser = IncrementalJsonObjectParser()
+
+    assert parser.feed('{"a": nope, "b": [1, 2]}') == [('b', [1, 2])]
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from autosettled_common import structured
+from autosettled_common.schemas import DOCUMENT_SCHEMA, DOCUMENT_TOOL
+
+
+class RepairingInvoker:
+    """Answers the repair call with the given tool input and keeps the prompt it was sent"""
+
+    def __init__(self, repaired):
+        self.repaired = repaired
+        self.prompts = []
+
+    def invoke(self, model_id, body):
+        self.prompts.append(json.loads(body)['messages'][0]['content'])
+        return {'content': [{'type': 'tool_use', 'name': DOCUMENT_TOOL, 'input': self.repaired}]}
+
+
+INVALID = {'incident_date': '2025-03-02', 'incident_location': 'Main St', 'fault_determination': 'other driver',
+           'estimated_repair_cost': 'see attached', 'repair_items': ['bumper'], 'inconsistencies': [],
+           'red_flags': [], 'document_authenticity_assessment': 'consistent'}
+
+
+def test_repair_prompt_asks_for_null_rather_than_guesses(monkeypatch):
+    repaired = dict(INVALID, police_case_number=None, estimated_repair_cost=None)
+    invoker = RepairingInvoker(repaired)
+    monkeypatch.setattr(structured, 'bedrock_invoker', invoker)
+
+    assert structured.validated(INVALID, DOCUMENT_SCHEMA, DOCUMENT_TOOL, 'model') == repaired
+    prompt, = invoker.prompts
+    assert '$.police_case_number: required' in prompt
+    assert 'null' in prompt and 'Never guess identifiers' in prompt
+    assert 'most reasonable' not in prompt
+
+
+def test_still_invalid_after_repair_raises(monkeypatch):
+    monkeypatch.setattr(structured, 'bedrock_invoker', RepairingInvoker(INVALID))
+
+    with pytest.raises(structured.StructuredOutputError):
+        structured.validated(INVALID, DOCUMENT_SCHEMA, DOCUMENT_TOOL, 'model')
+
+
+def test_valid_output_skips_the_repair_call(monkeypatch):
+    invoker = RepairingInvoker(None)
+    monkeypatch.setattr(structured, 'bedrock_invoker', invoker)
+    value = dict(INVALID, police_case_number='PR-1', estimated_repair_cost='1,850')
+
+    assert structured.validated(value, DOCUMENT_SCHEMA, DOCUMENT_TOOL, 'model')['estimated_repair_cost'] == 1850
+    assert invoker.prompts == []